@@ -2,13 +2,30 @@ from datetime import datetime
 
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, categories, tags, users, videos
+from app.api.endpoints import (
+    admin,
+    auth,
+    categories,
+    delivery,
+    playback,
+    storage,
+    tags,
+    users,
+    videos,
+)
+from app.core.config import settings
 
 api_router = APIRouter()
 api_router.include_router(auth.router, tags=["auth"])
 api_router.include_router(users.router, tags=["users"])
 api_router.include_router(videos.router, tags=["videos"])
+api_router.include_router(playback.router, tags=["playback"])
+if settings.EDGE_CACHE_ENABLED:
+    api_router.include_router(delivery.router, tags=["delivery"])
+if settings.STORAGE_BACKEND == "local":
+    api_router.include_router(storage.router, tags=["storage"])
 api_router.include_router(tags.router, tags=["tags"])
 api_router.include_router(categories.router, tags=["categories"])
+api_router.include_router(admin.router, tags=["admin"])
 
 __all__ = ["api_router"]
@@ -2,18 +2,25 @@
 Dependency injection utilities for FastAPI endpoints.
 
 This module provides dependency functions for handling authentication and authorization
-in the FastAPI application, including JWT token validation and user role verification.
+in the FastAPI application, including JWT token validation and user role verification,
+for picking the database session of cacheable reads, and for rate limiting routes per
+user.
 """
 
-from fastapi import Depends, HTTPException, status
+import math
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
 from app.core.security import decode_token
 from app.models.user import User
 from app.schemas.user import TokenData
+from app.services.limits import check_rate_limit
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
@@ -103,3 +110,98 @@ def get_current_active_superuser(
             status_code=400, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+
+def get_cacheable_read_db(
+    primary: Session = Depends(get_db), replica: Session = Depends(get_read_db)
+) -> Session:
+    """
+    Get the session for reads whose responses may fill the response cache.
+
+    With the response cache enabled, the reads go to the primary: a replica
+    lagging behind the write that just invalidated an entry would otherwise
+    refill it with the data from before the write, to be served for
+    `RESPONSE_CACHE_TTL_SECONDS`. Cache hits don't read the database at all, so
+    this only moves the misses off the replicas. Sessions only connect when
+    used, so the one left unused costs nothing.
+
+    Args:
+        primary: Session on the primary database
+        replica: Session on a read replica
+
+    Returns:
+        Session: The session to read with
+
+    """
+    return primary if settings.RESPONSE_CACHE_ENABLED else replica
+
+
+class RateLimit:
+    """
+    Dependency limiting how often each user may call a route.
+
+    Args:
+        scope: Name of the limit, shared by the routes using it
+        per_minute: Requests each user may make per minute, in bursts of up to
+            as many
+        global_per_minute: Requests all users together may make per minute
+            (0 for no limit)
+
+    """
+
+    def __init__(self, scope: str, per_minute: int, global_per_minute: int = 0):
+        self.scope = scope
+        self.per_minute = per_minute
+        self.global_per_minute = global_per_minute
+
+    def __call__(self, current_user: User = Depends(get_current_active_user)) -> None:
+        """
+        Count the request against the limit.
+
+        Not a coroutine, so that FastAPI runs the blocking Redis round trip in
+        its threadpool rather than on the event loop.
+
+        Args:
+            current_user: The active user making the request
+
+        Raises:
+            HTTPException: 429 with a `Retry-After` header if the limit is
+                reached
+
+        """
+        wait = check_rate_limit(
+            self.scope, current_user.id, self.per_minute, self.global_per_minute
+        )
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+async def authorize_profiling(request: Request) -> None:
+    """
+    Check that the caller of a request to be profiled is an active superuser.
+
+    Runs outside FastAPI's dependency injection, from `ProfilingMiddleware`, so
+    it resolves the database session itself, honouring overrides of `get_db`.
+
+    Args:
+        request: The request to be profiled
+
+    Raises:
+        HTTPException: 401 or 400 if the caller is not an active superuser
+
+    """
+    token = await oauth2_scheme(request)
+    get_session = request.app.dependency_overrides.get(get_db, get_db)
+
+    def check_superuser() -> None:
+        sessions = get_session()
+        try:
+            get_current_active_superuser(get_current_user(next(sessions), token))
+        finally:
+            sessions.close()
+
+    await run_in_threadpool(check_superuser)
@@ -0,0 +1,162 @@
+from dataclasses import asdict
+from datetime import UTC, datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_active_superuser
+from app.core.database import get_db, get_read_db
+from app.core.profiling import ProfiledRoute
+from app.core.responses import model_response
+from app.models.user import User
+from app.models.video import Video
+from app.schemas.video import VideoInDB
+from app.schemas.video_status import VideoStatus
+from app.services.response_cache import invalidate, video_key
+from app.services.storage import StorageError, get_storage
+from app.services.transcode_checkpoints import clear_checkpoints
+from app.services.video_status_events import get_status_timings, record_status_event
+
+router = APIRouter(prefix="/admin", tags=["admin"], route_class=ProfiledRoute)
+
+
+@router.get("/video-stats", response_model=None)
+def get_video_stats(
+    hours: float = Query(24, gt=0, le=24 * 90, description="Length of the window"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_superuser),
+) -> dict:
+    """
+    Report how long videos waited for and spent in transcoding over a window.
+
+    Args:
+        hours: Length of the window, ending now, in hours.
+        db: Database session dependency.
+        current_user: The currently authenticated superuser.
+
+    Returns:
+        dict: p50/p95/p99 queue wait and processing time in seconds, and the
+            failure rate of the transcodes finished within the window.
+
+    """
+    since = datetime.now(UTC) - timedelta(hours=hours)
+    return {"since": since, **get_status_timings(db, since)}
+
+
+@router.get("/backlog", response_model=None)
+def get_backlog(
+    current_user: User = Depends(get_current_active_superuser),
+) -> dict:
+    """
+    Report the transcode backlog, for autoscaling transcode workers.
+
+    The figures are measured at most `BACKLOG_CACHE_SECONDS` ago.
+
+    Args:
+        current_user: The currently authenticated superuser.
+
+    Returns:
+        dict: Videos waiting for and in a transcode, the media seconds they hold,
+            the fleet's recent throughput and the time it needs to drain the
+            backlog, and the length of and workers on each Celery queue.
+
+    """
+    # Imported here since measuring the backlog loads Celery
+    from app.services.backlog import get_transcode_backlog
+
+    backlog = get_transcode_backlog()
+    return {
+        **asdict(backlog),
+        "drain_seconds": backlog.drain_seconds,
+    }
+
+
+@router.post(
+    "/videos/{video_id}/retranscode",
+    response_model=VideoInDB,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def retranscode_video(
+    video_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+) -> VideoInDB:
+    """
+    Transcode a processed (or failed) video again, e.g. after renditions changed.
+
+    The video goes back to `UPLOADED` and a transcode is enqueued from scratch. Its
+    HLS output is deleted first: the transcode skips objects it finds already
+    uploaded, so it would otherwise keep old segments the new ones do not differ
+    from in size. An original the lifecycle policy moved to the cold tier is
+    rehydrated by the transcode, and a deleted one is replaced by its mezzanine.
+
+    Args:
+        video_id: The ID of the video to transcode.
+        request: The incoming request.
+        db: Database session dependency.
+        current_user: The currently authenticated superuser.
+
+    Returns:
+        VideoInDB: The video, waiting for its transcode.
+
+    Raises:
+        HTTPException: 404 if the video is not found, 409 if it is waiting for or
+            in a transcode already, 500 if its HLS output cannot be deleted.
+
+    """
+    video = db.get(Video, video_id)
+    if not video:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Video not found."
+        )
+
+    # Only the request that moves the video out of PROCESSED or FAILED enqueues a
+    # transcode, so concurrent requests are harmless.
+    result = db.execute(
+        update(Video)
+        .where(
+            Video.id == video.id,
+            Video.status.in_([VideoStatus.PROCESSED, VideoStatus.FAILED]),
+        )
+        .values(status=VideoStatus.UPLOADED, hls_url=None)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Video is already waiting for or in a transcode.",
+        )
+
+    # Imported here so that only requests enqueueing work load Celery
+    from app.services.transcode_routing import select_transcode_queue
+    from app.tasks.cleanup import HLS_PREFIX, delete_hls_output
+    from app.tasks.video_processing import transcode_video
+
+    # The row stays locked until the output is gone, so no transcode starts meanwhile
+    storage = get_storage()
+    try:
+        delete_hls_output(storage, video.id)
+        if next(iter(storage.list_objects(f"{HLS_PREFIX}{video.id}/")), None):
+            raise StorageError("some objects could not be deleted")
+    except StorageError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Could not delete the HLS output: {e}",
+        ) from None
+    record_status_event(db, video.id, VideoStatus.UPLOADED)
+    # Stages checkpointed by an earlier failed run are redone as well
+    clear_checkpoints(db, video.id)
+    db.refresh(video)
+    invalidate(video_key(video.id))
+
+    transcode_video.apply_async(
+        (video.id, getattr(request.state, "profile", False)),
+        queue=select_transcode_queue(
+            video.duration, video.file_size, video.owner.is_superuser
+        ),
+    )
+    return model_response(VideoInDB, video)
@@ -6,11 +6,12 @@ from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.profiling import ProfiledRoute
 from app.core.security import create_access_token, get_password_hash, verify_password
 from app.models.user import User
 from app.schemas.user import Token, UserCreate, UserInDB
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=ProfiledRoute)
 
 
 @router.post("/register", response_model=UserInDB, status_code=status.HTTP_201_CREATED)
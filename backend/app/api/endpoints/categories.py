@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.api.deps import get_cacheable_read_db
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.profiling import ProfiledRoute
+from app.core.responses import model_json, model_response
 from app.models.category import Category
+from app.models.video import Video
+from app.models.video_category_association import video_category_association
 from app.schemas.category import CategoryCreate, CategoryInDB
+from app.services.response_cache import (
+    CATEGORIES_KEY,
+    cached_response,
+    invalidate,
+    video_key,
+)
 
-router = APIRouter(prefix="/categories", tags=["categories"])
+router = APIRouter(prefix="/categories", tags=["categories"], route_class=ProfiledRoute)
 
 
 @router.post("/", response_model=CategoryInDB, status_code=status.HTTP_201_CREATED)
@@ -25,19 +38,32 @@ async def create_category(
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    invalidate(CATEGORIES_KEY)
     return db_category
 
 
 @router.get("/", response_model=list[CategoryInDB])
-async def get_all_categories(db: Session = Depends(get_db)) -> list[CategoryInDB]:
+def get_all_categories(
+    db: Session = Depends(get_cacheable_read_db),
+) -> list[CategoryInDB]:
     """
     Get all categories.
     """
-    return db.query(Category).all()
+    if settings.RESPONSE_CACHE_ENABLED:
+        return cached_response(
+            CATEGORIES_KEY,
+            lambda: Response(
+                model_json(list[CategoryInDB], db.query(Category).all()),
+                media_type="application/json",
+            ),
+        )
+    return model_response(list[CategoryInDB], db.query(Category).all())
 
 
 @router.get("/{category_id}", response_model=CategoryInDB)
-async def get_category(category_id: int, db: Session = Depends(get_db)) -> CategoryInDB:
+async def get_category(
+    category_id: int, db: Session = Depends(get_read_db)
+) -> CategoryInDB:
     """
     Get a category by ID.
     """
@@ -59,6 +85,21 @@ async def delete_category(category_id: int, db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Category not found"
         )
+    # Invalidate the cached copies of the videos losing the category
+    video_ids = db.scalars(
+        update(Video)
+        .where(
+            Video.id.in_(
+                select(video_category_association.c.video_id).where(
+                    video_category_association.c.category_id == category_id
+                )
+            )
+        )
+        .values(version=Video.version + 1)
+        .returning(Video.id)
+        .execution_options(synchronize_session=False)
+    ).all()
     db.delete(category)
     db.commit()
+    invalidate(CATEGORIES_KEY, *map(video_key, video_ids))
     return
@@ -0,0 +1,144 @@
+import re
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from app.api.deps import get_current_active_superuser
+from app.core.profiling import ProfiledRoute
+from app.models.user import User
+from app.services.edge_cache import (
+    CachedObject,
+    EdgeCache,
+    EdgeCacheStats,
+    get_edge_cache,
+)
+from app.services.playback import verify_playback_token
+from app.services.storage import ObjectNotFoundError
+
+router = APIRouter(prefix="/hls", tags=["delivery"], route_class=ProfiledRoute)
+
+SEGMENT_PATTERN = re.compile(r"\w+_\d+\.ts")
+SINGLE_RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+SEGMENT_MEDIA_TYPE = "video/mp2t"
+
+
+class PinnedFileResponse(FileResponse):
+    """File response releasing its edge cache entry once sent, or abandoned."""
+
+    def __init__(self, cache: EdgeCache, entry: CachedObject, **kwargs):
+        super().__init__(entry.path, **kwargs)
+        self.cache = cache
+        self.entry = entry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.cache.release(self.entry)
+
+
+def _served_bytes(http_range: str | None, size: int) -> int:
+    """Estimate the bytes sent for a request, honoring a single byte range."""
+    match = SINGLE_RANGE_PATTERN.fullmatch(http_range or "")
+    if not match:
+        return size
+    start, end = match.groups()
+    if not start:
+        return min(int(end or 0), size)
+    end = min(int(end), size - 1) if end else size - 1
+    return max(0, end - int(start) + 1)
+
+
+@router.get("/stats", response_model=None)
+def get_edge_cache_stats(
+    cache: EdgeCache = Depends(get_edge_cache),
+    current_user: User = Depends(get_current_active_superuser),
+) -> dict:
+    """
+    Report the effectiveness of this process's edge cache.
+
+    Args:
+        cache: The edge cache.
+        current_user: The currently authenticated superuser.
+
+    Returns:
+        dict: Hit ratio, bytes served, origin fetches and cache occupancy.
+
+    """
+    stats: EdgeCacheStats = cache.stats()
+    return {
+        "hits": stats.hits,
+        "misses": stats.misses,
+        "hit_ratio": stats.hit_ratio,
+        "origin_fetches": stats.origin_fetches,
+        "bytes_served": stats.bytes_served,
+        "cached_bytes": stats.cached_bytes,
+        "cached_objects": stats.cached_objects,
+    }
+
+
+@router.get("/{video_id}/{segment_name}", response_model=None)
+def get_segment(
+    video_id: int,
+    segment_name: str,
+    token: str,
+    v: int = 0,
+    range: str | None = Header(default=None),  # noqa: A002
+    if_none_match: str | None = Header(default=None),
+    cache: EdgeCache = Depends(get_edge_cache),
+) -> Response:
+    """
+    Serve an HLS segment from the edge cache.
+
+    Byte ranges, `If-Range` and `If-None-Match` are supported, and the file is sent
+    from the cache directory (zero-copy where the server supports it). Segment URLs
+    carry the video's version, so a re-transcode's segments get new URLs and cache
+    entries.
+
+    Args:
+        video_id: The ID of the video.
+        segment_name: File name of the segment.
+        token: Playback token from the rendition playlist URL.
+        v: The video's version from the rendition playlist URL.
+        range: The `Range` request header.
+        if_none_match: The `If-None-Match` request header.
+        cache: The edge cache.
+
+    Returns:
+        Response: The segment, or 304 if the client's copy is current.
+
+    Raises:
+        HTTPException: 403 if the token is invalid or expired, 404 if the segment
+            does not exist.
+
+    """
+    if not verify_playback_token(token, video_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid playback token."
+        )
+    if not SEGMENT_PATTERN.fullmatch(segment_name):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Segment not found."
+        )
+
+    try:
+        # Pinned, so eviction can't delete the file before it is sent
+        entry = cache.get(f"hls/{video_id}/{segment_name}", pin=True, version=v)
+    except ObjectNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Segment not found."
+        ) from None
+
+    # A given version of a segment is never rewritten
+    headers = {"ETag": entry.etag, "Cache-Control": "private, max-age=31536000"}
+    if if_none_match is not None and entry.etag in (
+        tag.strip() for tag in if_none_match.split(",")
+    ):
+        cache.release(entry)
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    cache.record_served(_served_bytes(range, entry.size))
+    return PinnedFileResponse(
+        cache, entry, media_type=SEGMENT_MEDIA_TYPE, headers=headers
+    )
@@ -0,0 +1,128 @@
+import re
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_active_user
+from app.core.database import get_read_db
+from app.core.profiling import ProfiledRoute
+from app.models.user import User
+from app.models.video import Video
+from app.schemas.video_status import VideoStatus
+from app.services.playback import (
+    PLAYLIST_MEDIA_TYPE,
+    current_window,
+    render_master_playlist,
+    render_rendition_playlist,
+    verify_playback_token,
+)
+from app.services.storage import ObjectNotFoundError
+
+router = APIRouter(prefix="/playback", tags=["playback"], route_class=ProfiledRoute)
+
+RENDITION_PLAYLIST_PATTERN = re.compile(r"stream_\w+\.m3u8")
+
+
+@router.get("/{video_id}/master.m3u8")
+def get_master_playlist(
+    video_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Response:
+    """
+    Get the HLS master playlist of a video for playback.
+
+    The rendition playlists it references carry a short-lived playback token, so
+    players can fetch them without the user's credentials.
+
+    Args:
+        video_id: The ID of the video to play.
+        db: Database session dependency.
+        current_user: The currently authenticated user.
+
+    Returns:
+        Response: The rewritten master playlist.
+
+    Raises:
+        HTTPException: 404 if the video is not found or not playable yet, or its
+            master playlist is missing from storage.
+
+    """
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video or video.hls_url is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Video not found."
+        )
+
+    # A video still processing may republish its master playlist
+    version = f"{video.status}:{video.updated_at}"
+    try:
+        playlist = render_master_playlist(video_id, version, current_window())
+    except ObjectNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Playlist not found."
+        ) from None
+    cache_control = "private, max-age=60"
+    if video.status != VideoStatus.PROCESSED:
+        cache_control = "no-store"
+    return Response(
+        content=playlist,
+        media_type=PLAYLIST_MEDIA_TYPE,
+        headers={"Cache-Control": cache_control},
+    )
+
+
+@router.get("/{video_id}/{playlist_name}")
+def get_rendition_playlist(
+    video_id: int,
+    playlist_name: str,
+    token: str,
+    db: Session = Depends(get_read_db),
+) -> Response:
+    """
+    Get a rendition playlist with presigned segment URLs.
+
+    Args:
+        video_id: The ID of the video to play.
+        playlist_name: File name of the rendition playlist.
+        token: Playback token from the master playlist.
+        db: Database session dependency.
+
+    Returns:
+        Response: The rewritten rendition playlist.
+
+    Raises:
+        HTTPException: 403 if the token is invalid or expired, 404 if the playlist
+            name is not a rendition playlist or the playlist or video does not
+            exist.
+
+    """
+    if not RENDITION_PLAYLIST_PATTERN.fullmatch(playlist_name):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Playlist not found."
+        )
+    if not verify_playback_token(token, video_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid playback token."
+        )
+
+    # Part of the cache key, so a re-transcoded video's playlists are rendered anew
+    version = db.scalar(select(Video.version).where(Video.id == video_id))
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Video not found."
+        )
+    try:
+        playlist = render_rendition_playlist(
+            video_id, version, playlist_name, current_window()
+        )
+    except ObjectNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Playlist not found."
+        ) from None
+    return Response(
+        content=playlist,
+        media_type=PLAYLIST_MEDIA_TYPE,
+        headers={"Cache-Control": "private, max-age=60"},
+    )
@@ -0,0 +1,117 @@
+import os
+import shutil
+import uuid
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi.responses import FileResponse
+
+from app.core.profiling import ProfiledRoute
+from app.services.storage import LocalStorage, StorageError, get_storage
+
+router = APIRouter(prefix="/storage", tags=["storage"], route_class=ProfiledRoute)
+
+
+def get_local_storage() -> LocalStorage:
+    """
+    Get the local storage backend served by this router.
+
+    Raises:
+        HTTPException: 404 if objects are not stored on the local filesystem.
+
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return storage
+
+
+@router.post("", status_code=status.HTTP_204_NO_CONTENT)
+def upload_object(
+    key: str = Form(...),
+    content_type: str = Form(..., alias="Content-Type"),
+    max_size: int = Form(...),
+    expires: int = Form(...),
+    signature: str = Form(...),
+    file: UploadFile = File(...),
+    storage: LocalStorage = Depends(get_local_storage),
+) -> None:
+    """
+    Store an upload made with a presigned form from the local storage backend.
+
+    Args:
+        key: Name of the object to create.
+        content_type: Content type the form was signed for.
+        max_size: Maximum size of the upload in bytes.
+        expires: Expiry of the form, as a Unix timestamp.
+        signature: Signature of the form.
+        file: The uploaded file.
+        storage: The local storage backend.
+
+    Raises:
+        HTTPException: 403 if the signature is invalid or expired, 400 if the
+            upload exceeds the signed maximum size.
+
+    """
+    if not storage.verify(signature, expires, "POST", key, content_type, str(max_size)):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid signature."
+        )
+    try:
+        destination = storage.path(key)
+    except StorageError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    partial = os.path.join(os.path.dirname(destination), f".part-{uuid.uuid4().hex}")
+    try:
+        with open(partial, "wb") as f:
+            shutil.copyfileobj(file.file, f)
+            too_large = f.tell() > max_size
+        if too_large:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Upload exceeds the maximum size.",
+            )
+        os.replace(partial, destination)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+@router.get("/{name:path}")
+def download_object(
+    name: str,
+    expires: int,
+    signature: str,
+    storage: LocalStorage = Depends(get_local_storage),
+) -> FileResponse:
+    """
+    Serve an object through a presigned URL from the local storage backend.
+
+    Args:
+        name: Name of the object.
+        expires: Expiry of the URL, as a Unix timestamp.
+        signature: Signature of the URL.
+        storage: The local storage backend.
+
+    Returns:
+        FileResponse: The object.
+
+    Raises:
+        HTTPException: 403 if the signature is invalid or expired, 404 if the object
+            does not exist.
+
+    """
+    if not storage.verify(signature, expires, "GET", name):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid signature."
+        )
+    try:
+        path = storage.path(name)
+    except StorageError:
+        path = None
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Object not found."
+        )
+    return FileResponse(path)
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.api.deps import get_cacheable_read_db
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.profiling import ProfiledRoute
+from app.core.responses import model_json, model_response
 from app.models.tag import Tag
+from app.models.video import Video
+from app.models.video_tag_association import video_tag_association
 from app.schemas.tag import TagCreate, TagInDB
+from app.services.response_cache import TAGS_KEY, cached_response, invalidate, video_key
 
-router = APIRouter(prefix="/tags", tags=["tags"])
+router = APIRouter(prefix="/tags", tags=["tags"], route_class=ProfiledRoute)
 
 
 @router.post("/", response_model=TagInDB, status_code=status.HTTP_201_CREATED)
@@ -23,19 +31,28 @@ async def create_tag(tag_in: TagCreate, db: Session = Depends(get_db)) -> TagInD
     db.add(db_tag)
     db.commit()
     db.refresh(db_tag)
+    invalidate(TAGS_KEY)
     return db_tag
 
 
 @router.get("/", response_model=list[TagInDB])
-async def get_all_tags(db: Session = Depends(get_db)) -> list[TagInDB]:
+def get_all_tags(db: Session = Depends(get_cacheable_read_db)) -> list[TagInDB]:
     """
     Get all tags.
     """
-    return db.query(Tag).all()
+    if settings.RESPONSE_CACHE_ENABLED:
+        return cached_response(
+            TAGS_KEY,
+            lambda: Response(
+                model_json(list[TagInDB], db.query(Tag).all()),
+                media_type="application/json",
+            ),
+        )
+    return model_response(list[TagInDB], db.query(Tag).all())
 
 
 @router.get("/{tag_id}", response_model=TagInDB)
-async def get_tag(tag_id: int, db: Session = Depends(get_db)) -> TagInDB:
+async def get_tag(tag_id: int, db: Session = Depends(get_read_db)) -> TagInDB:
     """
     Get a tag by ID.
     """
@@ -57,6 +74,21 @@ async def delete_tag(tag_id: int, db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found"
         )
+    # Invalidate the cached copies of the videos losing the tag
+    video_ids = db.scalars(
+        update(Video)
+        .where(
+            Video.id.in_(
+                select(video_tag_association.c.video_id).where(
+                    video_tag_association.c.tag_id == tag_id
+                )
+            )
+        )
+        .values(version=Video.version + 1)
+        .returning(Video.id)
+        .execution_options(synchronize_session=False)
+    ).all()
     db.delete(tag)
     db.commit()
+    invalidate(TAGS_KEY, *map(video_key, video_ids))
     return
@@ -3,10 +3,11 @@ from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_active_user
 from app.core.database import get_db
+from app.core.profiling import ProfiledRoute
 from app.models.user import User
 from app.schemas.user import UserInDB, UserUpdate
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=ProfiledRoute)
 
 
 @router.get("/me", response_model=UserInDB)
@@ -1,26 +1,61 @@
-from datetime import datetime
-
-from fastapi import APIRouter, Depends, HTTPException, status
-from minio import Minio
-from minio.error import S3Error
-from sqlalchemy.orm import Session
+from datetime import UTC, datetime, timedelta
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from opentelemetry import trace
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, load_only, selectinload
 
-from app.api.deps import get_current_active_user
+from app.api.deps import RateLimit, get_cacheable_read_db, get_current_active_user
+from app.core.conditional import is_not_modified, not_modified, validator_headers
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.profiling import ProfiledRoute
+from app.core.responses import model_json, model_response
 from app.models.category import Category
 from app.models.tag import Tag
 from app.models.user import User
 from app.models.video import Video
 from app.schemas.video import PresignedPost, VideoCreate, VideoInDB, VideoUploadComplete
 from app.schemas.video_status import VideoStatus
-from app.tasks.video_processing import transcode_video
+from app.services.limits import (
+    QuotaExceededError,
+    record_upload_usage,
+    refund_upload_usage,
+    release_upload,
+    reserve_upload,
+)
+from app.services.response_cache import cached_response, invalidate, video_key
+from app.services.storage import StorageError, get_storage
+from app.services.video_status_events import record_status_event
 
-router = APIRouter(prefix="/videos", tags=["videos"])
+router = APIRouter(prefix="/videos", tags=["videos"], route_class=ProfiledRoute)
+
+# Each upload request creates a row and may lead to a transcode
+upload_rate_limit = RateLimit(
+    "upload-request",
+    settings.RATE_LIMIT_UPLOAD_REQUESTS_PER_MINUTE,
+    settings.RATE_LIMIT_UPLOAD_REQUESTS_GLOBAL_PER_MINUTE,
+)
+confirmation_rate_limit = RateLimit(
+    "upload-complete", settings.RATE_LIMIT_UPLOAD_CONFIRMATIONS_PER_MINUTE
+)
+read_rate_limit = RateLimit("video-read", settings.RATE_LIMIT_VIDEO_READS_PER_MINUTE)
 
 
 @router.post(
-    "/upload-request", response_model=PresignedPost, status_code=status.HTTP_201_CREATED
+    "/upload-request",
+    response_model=PresignedPost,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(upload_rate_limit)],
 )
 async def create_upload_url(
     video_in: VideoCreate,
@@ -43,7 +78,9 @@ async def create_upload_url(
         PresignedPost: An object containing the presigned URL, form fields, and the created video's ID.
 
     Raises:
-        HTTPException: 500 if S3 presigning fails.
+        HTTPException: 403 if the upload would exceed the user's storage or
+            transcode quota, 429 if the user or all users together made too
+            many upload requests, 500 if S3 presigning fails.
 
     """
     # Validate file size (2GB limit)
@@ -61,6 +98,14 @@ async def create_upload_url(
             detail=f"Unsupported MIME type: {video_in.mime_type}. Allowed types are {', '.join(allowed_mime_types)}.",
         )
 
+    try:
+        reserve_upload(db, current_user, video_in.file_size)
+    except QuotaExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Upload would exceed your {e.quota} quota.",
+        ) from None
+
     # Create a unique file key for S3
     file_extension = video_in.file_name.split(".")[-1]
     file_key = f"{current_user.id}/{video_in.title.replace(' ', '_')}_{datetime.now().timestamp()}.{file_extension}"
@@ -72,56 +117,64 @@ async def create_upload_url(
         file_key=file_key,
         file_size=video_in.file_size,
         mime_type=video_in.mime_type,
+        owner_id=current_user.id,
     )
-    db.add(db_video)
-    db.commit()
+    try:
+        db.add(db_video)
+        db.flush()
+        record_upload_usage(db, db_video)
+        db.commit()
+    except Exception:
+        # The quota reserved above is not used by any video
+        db.rollback()
+        release_upload(current_user.id, video_in.file_size, datetime.now(UTC))
+        raise
     db.refresh(db_video)
+    trace.get_current_span().set_attribute("video.id", db_video.id)
 
-    minio_client = Minio(
-        settings.MINIO_ENDPOINT,
-        access_key=settings.MINIO_ACCESS_KEY,
-        secret_key=settings.MINIO_SECRET_KEY,
-        secure=False,  # Use True for HTTPS
-    )
-
+    storage = get_storage()
     try:
         # Ensure the bucket exists
-        found = minio_client.bucket_exists(settings.MINIO_BUCKET_NAME)
-        if not found:
-            minio_client.make_bucket(settings.MINIO_BUCKET_NAME)
-
-        presigned_post = minio_client.presigned_post(
-            bucket_name=settings.MINIO_BUCKET_NAME,
-            object_name=file_key,
-            expires=datetime.timedelta(hours=1),  # URL expires in 1 hour
-            fields={
-                "Content-Type": video_in.mime_type,
-                "Content-Length": str(int(video_in.file_size)),
-            },
-            conditions=[
-                {"Content-Type": video_in.mime_type},
-                ["content-length-range", 0, int(video_in.file_size)],
-            ],
+        storage.ensure_bucket()
+
+        presigned_post = storage.presigned_upload(
+            file_key,
+            expires=timedelta(seconds=settings.UPLOAD_URL_EXPIRE_SECONDS),
+            content_type=video_in.mime_type,
+            max_size=int(video_in.file_size),
         )
-    except S3Error as e:
+    except StorageError as e:
         # If presigning fails, delete the video record from DB
+        refund_upload_usage(
+            db,
+            db_video.id,
+            current_user.id,
+            video_in.file_size,
+            db_video.created_at,
+        )
         db.delete(db_video)
         db.commit()
+        release_upload(current_user.id, video_in.file_size, datetime.now(UTC))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Could not generate presigned URL: {e}",
         )
 
     return PresignedPost(
-        url=presigned_post["url"],
-        fields=presigned_post["fields"],
+        url=presigned_post.url,
+        fields=presigned_post.fields,
         video_id=db_video.id,
     )
 
 
-@router.post("/upload-complete", response_model=VideoInDB)
+@router.post(
+    "/upload-complete",
+    response_model=VideoInDB,
+    dependencies=[Depends(confirmation_rate_limit)],
+)
 async def confirm_upload_complete(
     upload_complete: VideoUploadComplete,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ) -> VideoInDB:
@@ -129,10 +182,14 @@ async def confirm_upload_complete(
     Confirm that a video upload to S3 has been completed.
 
     This endpoint updates the status of a video record in the database after
-    a successful direct upload to S3.
+    a successful direct upload to S3 and triggers transcoding. It is idempotent:
+    confirming a video that is already uploaded, processing or processed returns
+    it unchanged without enqueueing another transcode. When a superuser profiles
+    the request, the transcode is profiled as well.
 
     Args:
         upload_complete: Data confirming the video upload, including the video_id.
+        request: The incoming request.
         db: Database session dependency.
         current_user: The currently authenticated user.
 
@@ -149,41 +206,196 @@ async def confirm_upload_complete(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Video not found."
         )
+    trace.get_current_span().set_attribute("video.id", video.id)
 
     # Optional: Add logic to verify MinIO object existence/integrity here if needed
 
-    video.status = VideoStatus.UPLOADED
-    db.add(video)
+    # Only the request that moves the video out of PENDING (or FAILED, for a
+    # re-upload) enqueues a transcode, so concurrent confirmations are harmless.
+    result = db.execute(
+        update(Video)
+        .where(
+            Video.id == video.id,
+            Video.status.in_([VideoStatus.PENDING, VideoStatus.FAILED]),
+        )
+        .values(status=VideoStatus.UPLOADED)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        record_status_event(db, video.id, VideoStatus.UPLOADED)
     db.commit()
     db.refresh(video)
 
-    # Trigger video transcoding task
-    transcode_video.delay(video.id)
+    if result.rowcount == 1:
+        invalidate(video_key(video.id))
+        # Imported here so that only requests enqueueing work load Celery
+        from app.services.transcode_routing import select_transcode_queue
+        from app.tasks.video_processing import transcode_video
+
+        # Trigger video transcoding task on the queue matching its expected
+        # length, or on the priority lane for superusers' videos, whoever confirms
+        transcode_video.apply_async(
+            (video.id, getattr(request.state, "profile", False)),
+            queue=select_transcode_queue(
+                video.duration, video.file_size, video.owner.is_superuser
+            ),
+        )
 
-    return video
+    return model_response(VideoInDB, video)
+
+
+# Declared before "/{video_id}", which would otherwise match "/batch"
+@router.get("/batch", response_model=None, dependencies=[Depends(read_rate_limit)])
+def get_videos_batch(
+    ids: list[int] = Query(
+        ...,
+        min_length=1,
+        max_length=settings.VIDEO_BATCH_MAX_IDS,
+        description="IDs of the videos, as repeated parameters",
+    ),
+    fields: str | None = Query(
+        None,
+        description="Comma-separated fields to return, e.g. status,hls_url; the "
+        "id is always returned (default: all)",
+    ),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user),
+) -> list[VideoInDB]:
+    """
+    Get the details of several videos in a single request.
+
+    Replaces polling `GET /videos/{video_id}` once per video. The videos are
+    read in one query, which also enforces ownership: videos that do not exist
+    or belong to another user (unless the current user is a superuser) are left
+    out of the response, without telling the two apart. Tags and categories are
+    only loaded when selected.
+
+    Args:
+        ids: The IDs of the videos to retrieve, at most `VIDEO_BATCH_MAX_IDS`.
+        fields: Comma-separated fields of `VideoInDB` to return, besides the ID.
+        db: Database session dependency.
+        current_user: The currently authenticated user.
+
+    Returns:
+        list[VideoInDB]: The videos found, in the order of `ids`, with only their
+        ID and the selected fields.
+
+    Raises:
+        HTTPException: 400 if a selected field does not exist.
+
+    """
+    if fields is None:
+        selected = list(VideoInDB.model_fields)
+    else:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in VideoInDB.model_fields]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}"
+                if unknown
+                else "No fields selected.",
+            )
+        # Without its ID, an item could not be matched to the requested video
+        if "id" not in selected:
+            selected.insert(0, "id")
+
+    # Only the selected columns, and the selected relationships in one query each
+    relationships = {"tags": Video.tags, "categories": Video.categories}
+    columns = [
+        getattr(Video, field) for field in selected if field not in relationships
+    ]
+    query = (
+        select(Video)
+        .options(
+            load_only(*columns),
+            *(
+                selectinload(relationship)
+                for field, relationship in relationships.items()
+                if field in selected
+            ),
+        )
+        .where(Video.id.in_(ids))
+    )
+    if not current_user.is_superuser:
+        query = query.where(Video.owner_id == current_user.id)
+    videos = {video.id: video for video in db.scalars(query)}
+
+    found = [videos[video_id] for video_id in dict.fromkeys(ids) if video_id in videos]
+    return model_response(list[VideoInDB], found, fields=selected)
 
 
-@router.get("/{video_id}", response_model=VideoInDB)
-async def get_video_details(
+@router.get(
+    "/{video_id}", response_model=VideoInDB, dependencies=[Depends(read_rate_limit)]
+)
+def get_video_details(
     video_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    if_modified_since: str | None = Header(default=None),
+    db: Session = Depends(get_cacheable_read_db),
     current_user: User = Depends(get_current_active_user),
 ) -> VideoInDB:
     """
     Get details of a specific video.
 
+    The response carries a weak `ETag` and a `Last-Modified` header. Clients
+    revalidating their copy with `If-None-Match` or `If-Modified-Since` get a
+    304 when it is current, checked without loading the video's relationships.
+    With the response cache enabled, the response and its validators are
+    served from the cache.
+
     Args:
         video_id: The ID of the video to retrieve.
+        response: The response, to set the validators on.
+        if_none_match: The `If-None-Match` request header.
+        if_modified_since: The `If-Modified-Since` request header.
         db: Database session dependency.
         current_user: The currently authenticated user.
 
     Returns:
-        VideoInDB: The video object.
+        VideoInDB: The video object, or 304 if the client's copy is current.
 
     Raises:
         HTTPException: 404 if the video is not found.
 
     """
+    if settings.RESPONSE_CACHE_ENABLED:
+        cached = cached_response(
+            video_key(video_id), lambda: _video_details_response(db, video_id)
+        )
+        if is_not_modified(cached.headers, if_none_match, if_modified_since):
+            return not_modified(cached.headers)
+        return cached
+
+    if if_none_match is not None or if_modified_since is not None:
+        # Primary key lookup of the validators only
+        validators = db.execute(
+            select(Video.version, Video.created_at, Video.updated_at).where(
+                Video.id == video_id
+            )
+        ).first()
+        if validators is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Video not found."
+            )
+        version, created_at, updated_at = validators
+        headers = validator_headers(video_id, version, updated_at or created_at)
+        if is_not_modified(headers, if_none_match, if_modified_since):
+            return not_modified(headers)
+
+    video = _get_video(db, video_id)
+    result = model_response(VideoInDB, video)
+    # Headers set on the injected response are only applied to content FastAPI
+    # serializes itself
+    (result if isinstance(result, Response) else response).headers.update(
+        validator_headers(video.id, video.version, video.updated_at or video.created_at)
+    )
+    return result
+
+
+def _get_video(db: Session, video_id: int) -> Video:
+    """Load a video, raising a 404 if it does not exist."""
     video = db.query(Video).filter(Video.id == video_id).first()
     if not video:
         raise HTTPException(
@@ -192,6 +404,64 @@ async def get_video_details(
     return video
 
 
+def _video_details_response(db: Session, video_id: int) -> Response:
+    """Build the details response of a video, to be cached."""
+    video = _get_video(db, video_id)
+    return Response(
+        model_json(VideoInDB, video),
+        headers=validator_headers(
+            video.id, video.version, video.updated_at or video.created_at
+        ),
+        media_type="application/json",
+    )
+
+
+@router.delete("/{video_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_video(
+    video_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> None:
+    """
+    Delete a video.
+
+    The database rows are removed immediately; the original upload and the HLS
+    output are deleted in the background, in bulk requests.
+
+    Args:
+        video_id: The ID of the video to delete.
+        db: Database session dependency.
+        current_user: The currently authenticated user.
+
+    Raises:
+        HTTPException: 404 if the video is not found or does not belong to the current user.
+
+    """
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video or (
+        video.owner_id != current_user.id and not current_user.is_superuser
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Video not found."
+        )
+
+    from app.tasks.cleanup import delete_video_objects, delete_video_rows
+
+    file_key = video.file_key
+    owner_id, file_size, created_at = video.owner_id, video.file_size, video.created_at
+    never_uploaded = video.status == VideoStatus.PENDING
+    delete_video_rows(db, [video_id])
+    if never_uploaded:
+        refund_upload_usage(db, video_id, owner_id, file_size, created_at)
+    db.commit()
+    invalidate(video_key(video_id))
+    release_upload(owner_id, file_size, created_at if never_uploaded else None)
+
+    # A transcode still running loses its lease and stops; any HLS objects it
+    # uploads afterwards are reclaimed by the garbage collector.
+    delete_video_objects.delay(video_id, file_key)
+
+
 @router.post("/{video_id}/tags/{tag_id}", response_model=VideoInDB)
 async def add_tag_to_video(
     video_id: int,
@@ -216,11 +486,14 @@ async def add_tag_to_video(
 
     if tag not in video.tags:
         video.tags.append(tag)
+        # Association rows don't update the video itself
+        video.version = Video.version + 1
         db.add(video)
         db.commit()
         db.refresh(video)
+        invalidate(video_key(video_id))
 
-    return video
+    return model_response(VideoInDB, video)
 
 
 @router.delete("/{video_id}/tags/{tag_id}", response_model=VideoInDB)
@@ -247,11 +520,14 @@ async def remove_tag_from_video(
 
     if tag in video.tags:
         video.tags.remove(tag)
+        # Association rows don't update the video itself
+        video.version = Video.version + 1
         db.add(video)
         db.commit()
         db.refresh(video)
+        invalidate(video_key(video_id))
 
-    return video
+    return model_response(VideoInDB, video)
 
 
 @router.post("/{video_id}/categories/{category_id}", response_model=VideoInDB)
@@ -278,11 +554,14 @@ async def add_category_to_video(
 
     if category not in video.categories:
         video.categories.append(category)
+        # Association rows don't update the video itself
+        video.version = Video.version + 1
         db.add(video)
         db.commit()
         db.refresh(video)
+        invalidate(video_key(video_id))
 
-    return video
+    return model_response(VideoInDB, video)
 
 
 @router.delete("/{video_id}/categories/{category_id}", response_model=VideoInDB)
@@ -309,8 +588,11 @@ async def remove_category_from_video(
 
     if category in video.categories:
         video.categories.remove(category)
+        # Association rows don't update the video itself
+        video.version = Video.version + 1
         db.add(video)
         db.commit()
         db.refresh(video)
+        invalidate(video_key(video_id))
 
-    return video
+    return model_response(VideoInDB, video)
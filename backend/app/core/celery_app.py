@@ -1,12 +1,131 @@
 from celery import Celery
+from celery.signals import (
+    setup_logging,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_ready,
+)
+from kombu import Queue
 
 from app.core.config import settings
+from app.core.logging import (
+    bind_log_context,
+    clear_log_context,
+    configure_logging,
+    stop_logging,
+)
+
+# Transcode queues. Workers subscribe to a subset with `-Q`, so short clips never
+# wait behind a backlog of long uploads.
+TRANSCODE_PRIORITY_QUEUE = "transcode.priority"
+TRANSCODE_SHORT_QUEUE = "transcode.short"
+TRANSCODE_LONG_QUEUE = "transcode.long"
 
 celery_app = Celery(
     "videoflow_worker",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.tasks.video_processing"],
+    include=["app.tasks.cleanup", "app.tasks.video_processing"],
+)
+
+celery_app.conf.update(
+    task_track_started=True,
+    task_queues=[
+        Queue("celery"),
+        Queue(TRANSCODE_PRIORITY_QUEUE),
+        Queue(TRANSCODE_SHORT_QUEUE),
+        Queue(TRANSCODE_LONG_QUEUE),
+    ],
+    task_default_queue="celery",
+    # Callers pick the transcode queue explicitly; this is only the fallback.
+    task_routes={
+        "app.tasks.video_processing.transcode_video": {"queue": TRANSCODE_SHORT_QUEUE}
+    },
+    # Transcodes are long-running; don't let a worker reserve jobs it can't start.
+    worker_prefetch_multiplier=1,
+    beat_schedule={
+        "collect-garbage": {
+            "task": "app.tasks.cleanup.collect_garbage",
+            "schedule": settings.GC_INTERVAL_SECONDS,
+        },
+        "enforce-original-lifecycle": {
+            "task": "app.tasks.cleanup.enforce_original_lifecycle",
+            "schedule": settings.GC_INTERVAL_SECONDS,
+        },
+    },
 )
 
-celery_app.conf.update(task_track_started=True)
+
+@setup_logging.connect
+def setup_worker_logging(**kwargs) -> None:
+    """Log JSON lines through the queue handler instead of Celery's own setup."""
+    configure_logging()
+
+
+@task_prerun.connect
+def bind_task_log_context(task_id: str, task, **kwargs) -> None:
+    """Tag the records logged while a task runs with its ID and name."""
+    bind_log_context(task_id=task_id, task=task.name)
+
+
+@task_postrun.connect
+def clear_task_log_context(**kwargs) -> None:
+    clear_log_context()
+
+
+@worker_process_init.connect
+def restart_logging(**kwargs) -> None:
+    """Drain the log queue from a thread of each worker process, after it is forked."""
+    configure_logging()
+
+
+@worker_process_shutdown.connect
+def flush_logging(**kwargs) -> None:
+    """Write out a worker process's queued records before it exits."""
+    stop_logging()
+
+
+@worker_process_init.connect
+def reset_database_pool(**kwargs) -> None:
+    """Open new database connections in each worker process, after it is forked."""
+    from app.core.database import dispose_engines
+
+    dispose_engines()
+
+
+@worker_process_init.connect
+def start_tracing(**kwargs) -> None:
+    """Set up tracing in each worker process, after it is forked."""
+    from app.core.tracing import configure_tracing
+
+    configure_tracing(f"{settings.TRACING_SERVICE_NAME}-worker")
+
+
+@worker_init.connect
+def clear_metrics_samples(**kwargs) -> None:
+    """Drop the samples of a previous run, before the pool processes are forked."""
+    if settings.METRICS_ENABLED:
+        from app.core.metrics import clear_stale_samples
+
+        clear_stale_samples()
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(**kwargs) -> None:
+    """Stop exporting the live samples of a worker process as it exits."""
+    if settings.METRICS_ENABLED:
+        from app.core.metrics import mark_process_dead
+
+        mark_process_dead()
+
+
+@worker_ready.connect
+def start_metrics_exporter(**kwargs) -> None:
+    """Start the worker's Prometheus exporter once it is ready."""
+    if settings.METRICS_ENABLED:
+        from app.core.metrics import start_worker_exporter
+
+        start_worker_exporter()
@@ -0,0 +1,120 @@
+"""
+Compression of API responses.
+
+JSON and playlist responses larger than `RESPONSE_COMPRESSION_MIN_BYTES` are
+compressed with Brotli when the client accepts it and the `brotli` package is
+installed, and with gzip otherwise. Smaller responses are not worth the CPU.
+Media segments and other binary responses are already compressed, and range
+responses must keep their byte offsets, so only the content types in
+`COMPRESSIBLE_CONTENT_TYPES` are compressed.
+
+The responders extend Starlette's gzip middleware, which handles streaming
+bodies and responses that already set a `Content-Encoding`.
+"""
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # Optional: responses fall back to gzip
+    brotli = None
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    "application/json",
+    "application/vnd.apple.mpegurl",
+    "text/",
+)
+
+
+def _accepted_encodings(scope: Scope) -> set[str]:
+    """Parse the encodings the client accepts, leaving out those with q=0."""
+    accepted = set()
+    for part in Headers(scope=scope).get("accept-encoding", "").split(","):
+        encoding, *params = (item.strip() for item in part.split(";"))
+        weights = [param[2:] for param in params if param.startswith("q=")]
+        try:
+            if weights and float(weights[0]) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(encoding.lower())
+    return accepted
+
+
+class _ContentTypeFilter:
+    """Leave responses whose content type is not compressible untouched."""
+
+    content_type_is_excluded: bool
+
+    async def send_with_compression(self, message: Message) -> None:
+        # The start message is held back until the first body message, so the
+        # exclusion still applies to this response
+        await super().send_with_compression(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+                self.content_type_is_excluded = True
+
+
+class _GZipResponder(_ContentTypeFilter, GZipResponder):
+    pass
+
+
+class _BrotliResponder(_ContentTypeFilter, IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        compressed = self.compressor.process(body)
+        if more_body:
+            return compressed + self.compressor.flush()
+        return compressed + self.compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with Brotli or gzip.
+
+    Args:
+        app: The ASGI application to wrap
+        minimum_size: Responses smaller than this many bytes are sent as is
+        gzip_level: gzip compression level, from 1 (fastest) to 9
+        brotli_quality: Brotli quality, from 0 (fastest) to 11
+
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encodings = _accepted_encodings(scope)
+        responder: ASGIApp
+        if brotli is not None and "br" in encodings:
+            responder = _BrotliResponder(
+                self.app, self.minimum_size, self.brotli_quality
+            )
+        elif "gzip" in encodings:
+            responder = _GZipResponder(
+                self.app, self.minimum_size, compresslevel=self.gzip_level
+            )
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -0,0 +1,141 @@
+"""
+Conditional requests.
+
+Video resources carry a weak ETag built from the video's ID and its `version`,
+which is incremented on every update of the row and whenever tags or
+categories are added to or removed from the video, and a `Last-Modified`
+header. A client revalidating its copy with `If-None-Match` (or, without it,
+`If-Modified-Since`) gets a 304 without a body when nothing changed, which the
+endpoints decide from a narrow query on the primary key before loading the
+video and its relationships, or from the validators cached with the response.
+
+The ETags are weak because the representation may vary with the encoding and
+the response settings while the resource stays the same.
+"""
+
+from collections.abc import Mapping
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import status
+from fastapi.responses import Response
+
+
+def weak_etag(resource_id: int, version: int) -> str:
+    """
+    Build the weak ETag of a version of a resource.
+
+    Args:
+        resource_id: The ID of the resource
+        version: Its version
+
+    Returns:
+        str: The ETag, e.g. `W/"42-3"`
+
+    """
+    return f'W/"{resource_id}-{version}"'
+
+
+def http_date(value: datetime) -> str:
+    """
+    Format a timestamp as an HTTP date.
+
+    Args:
+        value: The timestamp, naive ones being taken as UTC
+
+    Returns:
+        str: The date, e.g. `Fri, 15 Aug 2025 14:06:12 GMT`
+
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return format_datetime(value.astimezone(UTC), usegmt=True)
+
+
+def _opaque(etag: str) -> str:
+    # Weak comparison ignores the W/ prefix
+    return etag.strip().removeprefix("W/")
+
+
+def validator_headers(
+    resource_id: int, version: int, last_modified: datetime | None
+) -> dict[str, str]:
+    """
+    Build the headers letting clients cache a version of a resource.
+
+    Args:
+        resource_id: The ID of the resource
+        version: Its version
+        last_modified: When it was last modified, if known
+
+    Returns:
+        dict[str, str]: The `ETag`, `Last-Modified` and `Cache-Control` headers
+
+    """
+    headers = {
+        "ETag": weak_etag(resource_id, version),
+        # Cached copies must be revalidated, and only by the client
+        "Cache-Control": "private, no-cache",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_not_modified(
+    validators: Mapping[str, str],
+    if_none_match: str | None,
+    if_modified_since: str | None,
+) -> bool:
+    """
+    Check whether the client's copy of a resource is current.
+
+    `If-Modified-Since` is only considered without `If-None-Match`, as
+    RFC 9110 requires.
+
+    Args:
+        validators: The resource's current `ETag` and, if known,
+            `Last-Modified` headers
+        if_none_match: The `If-None-Match` request header
+        if_modified_since: The `If-Modified-Since` request header
+
+    Returns:
+        bool: True if a 304 should be returned
+
+    """
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        current = _opaque(validators["ETag"])
+        return any(_opaque(tag) == current for tag in if_none_match.split(","))
+
+    last_modified = validators.get("Last-Modified")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        # Invalid dates are ignored
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    return parsedate_to_datetime(last_modified) <= since
+
+
+def not_modified(validators: Mapping[str, str]) -> Response:
+    """
+    Build the 304 response confirming the client's copy is current.
+
+    Args:
+        validators: The headers of the full response
+
+    Returns:
+        Response: An empty 304 response repeating the caching headers
+
+    """
+    headers = {
+        name: validators[name]
+        for name in ("ETag", "Last-Modified", "Cache-Control")
+        if name in validators
+    }
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -1,4 +1,7 @@
+import os
+import tempfile
 from functools import lru_cache
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 
@@ -28,18 +31,43 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
+    # Full SQLAlchemy URL overriding the POSTGRES_* settings (e.g. SQLite for
+    # offline benchmarks)
+    DATABASE_URL: str | None = None
+    # Read replicas serving the read-only endpoints, used round-robin; reads go
+    # to the primary when empty
+    DATABASE_READ_REPLICA_URLS: list[str] = []
+
+    # Database connection pool, per process (each API worker and each Celery
+    # worker process has its own)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    # Test connections on checkout, and replace those older than the recycle
+    # time, so connections dropped by the server or a proxy are never handed out
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    # Abort statements running longer than this (0 disables the limit)
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    # Connect through PgBouncer in transaction pooling mode: PgBouncer does the
+    # pooling, so connections are not kept client-side, and the statement
+    # timeout is set per transaction since PgBouncer rejects startup options
+    DB_PGBOUNCER: bool = False
 
     @property
     def database_url(self) -> str:
         """
         Construct and return the database connection URL.
 
-        Combines the database connection parameters into a valid SQLAlchemy URL.
+        Combines the database connection parameters into a valid SQLAlchemy URL,
+        unless `DATABASE_URL` is set.
 
         Returns:
             str: A SQLAlchemy-compatible database URL
 
         """
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
 
     # JWT
@@ -57,11 +85,196 @@ class Settings(BaseSettings):
     MINIO_ACCESS_KEY: str
     MINIO_SECRET_KEY: str
     MINIO_BUCKET_NAME: str
+    # Fixed region, so presigned URLs are computed without a bucket-location lookup
+    MINIO_REGION: str = "us-east-1"
+
+    # Object storage
+    # "minio" for MinIO/S3, or "local" to keep objects on the local filesystem
+    # (single-box CI and performance runs)
+    STORAGE_BACKEND: Literal["minio", "local"] = "minio"
+    STORAGE_LOCAL_ROOT: str = os.path.join(tempfile.gettempdir(), "videoflow-storage")
+    # Public URL of the API's local storage endpoint, used in presigned URLs
+    STORAGE_LOCAL_URL: str = "http://localhost:8000/api/v1/storage"
+    # Files larger than this are uploaded in parts of this size
+    STORAGE_MULTIPART_PART_SIZE: int = 64 * 1024 * 1024  # 64MB
+    # Keys per bulk delete request (the S3 DeleteObjects maximum)
+    STORAGE_DELETE_BATCH_SIZE: int = 1000
+    # How long presigned upload forms stay valid
+    UPLOAD_URL_EXPIRE_SECONDS: int = 3600
+    # Prefix the cold tier of originals is stored under. On MinIO, attach an ILM
+    # transition rule to it to move the objects to a cheaper remote tier.
+    STORAGE_COLD_PREFIX: str = "cold/"
+
+    # Lifecycle of originals once their video is processed: "keep" them hot,
+    # move them to the "cold" tier, or "delete" them once a mezzanine exists
+    ORIGINAL_LIFECYCLE_POLICY: Literal["keep", "cold", "delete"] = "keep"
+    ORIGINAL_LIFECYCLE_AFTER_DAYS: int = 30
+    # Make transcodes also encode the mezzanine the "delete" policy requires. It
+    # is a near-lossless encode at the source resolution, about as costly as
+    # all the renditions together.
+    ORIGINAL_MEZZANINE_ENABLED: bool = False
+
+    # Garbage collection of abandoned uploads and orphaned objects
+    GC_INTERVAL_SECONDS: int = 3600
+    # Extra time after an upload form or a failed transcode expires before its
+    # objects are reclaimed
+    GC_GRACE_SECONDS: int = 3600
+    # Rows or prefixes handled per batch, batches per run, and pause between
+    # batches, so a run never puts a sustained load on Postgres or MinIO
+    GC_BATCH_SIZE: int = 500
+    GC_MAX_BATCHES: int = 10
+    GC_BATCH_PAUSE_SECONDS: float = 0.5
+
+    # Playback
+    # Presigned HLS URLs are issued per window of this length and stay valid for
+    # at least one more window
+    PLAYBACK_URL_TTL_SECONDS: int = 3600
+    # Number of rewritten playlists memoized per process
+    PLAYBACK_CACHE_SIZE: int = 1024
+    # Serve HLS segments through the API from an on-disk cache in front of MinIO,
+    # for deployments without a CDN
+    EDGE_CACHE_ENABLED: bool = False
+    EDGE_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "videoflow-edge-cache")
+    # Disk used by the cache on each host, split evenly between the API processes
+    # sharing EDGE_CACHE_DIR (by default, the server's WEB_CONCURRENCY)
+    EDGE_CACHE_MAX_BYTES: int = 10 * 1024 * 1024 * 1024  # 10GB
+    EDGE_CACHE_PROCESSES: int = int(os.environ.get("WEB_CONCURRENCY", "1"))
 
     # Celery
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
 
+    # Transcoding
+    # How long a worker's claim on a video lasts without being renewed. The job
+    # renews it every third of this, so it bounds how long a video stays claimed
+    # by a worker that died.
+    TRANSCODE_LEASE_SECONDS: int = 1800
+    # Videos up to this duration (or, before they are probed, this file size) are
+    # routed to the short-clip queue; longer ones go to the long queue.
+    TRANSCODE_SHORT_MAX_SECONDS: int = 300
+    TRANSCODE_SHORT_MAX_BYTES: int = 200 * 1024 * 1024
+    # Directory holding each job's source and renditions while it is transcoded
+    TRANSCODE_SCRATCH_DIR: str = os.path.join(tempfile.gettempdir(), "videoflow")
+    # Scratch space reserved per job, as a multiple of the source file size
+    TRANSCODE_SCRATCH_FACTOR: float = 3.0
+    TRANSCODE_MIN_FREE_MEMORY_BYTES: int = 512 * 1024 * 1024
+    TRANSCODE_MAX_FFMPEG_THREADS: int = 4
+    # Delay before a job rejected by a saturated node is retried
+    TRANSCODE_ADMISSION_RETRY_SECONDS: int = 30
+    # Remux sources that already fit the top rendition instead of re-encoding them
+    TRANSCODE_REMUX_ENABLED: bool = True
+
+    # Autoscaling signal
+    # How long a measured transcode backlog is reused, so frequent scrapes of
+    # /metrics or /admin/backlog don't load Postgres, the broker or the workers
+    BACKLOG_CACHE_SECONDS: float = 5
+    # Bitrate (bits per second) assumed to estimate the duration of videos not
+    # probed yet from their file size
+    BACKLOG_ASSUMED_BITRATE: int = 5_000_000
+    # Window over which the throughput of the transcode fleet is measured
+    BACKLOG_THROUGHPUT_WINDOW_SECONDS: int = 900
+    # How long to wait for workers to report the queues they consume
+    BACKLOG_INSPECT_TIMEOUT_SECONDS: float = 1.0
+
+    # Readiness
+    # How often the API checks the database, broker and storage in the
+    # background, and how long each check may take before it counts as failed
+    READINESS_INTERVAL_SECONDS: float = 10
+    READINESS_TIMEOUT_SECONDS: float = 2
+
+    # Responses
+    # Encode JSON with orjson, and serialize ORM rows through their response
+    # model in one pass instead of letting FastAPI validate them again
+    FAST_JSON_ENABLED: bool = False
+    # Compress JSON and playlist responses of at least this many bytes, with
+    # Brotli when the client accepts it and the brotli package is installed,
+    # otherwise gzip
+    RESPONSE_COMPRESSION_ENABLED: bool = False
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_BROTLI_QUALITY: int = 4
+    # Most videos a single batch details request may ask for
+    VIDEO_BATCH_MAX_IDS: int = 100
+
+    # Response cache
+    # Cache video details and the tag and category lists, serialized, in a
+    # per-process LRU in front of Redis. The API processes and the workers must
+    # agree on this setting, since both invalidate entries.
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_REDIS_URL: str = "redis://localhost:6379/1"
+    RESPONSE_CACHE_TTL_SECONDS: int = 300
+    # Per-process entries are also dropped by invalidations received through
+    # pub/sub; their TTL bounds how stale they get while the subscription is down
+    RESPONSE_CACHE_LOCAL_SIZE: int = 1024
+    RESPONSE_CACHE_LOCAL_TTL_SECONDS: float = 5
+    # How long other processes wait for the one filling a missing entry before
+    # loading it themselves
+    RESPONSE_CACHE_LOCK_SECONDS: float = 5
+    # Redis calls slower than this fail, and Redis is then bypassed for the
+    # retry interval, so an outage only costs the cache
+    RESPONSE_CACHE_REDIS_TIMEOUT_SECONDS: float = 0.1
+    RESPONSE_CACHE_RETRY_SECONDS: float = 5
+
+    # Rate limits and upload quotas, kept in Redis
+    LIMITS_REDIS_URL: str = "redis://localhost:6379/1"
+    # Redis calls slower than this fail, and limits are then not enforced for
+    # the retry interval rather than failing requests
+    LIMITS_REDIS_TIMEOUT_SECONDS: float = 0.05
+    LIMITS_RETRY_SECONDS: float = 5
+    # Requests per minute each user may make to a route, in bursts of up to as
+    # many, and for some routes all users together
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_UPLOAD_REQUESTS_PER_MINUTE: int = 10
+    RATE_LIMIT_UPLOAD_REQUESTS_GLOBAL_PER_MINUTE: int = 600
+    RATE_LIMIT_UPLOAD_CONFIRMATIONS_PER_MINUTE: int = 30
+    RATE_LIMIT_VIDEO_READS_PER_MINUTE: int = 600
+    # Bytes of uploads each user may store, and minutes of video they may submit
+    # for transcoding per calendar month (0 for no limit). Superusers are exempt.
+    QUOTAS_ENABLED: bool = False
+    QUOTA_STORAGE_BYTES: int = 100 * 1024 * 1024 * 1024  # 100GB
+    QUOTA_TRANSCODE_MINUTES_PER_MONTH: int = 6000
+    # Usage counters are rebuilt from the database when they expire, which
+    # corrects any drift, e.g. from uploads accepted while Redis was down
+    QUOTA_COUNTER_TTL_SECONDS: int = 86400
+
+    # Metrics
+    # Record Prometheus metrics and serve them at /metrics
+    METRICS_ENABLED: bool = True
+    # Port of the exporter each Celery worker starts
+    METRICS_WORKER_PORT: int = 9808
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    # Records waiting to be written; further records are dropped while it is full
+    LOG_QUEUE_SIZE: int = 10000
+    # Keep one in this many per-segment upload records
+    LOG_SEGMENT_SAMPLE_EVERY: int = 50
+    # Lines of ffmpeg output kept, and attached to the log if the encode fails
+    LOG_FFMPEG_STDERR_LINES: int = 200
+
+    # Profiling
+    # Where on-demand profiles are written: "local" to PROFILE_DIR, or "storage"
+    # under PROFILE_STORAGE_PREFIX in the bucket
+    PROFILE_OUTPUT: Literal["local", "storage"] = "local"
+    PROFILE_DIR: str = os.path.join(tempfile.gettempdir(), "videoflow-profiles")
+    PROFILE_STORAGE_PREFIX: str = "profiles/"
+    # Sampling interval of the profiler
+    PROFILE_INTERVAL_SECONDS: float = 0.001
+
+    # Tracing
+    # Trace requests and transcodes with OpenTelemetry
+    TRACING_ENABLED: bool = False
+    TRACING_SERVICE_NAME: str = "videoflow"
+    # "otlp" to send spans to TRACING_OTLP_ENDPOINT, or "file" to append them as
+    # JSON lines to TRACING_FILE_PATH
+    TRACING_EXPORTER: Literal["otlp", "file"] = "otlp"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_FILE_PATH: str = os.path.join(
+        tempfile.gettempdir(), "videoflow-traces.jsonl"
+    )
+    # Share of new traces that are recorded
+    TRACING_SAMPLE_RATIO: float = 1.0
+
     # CORS
     BACKEND_CORS_ORIGINS: list[str] = ["*"]
 
@@ -5,35 +5,119 @@ This module provides database connection setup, session management, and
 initialization utilities for the application's SQLAlchemy ORM.
 """
 
+import itertools
 from collections.abc import Generator
 from contextlib import contextmanager
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
 
 from .config import settings
 
+
+def create_database_engine(url: str) -> Engine:
+    """
+    Create an engine for `url` with the pool configured in settings.
+
+    Args:
+        url: SQLAlchemy database URL
+
+    Returns:
+        Engine: The engine
+
+    """
+    if url.startswith("sqlite"):
+        # SQLite (used by the offline benchmarks) is shared with the threadpool
+        return create_engine(url, connect_args={"check_same_thread": False})
+
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if settings.DB_PGBOUNCER:
+        engine = create_engine(url, poolclass=NullPool)
+        if timeout:
+
+            @event.listens_for(engine, "begin")
+            def set_statement_timeout(connection) -> None:
+                connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout}")
+
+        return engine
+
+    return create_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        connect_args={"options": f"-c statement_timeout={timeout}"} if timeout else {},
+    )
+
+
 # Create database engine using the database URL from settings
 SQLALCHEMY_DATABASE_URL = settings.database_url
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_database_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+read_engines = [
+    create_database_engine(url) for url in settings.DATABASE_READ_REPLICA_URLS
+]
+_next_read_engine = itertools.cycle(read_engines or [engine])
+
 Base = declarative_base()
 
 
-@contextmanager
 def get_db() -> Generator[Session, None, None]:
     """
-    Dependency for getting a database session.
+    Dependency for getting a session on the primary database.
+
+    Endpoints that write, or that must see their own writes, use this session.
+
+    Yields:
+        Session: A SQLAlchemy database session
+
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """
+    Dependency for getting a read-only session on a read replica.
+
+    Falls back to the primary when no replica is configured. Replicas may lag
+    behind the primary, so only endpoints that can serve slightly stale data
+    use this session.
+
+    Yields:
+        Session: A SQLAlchemy database session
+
+    """
+    db = SessionLocal(bind=next(_next_read_engine))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@contextmanager
+def session_scope() -> Generator[Session, None, None]:
+    """
+    Open a session on the primary database for the duration of a block.
+
+    Used outside of requests, e.g. by Celery tasks.
 
     Yields:
         Session: A SQLAlchemy database session
 
     Example:
         ```python
-        with get_db() as db:
+        with session_scope() as db:
             # Use the database session
             users = db.query(User).all()
         ```
@@ -46,6 +130,17 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def dispose_engines() -> None:
+    """
+    Drop the pooled connections inherited from a parent process.
+
+    Called in each forked worker process, so it opens its own connections
+    instead of sharing the parent's sockets.
+    """
+    for inherited in [engine, *read_engines]:
+        inherited.dispose(close=False)
+
+
 def init_db() -> None:
     """
     Initialize the database with all defined models.
@@ -73,11 +168,13 @@ def init_db() -> None:
     # Import all models here to ensure they are registered with SQLAlchemy
     from app.models.category import Category  # noqa: F401
     from app.models.tag import Tag  # noqa: F401
+    from app.models.transcode_checkpoint import TranscodeCheckpoint  # noqa: F401
     from app.models.user import User  # noqa: F401
     from app.models.video import Video  # noqa: F401
     from app.models.video_category_association import (
         video_category_association,  # noqa: F401
     )
+    from app.models.video_status_event import VideoStatusEvent  # noqa: F401
     from app.models.video_tag_association import video_tag_association  # noqa: F401
 
     # Create all tables
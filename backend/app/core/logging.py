@@ -0,0 +1,229 @@
+"""
+Structured logging for the API and the Celery workers.
+
+Records are written as one JSON object per line, carrying the context bound
+with `log_context` (e.g. video_id, task_id and stage of a transcode job).
+Handlers only put records on a bounded in-memory queue, which a background
+thread drains to stdout, so logging never blocks the code emitting it; records
+are dropped if the queue is full, counted in `log_records_dropped_total`, and
+reported by a warning once the queue has room again. Each process has its own
+queue and thread: processes forked after logging was configured (e.g. Celery's
+prefork children) must call `configure_logging` again.
+
+High-volume events (e.g. one per uploaded segment) pass `sample_every` in
+`extra`, and only the first of every that many records with the same message
+template is kept.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import sys
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import BinaryIO
+
+from app.core.config import settings
+from app.core.metrics import LOG_RECORDS_DROPPED
+
+_log_context: ContextVar[dict] = ContextVar("log_context", default={})
+
+# Attributes of every LogRecord; anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "context"}
+
+_listener: QueueListener | None = None
+# Process that started `_listener`; a forked child inherits it without its thread
+_listener_pid: int | None = None
+
+
+@contextmanager
+def log_context(**fields) -> Iterator[None]:
+    """
+    Add fields to every record logged within the block.
+
+    Args:
+        **fields: The fields to add
+
+    """
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def bind_log_context(**fields) -> None:
+    """
+    Add fields to every record logged from now on in the current context.
+
+    Args:
+        **fields: The fields to add
+
+    """
+    _log_context.set({**_log_context.get(), **fields})
+
+
+def clear_log_context() -> None:
+    """Remove all the fields bound in the current context."""
+    _log_context.set({})
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "context", {}),
+        }
+        entry.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Attach the current log context to records, in the emitting thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.context = _log_context.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in `sample_every` records sharing a message template."""
+
+    def __init__(self):
+        super().__init__()
+        self._counters: dict[tuple[str, str], itertools.count] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = getattr(record, "sample_every", None)
+        if not every or every <= 1:
+            return True
+        key = (record.name, str(record.msg))
+        counter = self._counters.setdefault(key, itertools.count())
+        return next(counter) % every == 0
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that drops records instead of blocking when the queue is full.
+
+    The first record queued after some were dropped is preceded by a warning
+    saying how many.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self._unreported:
+                self.queue.put_nowait(self._dropped_warning())
+                self._unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+            LOG_RECORDS_DROPPED.inc()
+
+    def _dropped_warning(self) -> logging.LogRecord:
+        record = logging.makeLogRecord(
+            {
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": "Dropped %d log records, the log queue was full",
+                "args": (self._unreported,),
+            }
+        )
+        return self.prepare(record)
+
+
+class RingBuffer:
+    """Keep the last lines of a stream, e.g. a subprocess's stderr."""
+
+    def __init__(self, max_lines: int):
+        self._lines: deque[str] = deque(maxlen=max_lines)
+
+    def feed(self, stream: BinaryIO, chunk_size: int = 64 * 1024) -> None:
+        """
+        Read a binary stream to its end, keeping its last lines.
+
+        Carriage returns also end a line, since ffmpeg rewrites its progress line
+        with them; a single line is truncated to `chunk_size` bytes.
+
+        Args:
+            stream: The stream to read
+            chunk_size: Number of bytes read at a time
+
+        """
+        partial = b""
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            *lines, partial = re.split(rb"[\r\n]", partial + chunk)
+            self._lines.extend(
+                line.decode(errors="replace") for line in lines if line.strip()
+            )
+            partial = partial[-chunk_size:]
+        if partial.strip():
+            self._lines.append(partial.decode(errors="replace"))
+
+    def __str__(self) -> str:
+        return "\n".join(self._lines)
+
+
+def configure_logging() -> None:
+    """
+    Route the root logger's records through a queue to JSON lines on stdout.
+
+    Calling it again in the same process is a no-op; in a process forked since,
+    it replaces the inherited queue, whose draining thread was not forked.
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    handler.addFilter(ContextFilter())
+    handler.setFormatter(JsonFormatter())
+    # The queue handler already rendered the JSON line
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(logging.Formatter("%(message)s"))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL)
+    if _listener_pid is None:
+        atexit.register(stop_logging)
+    _listener = QueueListener(log_queue, output)
+    _listener_pid = os.getpid()
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Write out the queued records and stop the thread draining them."""
+    global _listener
+    # A forked child can't stop its parent's thread
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,300 @@
+"""
+Prometheus metrics for the API, the transcode pipeline and storage I/O.
+
+The API serves its metrics at `/metrics`; Celery workers start an exporter on
+`METRICS_WORKER_PORT` once they are ready. Recording is limited to in-memory
+counter and histogram updates, so it stays on at full traffic; the series that
+need I/O (the transcode backlog and queue lengths, scratch disk usage) are only
+computed when scraped. Queue lengths are reported by the API alone, as part of
+the backlog, so a scrape of every worker doesn't query the broker again.
+
+Processes forked by a prefork worker or a multi-process API server must share
+their samples through `PROMETHEUS_MULTIPROC_DIR`, an empty directory set in the
+environment before the processes start: each process then writes its samples
+to files there, and the exporter merges them. Workers delete the files left by
+earlier runs when they start, and mark their processes dead as they exit.
+"""
+
+import logging
+import os
+import shutil
+import time
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Media and storage stages last from milliseconds to tens of minutes
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Latency of API requests",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries issued per API request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+HTTP_REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries per API request",
+    ["route"],
+)
+TRANSCODE_STAGE_DURATION = Histogram(
+    "transcode_stage_duration_seconds",
+    "Duration of transcode pipeline stages",
+    ["stage", "rendition"],
+    buckets=STAGE_BUCKETS,
+)
+FFMPEG_SPEED = Histogram(
+    "ffmpeg_speed_ratio",
+    "Seconds of media encoded per second of wall time",
+    ["rendition"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64),
+)
+STORAGE_BYTES = Counter(
+    "storage_transferred_bytes",
+    "Bytes moved to and from object storage",
+    ["direction"],
+)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "response_cache_lookups",
+    "Lookups in the response cache, by level (local or redis) and result",
+    ["level", "result"],
+)
+RESPONSE_CACHE_INVALIDATIONS = Counter(
+    "response_cache_invalidations",
+    "Response cache entries invalidated",
+)
+RATE_LIMITED_REQUESTS = Counter(
+    "rate_limited_requests",
+    "Requests rejected by a rate limit",
+    ["scope"],
+)
+QUOTA_REJECTED_UPLOADS = Counter(
+    "quota_rejected_uploads",
+    "Upload requests rejected by a quota",
+    ["quota"],
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped",
+    "Log records dropped because the log queue was full",
+)
+
+logger = logging.getLogger(__name__)
+
+_request_queries: ContextVar[list | None] = ContextVar("request_queries", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    if _request_queries.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    queries = _request_queries.get()
+    if queries is not None and conn.info.get("query_start"):
+        queries[0] += 1
+        queries[1] += time.perf_counter() - conn.info["query_start"].pop()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency and database usage of each request.
+
+    Requests are labelled by route template rather than path, so the number of
+    series stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        queries = [0, 0.0]
+        reset = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(reset)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], route, str(status_code)
+            ).observe(elapsed)
+            HTTP_REQUEST_DB_QUERIES.labels(route).observe(queries[0])
+            HTTP_REQUEST_DB_DURATION.labels(route).observe(queries[1])
+
+
+def record_storage_transfer(direction: str, size: int) -> None:
+    """
+    Count bytes moved to ("upload") or from ("download") object storage.
+
+    Args:
+        direction: "upload" or "download"
+        size: Number of bytes moved
+
+    """
+    STORAGE_BYTES.labels(direction).inc(size)
+
+
+class BacklogCollector(Collector):
+    """Report the transcode backlog and the time to drain it when scraped."""
+
+    def collect(self):
+        from app.services.backlog import get_transcode_backlog
+
+        try:
+            backlog = get_transcode_backlog()
+        except Exception as e:
+            logger.warning("Could not measure the transcode backlog: %s", e)
+            return
+
+        videos = GaugeMetricFamily(
+            "transcode_backlog_videos",
+            "Videos waiting for or in a transcode",
+            labels=["status"],
+        )
+        videos.add_metric(["uploaded"], backlog.uploaded)
+        videos.add_metric(["processing"], backlog.processing)
+        yield videos
+        yield GaugeMetricFamily(
+            "transcode_backlog_media_seconds",
+            "Media seconds held by the videos waiting for or in a transcode",
+            value=backlog.outstanding_media_seconds,
+        )
+        yield GaugeMetricFamily(
+            "transcode_throughput_media_seconds",
+            "Media seconds transcoded per second by the fleet, recently",
+            value=backlog.throughput,
+        )
+        if backlog.drain_seconds is not None:
+            yield GaugeMetricFamily(
+                "transcode_backlog_drain_seconds",
+                "Time the current fleet needs to clear the backlog",
+                value=backlog.drain_seconds,
+            )
+        workers = GaugeMetricFamily(
+            "transcode_workers", "Workers consuming a Celery queue", labels=["queue"]
+        )
+        for queue, count in backlog.workers.items():
+            workers.add_metric([queue], count)
+        yield workers
+        queue_lengths = GaugeMetricFamily(
+            "transcode_queue_length",
+            "Messages waiting in a Celery queue",
+            labels=["queue"],
+        )
+        for queue, length in backlog.queue_lengths.items():
+            queue_lengths.add_metric([queue], length)
+        yield queue_lengths
+
+
+# Collected by the API on scrape, in addition to the registry of its own samples
+BACKLOG_REGISTRY = CollectorRegistry()
+BACKLOG_REGISTRY.register(BacklogCollector())
+
+
+class ScratchDiskCollector(Collector):
+    """Report usage of the transcode scratch directory's filesystem when scraped."""
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "transcode_scratch_disk_bytes",
+            "Usage of the filesystem holding TRANSCODE_SCRATCH_DIR",
+            labels=["kind"],
+        )
+        path = settings.TRANSCODE_SCRATCH_DIR
+        while not os.path.exists(path):
+            path = os.path.dirname(path)
+        usage = shutil.disk_usage(path)
+        family.add_metric(["used"], usage.used)
+        family.add_metric(["free"], usage.free)
+        family.add_metric(["total"], usage.total)
+        yield family
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    Return the registry to expose, merging forked processes' samples if needed.
+
+    Returns:
+        CollectorRegistry: The registry holding this process's metrics
+
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def clear_stale_samples() -> None:
+    """Delete the samples left in `PROMETHEUS_MULTIPROC_DIR` by other processes."""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        return
+    own = f"_{os.getpid()}.db"
+    for name in os.listdir(path):
+        if name.endswith(".db") and not name.endswith(own):
+            os.remove(os.path.join(path, name))
+
+
+def mark_process_dead() -> None:
+    """Stop reporting the live gauges of the current, exiting, process."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def render_metrics(*registries: CollectorRegistry) -> tuple[bytes, str]:
+    """
+    Render registries in the Prometheus text format.
+
+    Args:
+        *registries: The registries to render
+
+    Returns:
+        tuple[bytes, str]: The exposition and its content type
+
+    """
+    return b"".join(generate_latest(r) for r in registries), CONTENT_TYPE_LATEST
+
+
+def start_worker_exporter() -> None:
+    """Serve the metrics of the worker's processes and scratch disk."""
+    registry = get_registry()
+    registry.register(ScratchDiskCollector())
+    start_http_server(settings.METRICS_WORKER_PORT, registry=registry)
+    logger.info("Serving worker metrics on port %d", settings.METRICS_WORKER_PORT)
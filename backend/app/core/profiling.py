@@ -0,0 +1,311 @@
+"""
+On-demand profiling of API requests and transcode tasks.
+
+Profiles are taken with pyinstrument, a sampling profiler, and rendered as its
+interactive HTML call tree/flame chart. They are written to `PROFILE_DIR`, or
+under `PROFILE_STORAGE_PREFIX` in the bucket when `PROFILE_OUTPUT` is
+"storage". pyinstrument is only imported when a profile is requested, and code
+paths that are not being profiled only check a flag.
+
+Requests are profiled by `ProfilingMiddleware`, around the whole ASGI call, so
+the profile follows the request across its awaits and the profile name can be
+added to whatever response the endpoint returns. A sampling profiler only sees
+its own thread, so routes using `ProfiledRoute` also sample their sync endpoints
+in the threadpool worker running them, and the samples are merged into the
+request's profile.
+
+Task profiles also record the CPU time of each ffmpeg child process, which a
+Python profiler cannot see, in a JSON file next to the HTML one.
+"""
+
+import functools
+import inspect
+import json
+import os
+import resource
+import time
+import uuid
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from typing import Any, Literal
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Request header (or query parameter) asking for the request to be profiled
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAMETER = "profile"
+
+
+@dataclass
+class ChildCpuTime:
+    """CPU time of a child process, e.g. one ffmpeg run."""
+
+    label: str
+    wall_seconds: float
+    user_seconds: float
+    system_seconds: float
+
+
+@dataclass
+class TaskProfile:
+    """Child process CPU times collected while a task is profiled."""
+
+    name: str
+    children: list[ChildCpuTime] = field(default_factory=list)
+
+
+_task_profile: ContextVar[TaskProfile | None] = ContextVar("task_profile", default=None)
+# pyinstrument sessions sampled in worker threads for the request being profiled
+_thread_sessions: ContextVar[list | None] = ContextVar("thread_sessions", default=None)
+
+
+def profile_name(kind: str) -> str:
+    """
+    Return a unique, sortable base name for a new profile.
+
+    Args:
+        kind: What is profiled, e.g. "request" or "transcode-42"
+
+    Returns:
+        str: The profile name
+
+    """
+    timestamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S")
+    return f"{timestamp}-{kind}-{uuid.uuid4().hex[:8]}"
+
+
+def save_profile(name: str, data: bytes, content_type: str) -> str:
+    """
+    Write a profile to `PROFILE_DIR` or under `PROFILE_STORAGE_PREFIX`.
+
+    Args:
+        name: File name of the profile
+        data: The profile contents
+        content_type: MIME type of the profile
+
+    Returns:
+        str: Path or object name the profile was written to
+
+    """
+    if settings.PROFILE_OUTPUT == "storage":
+        from app.services.storage import get_storage
+
+        object_name = f"{settings.PROFILE_STORAGE_PREFIX}{name}"
+        get_storage().put_bytes(object_name, data, content_type)
+        return object_name
+
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILE_DIR, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+@contextmanager
+def profile(
+    name: str,
+    async_mode: Literal["enabled", "disabled", "strict"] = "disabled",
+    thread_sessions: list | None = None,
+) -> Iterator[None]:
+    """
+    Sample the current thread for the duration of the block and save the profile.
+
+    Args:
+        name: Base name of the profile
+        async_mode: pyinstrument's async mode; "enabled" follows the task that
+            started the profile across its awaits, and attributes the time it
+            spends waiting to the awaiting frame
+        thread_sessions: Sessions sampled in other threads during the block, to
+            merge into the profile
+
+    """
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer
+    from pyinstrument.session import Session
+
+    profiler = Profiler(
+        interval=settings.PROFILE_INTERVAL_SECONDS, async_mode=async_mode
+    )
+    profiler.start()
+    try:
+        yield
+    finally:
+        session = profiler.stop()
+        for thread_session in thread_sessions or []:
+            session = Session.combine(session, thread_session)
+        save_profile(
+            f"{name}.html", HTMLRenderer().render(session).encode(), "text/html"
+        )
+
+
+def profile_in_worker_thread(call: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a sync function to be sampled in the thread it runs in, when the
+    request calling it is profiled.
+
+    Args:
+        call: The function, e.g. a sync endpoint run in the threadpool
+
+    Returns:
+        Callable[..., Any]: The wrapped function, with the same signature
+
+    """
+
+    @functools.wraps(call)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        sessions = _thread_sessions.get()
+        if sessions is None:
+            return call(*args, **kwargs)
+
+        from pyinstrument import Profiler
+
+        # Not async, or pyinstrument would see the request's profiler in the
+        # context copied into the thread and refuse to start
+        profiler = Profiler(
+            interval=settings.PROFILE_INTERVAL_SECONDS, async_mode="disabled"
+        )
+        profiler.start()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            sessions.append(profiler.stop())
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route whose sync endpoint is sampled in its threadpool worker when the
+    request is profiled by `ProfilingMiddleware`.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = profile_in_worker_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling the requests a superuser asks to profile.
+
+    The `X-Profile` header or the `profile` query parameter turns profiling on,
+    and the name of the saved profile is returned in the `X-Profile` response
+    header. Other requests only pay for the flag lookup. Sync endpoints of
+    `ProfiledRoute` routes are sampled in their worker thread; other code run in
+    the threadpool, such as sync dependencies, only shows as the time the
+    request waits for it. `authorize` raises an HTTPException unless the
+    request may be profiled.
+    """
+
+    def __init__(self, app: ASGIApp, authorize: Callable[[Request], Awaitable[None]]):
+        self.app = app
+        self.authorize = authorize
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        if not (
+            request.headers.get(PROFILE_HEADER)
+            or request.query_params.get(PROFILE_QUERY_PARAMETER)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.authorize(request)
+        except HTTPException as e:
+            response = JSONResponse(
+                {"detail": e.detail}, status_code=e.status_code, headers=e.headers
+            )
+            await response(scope, receive, send)
+            return
+
+        name = profile_name("request")
+        # Lets endpoints profile the work they enqueue as well
+        request.state.profile = True
+
+        async def send_with_profile(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(PROFILE_HEADER, name)
+            await send(message)
+
+        # Copied into the threadpool calls along with the rest of the context
+        sessions: list = []
+        token = _thread_sessions.set(sessions)
+        try:
+            with profile(name, async_mode="enabled", thread_sessions=sessions):
+                await self.app(scope, receive, send_with_profile)
+        finally:
+            _thread_sessions.reset(token)
+
+
+@contextmanager
+def profile_task(name: str) -> Iterator[TaskProfile]:
+    """
+    Profile a task, including the CPU time of the child processes it runs.
+
+    Args:
+        name: Base name of the profile
+
+    Yields:
+        TaskProfile: The child process times collected so far
+
+    """
+    task_profile = TaskProfile(name=name)
+    token = _task_profile.set(task_profile)
+    try:
+        with profile(name):
+            yield task_profile
+    finally:
+        _task_profile.reset(token)
+        save_profile(
+            f"{name}.children.json",
+            json.dumps(asdict(task_profile), indent=2).encode(),
+            "application/json",
+        )
+
+
+@contextmanager
+def child_cpu_time(label: str) -> Iterator[None]:
+    """
+    Record the CPU time of the child processes waited for within the block.
+
+    Does nothing unless the current task is being profiled.
+
+    Args:
+        label: What the child processes do, e.g. "encode:720p"
+
+    """
+    task_profile = _task_profile.get()
+    if task_profile is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    try:
+        yield
+    finally:
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        task_profile.children.append(
+            ChildCpuTime(
+                label=label,
+                wall_seconds=time.perf_counter() - start,
+                user_seconds=after.ru_utime - before.ru_utime,
+                system_seconds=after.ru_stime - before.ru_stime,
+            )
+        )
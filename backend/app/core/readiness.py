@@ -0,0 +1,151 @@
+"""
+Readiness of the services the API depends on.
+
+Startup does not wait for Postgres, the broker or the bucket: the API serves
+requests as soon as it is imported, and a background task started by the
+application's lifespan checks each dependency every
+`READINESS_INTERVAL_SECONDS`. `/health` only reports that the process is alive,
+while `/ready` reports the last checks, so a load balancer routes traffic to
+the API once its dependencies answer and stops when one of them goes away.
+
+The checks do blocking I/O, so they run in threads, each bounded by
+`READINESS_TIMEOUT_SECONDS`. A check still hanging from a previous round is
+waited on again rather than started twice. Celery is only imported by the
+broker check.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+
+from sqlalchemy import text
+
+from app.core import database
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CheckResult:
+    """
+    Outcome of one check of a dependency.
+
+    Attributes:
+        ok: Whether the dependency answered
+        latency_ms: How long the check took, or had been running when it timed out
+        error: Why the check failed
+        checked_at: When the check finished
+
+    """
+
+    ok: bool
+    latency_ms: float
+    error: str | None = None
+    checked_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+
+
+def check_database() -> None:
+    """Run a trivial query on the primary database."""
+    with database.engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+def check_broker() -> None:
+    """Connect to the Celery broker, without retrying."""
+    from app.core.celery_app import celery_app
+
+    with celery_app.connection_for_write() as connection:
+        connection.ensure_connection(max_retries=0)
+
+
+def check_storage() -> None:
+    """Check that the bucket exists."""
+    from app.services.storage import get_storage
+
+    get_storage().check()
+
+
+DEFAULT_CHECKS: dict[str, Callable[[], None]] = {
+    "database": check_database,
+    "broker": check_broker,
+    "storage": check_storage,
+}
+
+
+class Readiness:
+    """
+    Latest results of the dependency checks of one application.
+
+    Args:
+        checks: Blocking functions raising if their dependency is unavailable,
+            by name (default: the database, broker and storage)
+
+    """
+
+    def __init__(self, checks: dict[str, Callable[[], None]] | None = None):
+        self.checks = DEFAULT_CHECKS if checks is None else checks
+        self.results: dict[str, CheckResult] = {}
+        self._running: dict[str, asyncio.Future] = {}
+
+    async def _check(self, name: str, check: Callable[[], None]) -> CheckResult:
+        running = self._running.get(name)
+        if running is None or running.done():
+            running = asyncio.ensure_future(asyncio.to_thread(check))
+            self._running[name] = running
+        start = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(running), settings.READINESS_TIMEOUT_SECONDS
+            )
+        except TimeoutError:
+            error = f"Timed out after {settings.READINESS_TIMEOUT_SECONDS}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        latency_ms = (time.perf_counter() - start) * 1000
+        previous = self.results.get(name)
+        # Log when a dependency goes away, not on every failed round
+        if error is not None and (previous is None or previous.ok):
+            logger.warning("Readiness check %s failed: %s", name, error)
+        return CheckResult(ok=error is None, latency_ms=latency_ms, error=error)
+
+    async def check_all(self) -> None:
+        """Run every check concurrently and record the results."""
+        results = await asyncio.gather(
+            *(self._check(name, check) for name, check in self.checks.items())
+        )
+        self.results = dict(zip(self.checks, results, strict=True))
+
+    async def run(self) -> None:
+        """Check the dependencies every `READINESS_INTERVAL_SECONDS`, until cancelled."""
+        while True:
+            await self.check_all()
+            await asyncio.sleep(settings.READINESS_INTERVAL_SECONDS)
+
+    @property
+    def ready(self) -> bool:
+        """Whether every dependency answered its last check."""
+        return all(
+            name in self.results and self.results[name].ok for name in self.checks
+        )
+
+    def report(self) -> dict:
+        """
+        Describe the last checks, for the `/ready` endpoint.
+
+        Returns:
+            dict: Overall status and the result of each check, or None for
+            checks that have not finished yet
+
+        """
+        return {
+            "status": "ready" if self.ready else "not ready",
+            "checks": {
+                name: asdict(self.results[name]) if name in self.results else None
+                for name in self.checks
+            },
+        }
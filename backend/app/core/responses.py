@@ -0,0 +1,141 @@
+"""
+Fast JSON responses.
+
+By default FastAPI validates what an endpoint returns against its
+`response_model`, reading every attribute of ORM rows through SQLAlchemy's
+descriptors, dumps the result to Python objects and encodes those with the
+standard library's `json`. For videos with their tags and categories, most of
+that time goes to validating rows the database already typed.
+
+With `FAST_JSON_ENABLED`, the application's default response class is
+orjson-backed, and endpoints returning ORM rows hand them to `model_response`,
+which reads the response model's fields straight from the rows' loaded state
+and encodes them with orjson, without validating them again. The endpoints keep
+their `response_model`, which still documents the response and is used when
+the setting is off. Response models served this way must only declare fields
+the rows hold with matching types, without aliases or custom serializers.
+
+`model_response` can also keep only some of the model's fields, for endpoints
+letting clients select them. Those endpoints have no response model FastAPI
+could apply, and validating the rows would load the columns and relationships
+left out, so they always take the direct path, as do the responses stored in
+the response cache, which are encoded with `model_json`.
+"""
+
+import types
+import typing
+from collections.abc import Collection
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from fastapi import status
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+# Fields to read from a row, each with the plan of its nested model, if any
+_Plan = tuple[tuple[str, "_Plan | None"], ...]
+
+
+def default_response_class() -> type[Response]:
+    """
+    Return the response class endpoints use unless they specify one.
+
+    Returns:
+        type[Response]: `ORJSONResponse` if `FAST_JSON_ENABLED`, otherwise
+        `JSONResponse`
+
+    """
+    return ORJSONResponse if settings.FAST_JSON_ENABLED else JSONResponse
+
+
+def _nested_model(annotation: Any) -> type[BaseModel] | None:
+    """Return the model a field holds, alone, in a list or optional, if any."""
+    origin = typing.get_origin(annotation)
+    if origin in (list, typing.Union, types.UnionType):
+        models = [
+            model
+            for model in map(_nested_model, typing.get_args(annotation))
+            if model is not None
+        ]
+        return models[0] if models else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+
+@lru_cache
+def _plan(schema: type[BaseModel]) -> _Plan:
+    fields = []
+    for name, field in schema.model_fields.items():
+        nested = _nested_model(field.annotation)
+        fields.append((name, _plan(nested) if nested else None))
+    return tuple(fields)
+
+
+def _values(plan: _Plan, row: Any) -> Any:
+    if row is None:
+        return None
+    if isinstance(row, list | tuple):
+        return [_values(plan, item) for item in row]
+    # Loaded columns and relationships live in the instance's __dict__;
+    # expired or unloaded ones are read through the descriptor
+    state = row.__dict__
+    values = {}
+    for name, nested in plan:
+        value = state[name] if name in state else getattr(row, name)
+        values[name] = _values(nested, value) if nested else value
+    return values
+
+
+def model_json(
+    schema: Any, content: Any, fields: Collection[str] | None = None
+) -> bytes:
+    """
+    Encode ORM rows through a response model with orjson, without validation.
+
+    Args:
+        schema: The response model, e.g. `VideoInDB` or `list[TagInDB]`
+        content: ORM rows matching the response model
+        fields: Top-level fields of the model to include (default: all)
+
+    Returns:
+        bytes: The JSON document
+
+    """
+    plan = _plan(_nested_model(schema))
+    if fields is not None:
+        plan = tuple((name, nested) for name, nested in plan if name in fields)
+    return orjson.dumps(_values(plan, content), option=orjson.OPT_UTC_Z)
+
+
+def model_response(
+    schema: Any,
+    content: Any,
+    status_code: int = status.HTTP_200_OK,
+    fields: Collection[str] | None = None,
+) -> Any:
+    """
+    Serialize ORM rows through an endpoint's response model, without validation.
+
+    Args:
+        schema: The endpoint's response model, e.g. `VideoInDB` or
+            `list[TagInDB]`
+        content: ORM rows matching the response model
+        status_code: Status code of the response
+        fields: Top-level fields of the model to include (default: all)
+
+    Returns:
+        Any: A JSON response if `FAST_JSON_ENABLED` or `fields` is given,
+        otherwise `content` unchanged, for FastAPI to validate and serialize
+
+    """
+    if fields is None and not settings.FAST_JSON_ENABLED:
+        return content
+    return Response(
+        model_json(schema, content, fields),
+        status_code=status_code,
+        media_type="application/json",
+    )
@@ -0,0 +1,123 @@
+"""
+OpenTelemetry tracing of the upload and transcode pipeline.
+
+With `TRACING_ENABLED`, the API traces every request and the Celery
+instrumentation carries the trace context in task messages, so the spans of
+`transcode_video` (download, probe, each ffmpeg run, segment uploads) belong to
+the trace of the `/upload-complete` request that enqueued it. Database queries
+and the storage client's HTTP calls show up as child spans.
+
+Spans are exported over OTLP/HTTP, or appended as JSON lines to
+`TRACING_FILE_PATH` for offline analysis. `TRACING_SAMPLE_RATIO` sets the share
+of new traces that are recorded; spans always follow their parent's decision.
+"""
+
+from typing import IO
+
+from fastapi import FastAPI
+from opentelemetry import trace
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+from app.core.config import settings
+
+tracer = trace.get_tracer("app")
+
+
+def _json_line(span: ReadableSpan) -> str:
+    return span.to_json(indent=None) + "\n"
+
+
+def build_span_exporter(file: IO[str] | None = None) -> SpanExporter:
+    """
+    Build the span exporter selected by `TRACING_EXPORTER`.
+
+    Args:
+        file: Stream the "file" exporter writes to, instead of `TRACING_FILE_PATH`
+
+    Returns:
+        SpanExporter: The exporter
+
+    """
+    if settings.TRACING_EXPORTER == "file":
+        # The exporter keeps the file open for the lifetime of the process
+        out = file or open(settings.TRACING_FILE_PATH, "a")
+        return ConsoleSpanExporter(out=out, formatter=_json_line)
+
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+        OTLPSpanExporter,
+    )
+
+    return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+
+
+def build_tracer_provider(
+    service_name: str, exporter: SpanExporter | None = None
+) -> TracerProvider:
+    """
+    Build a tracer provider sampling `TRACING_SAMPLE_RATIO` of new traces.
+
+    Args:
+        service_name: Name of the traced service
+        exporter: Exporter to send spans to, instead of `build_span_exporter()`
+
+    Returns:
+        TracerProvider: The tracer provider
+
+    """
+    provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: service_name}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter or build_span_exporter()))
+    return provider
+
+
+def configure_tracing(service_name: str) -> None:
+    """
+    Install the tracer provider and instrument Celery, SQLAlchemy and urllib3.
+
+    Does nothing unless `TRACING_ENABLED` is set.
+
+    Args:
+        service_name: Name of the traced service
+
+    """
+    if not settings.TRACING_ENABLED:
+        return
+
+    from opentelemetry.instrumentation.celery import CeleryInstrumentor
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+    from opentelemetry.instrumentation.urllib3 import URLLib3Instrumentor
+
+    from app.core.database import engine, read_engines
+
+    trace.set_tracer_provider(build_tracer_provider(service_name))
+    CeleryInstrumentor().instrument()
+    # The instrumentor only instruments once, so every engine goes in one call
+    SQLAlchemyInstrumentor().instrument(engines=[engine, *read_engines])
+    # The MinIO client talks to the object store through urllib3
+    URLLib3Instrumentor().instrument()
+
+
+def instrument_app(app: FastAPI) -> None:
+    """
+    Trace the API's requests.
+
+    Args:
+        app: The FastAPI application instance
+
+    """
+    if not settings.TRACING_ENABLED:
+        return
+
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
+    configure_tracing(settings.TRACING_SERVICE_NAME)
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="health,metrics")
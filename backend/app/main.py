@@ -1,12 +1,60 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from app.api import api_router
-from app.core.celery_app import celery_app
+from app.api.deps import authorize_profiling
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.logging import configure_logging
+from app.core.metrics import (
+    BACKLOG_REGISTRY,
+    MetricsMiddleware,
+    get_registry,
+    render_metrics,
+)
+from app.core.profiling import ProfilingMiddleware
+from app.core.readiness import Readiness
+from app.core.responses import default_response_class
+from app.core.tracing import instrument_app
+from app.services.response_cache import get_response_cache
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Check the API's dependencies in the background while it serves requests.
+
+    Startup does not wait for the database, broker or storage; `/ready` reports
+    them once checked. With the response cache enabled, cached responses other
+    processes invalidate are dropped as the invalidations arrive.
+
+    Args:
+        app: The FastAPI application instance
+
+    """
+    logger.info("Starting up")
+    probes = asyncio.create_task(app.state.readiness.run())
+    listener = None
+    if settings.RESPONSE_CACHE_ENABLED:
+        listener = get_response_cache().start_listener()
+    try:
+        yield
+    finally:
+        if listener is not None:
+            listener.set()
+        probes.cancel()
+        with suppress(asyncio.CancelledError):
+            await probes
 
 
 def create_application() -> FastAPI:
@@ -17,6 +65,8 @@ def create_application() -> FastAPI:
         FastAPI: Configured FastAPI application instance
 
     """
+    configure_logging()
+
     app = FastAPI(
         title=settings.PROJECT_NAME,
         version=settings.VERSION,
@@ -24,14 +74,36 @@ def create_application() -> FastAPI:
         docs_url=None,  # Disable default Swagger UI
         redoc_url=None,  # Disable default ReDoc
         openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        lifespan=lifespan,
+        default_response_class=default_response_class(),
     )
+    app.state.readiness = Readiness()
 
     # Configure CORS
     setup_cors(app)
 
+    # Record request metrics
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    # Any request can be profiled on demand by a superuser
+    app.add_middleware(ProfilingMiddleware, authorize=authorize_profiling)
+
+    # Compress large JSON and playlist responses
+    if settings.RESPONSE_COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES,
+            gzip_level=settings.RESPONSE_GZIP_LEVEL,
+            brotli_quality=settings.RESPONSE_BROTLI_QUALITY,
+        )
+
     # Include API routes
     setup_routes(app)
 
+    # Trace requests, and the transcodes they enqueue
+    instrument_app(app)
+
     return app
 
 
@@ -85,6 +157,37 @@ def setup_routes(app: FastAPI) -> None:
         """
         return {"status": "ok"}
 
+    @app.get("/ready", include_in_schema=False)
+    async def readiness_check(response: Response) -> dict:
+        """
+        Readiness endpoint, reporting the last checks of the API's dependencies.
+
+        Returns:
+            dict: Overall status and the result of each check, with status 503
+            until the database, broker and storage all answered
+
+        """
+        readiness = app.state.readiness
+        if not readiness.ready:
+            response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return readiness.report()
+
+    if settings.METRICS_ENABLED:
+
+        @app.get("/metrics", include_in_schema=False)
+        def metrics() -> Response:
+            """
+            Prometheus metrics endpoint.
+
+            Also reports the transcode backlog, for worker autoscaling.
+
+            Returns:
+                Response: The metrics in the Prometheus text format
+
+            """
+            content, media_type = render_metrics(get_registry(), BACKLOG_REGISTRY)
+            return Response(content=content, media_type=media_type)
+
     # Custom Swagger UI
     @app.get("/docs", include_in_schema=False)
     async def custom_swagger_ui_html():
@@ -108,15 +211,3 @@ def setup_routes(app: FastAPI) -> None:
 
 # Create the FastAPI application
 app = create_application()
-
-
-@app.on_event("startup")
-async def startup_event():
-    print("Starting up...")
-    # Example: Ping Celery worker to ensure it's running
-    # This is a basic check, more robust health checks might be needed
-    try:
-        celery_app.control.ping(timeout=1)
-        print("Celery worker is reachable.")
-    except Exception as e:
-        print(f"Celery worker not reachable: {e}")
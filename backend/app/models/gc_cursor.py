@@ -0,0 +1,34 @@
+from sqlalchemy import Column, DateTime, String
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class GcCursor(Base):
+    """
+    SQLAlchemy model recording how far a garbage collection scan has got.
+
+    Scans of listings too large for one run resume after the position recorded
+    by the previous run, and start over once the listing is exhausted.
+
+    Attributes:
+        name: Primary key, the scan the position belongs to
+        position: Last item scanned, or None to start from the beginning
+        updated_at: When the position was last recorded
+
+    """
+
+    __tablename__ = "gc_cursors"
+
+    name = Column(String(64), primary_key=True, doc="The scan the cursor belongs to")
+    position = Column(String(1024), nullable=True, doc="Last item scanned")
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+        doc="When the position was last recorded",
+    )
+
+    def __repr__(self) -> str:
+        return f"<GcCursor(name={self.name}, position={self.position})>"
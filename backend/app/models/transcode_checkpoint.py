@@ -0,0 +1,44 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class TranscodeCheckpoint(Base):
+    """
+    SQLAlchemy model recording a completed stage of a transcode job.
+
+    A row is written each time `transcode_video` finishes a stage (source fetched,
+    rendition encoded, rendition uploaded), so a redelivered task can skip the work
+    that was already done before a worker restart.
+
+    Attributes:
+        id: Primary key, auto-incrementing integer
+        video_id: The ID of the video being transcoded
+        stage: Name of the completed stage (e.g. "source_fetched", "encoded:720p")
+        created_at: Timestamp when the stage was completed
+
+    """
+
+    __tablename__ = "transcode_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("video_id", "stage", name="uq_transcode_checkpoints_stage"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, doc="Primary key identifier")
+    video_id = Column(
+        Integer,
+        ForeignKey("videos.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+        doc="The ID of the video being transcoded",
+    )
+    stage = Column(String, nullable=False, doc="Name of the completed stage")
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        doc="Timestamp when the stage was completed",
+    )
+
+    def __repr__(self) -> str:
+        return f"<TranscodeCheckpoint(video_id={self.video_id}, stage='{self.stage}')>"
@@ -0,0 +1,47 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class TranscodeUsage(Base):
+    """
+    SQLAlchemy model recording transcode seconds charged to a user's quota.
+
+    Rows are only ever appended: an upload request is charged its estimated
+    duration, and an upload that was never completed is refunded with a negative
+    row. Deleting a video leaves its rows, so the monthly transcode quota is
+    rebuilt from what was actually spent rather than from the videos that remain.
+
+    Attributes:
+        id: Primary key, auto-incrementing integer
+        user_id: The ID of the user charged
+        video_id: The ID of the upload charged, which may since have been deleted
+        seconds: Seconds of video charged, negative for a refund
+        at: When the usage counts; a refund counts when its upload was requested
+
+    """
+
+    __tablename__ = "transcode_usage"
+    __table_args__ = (Index("ix_transcode_usage_user_id_at", "user_id", "at"),)
+
+    id = Column(Integer, primary_key=True, doc="Primary key identifier")
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        doc="The ID of the user charged",
+    )
+    video_id = Column(Integer, nullable=False, doc="The ID of the upload charged")
+    seconds = Column(
+        Integer, nullable=False, doc="Seconds of video charged, negative for a refund"
+    )
+    at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        doc="When the usage counts",
+    )
+
+    def __repr__(self) -> str:
+        return f"<TranscodeUsage(user_id={self.user_id}, seconds={self.seconds})>"
@@ -1,10 +1,11 @@
 from sqlalchemy import Column, DateTime, Enum, Float, ForeignKey, Integer, String
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
 
 from app.core.database import Base
 from app.models.video_category_association import video_category_association
 from app.models.video_tag_association import video_tag_association
+from app.schemas.storage_tier import StorageTier
 from app.schemas.video_status import VideoStatus
 
 
@@ -19,8 +20,15 @@ class Video(Base):
         file_key: S3 object key for the video file
         file_size: Size of the video file in bytes
         mime_type: MIME type of the video file
+        duration: Probed duration of the video in seconds
+        status: Status of the video processing
+        storage_tier: Where the original upload is stored
+        lease_token: Fencing token incremented each time a worker claims the video
+        lease_expires_at: When the current worker's claim on the video expires
+        version: Incremented on every update, to validate cached copies
         created_at: Timestamp when the video record was created
         updated_at: Timestamp when the video record was last updated
+        processed_at: Timestamp when the video was last transcoded successfully
 
     """
 
@@ -34,12 +42,45 @@ class Video(Base):
     )
     file_size = Column(Float, nullable=False, doc="Size of the video file in bytes")
     mime_type = Column(String, nullable=False, doc="MIME type of the video file")
+    duration = Column(
+        Float, nullable=True, doc="Probed duration of the video in seconds"
+    )
     status = Column(
         Enum(VideoStatus),
         default=VideoStatus.PENDING,
         nullable=False,
+        index=True,
         doc="Status of the video processing",
     )
+    storage_tier = Column(
+        Enum(StorageTier),
+        default=StorageTier.HOT,
+        server_default=StorageTier.HOT.name,
+        nullable=False,
+        doc="Where the original upload is stored",
+    )
+    lease_token = Column(
+        Integer,
+        default=0,
+        server_default="0",
+        nullable=False,
+        doc="Fencing token incremented each time a worker claims the video",
+    )
+    lease_expires_at = Column(
+        DateTime(timezone=True),
+        nullable=True,
+        doc="When the current worker's claim on the video expires",
+    )
+    version = Column(
+        Integer,
+        default=1,
+        server_default="1",
+        onupdate=literal_column("version + 1"),
+        nullable=False,
+        doc="Incremented on every update of the video (but not renewals of "
+        "its transcode lease) or of its tags and categories, to validate "
+        "cached copies",
+    )
     created_at = Column(
         DateTime(timezone=True),
         server_default=func.now(),
@@ -51,6 +92,11 @@ class Video(Base):
         nullable=True,
         doc="Timestamp when the video record was last updated",
     )
+    processed_at = Column(
+        DateTime(timezone=True),
+        nullable=True,
+        doc="Timestamp when the video was last transcoded successfully",
+    )
     owner_id = Column(
         Integer,
         ForeignKey("users.id"),
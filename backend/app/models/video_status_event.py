@@ -0,0 +1,47 @@
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+from app.schemas.video_status import VideoStatus
+
+
+class VideoStatusEvent(Base):
+    """
+    SQLAlchemy model recording a change of a video's status.
+
+    Rows are only ever appended, in the same transaction as the status change, so
+    the time a video spent in each status can be measured after the fact.
+
+    Attributes:
+        id: Primary key, auto-incrementing integer
+        video_id: The ID of the video whose status changed
+        status: The status the video moved to
+        at: Timestamp of the change
+
+    """
+
+    __tablename__ = "video_status_events"
+    __table_args__ = (
+        Index("ix_video_status_events_video_id_at", "video_id", "at"),
+        Index("ix_video_status_events_at", "at"),
+    )
+
+    id = Column(Integer, primary_key=True, doc="Primary key identifier")
+    video_id = Column(
+        Integer,
+        ForeignKey("videos.id", ondelete="CASCADE"),
+        nullable=False,
+        doc="The ID of the video whose status changed",
+    )
+    status = Column(
+        Enum(VideoStatus), nullable=False, doc="The status the video moved to"
+    )
+    at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        doc="Timestamp of the change",
+    )
+
+    def __repr__(self) -> str:
+        return f"<VideoStatusEvent(video_id={self.video_id}, status='{self.status}')>"
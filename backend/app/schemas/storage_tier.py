@@ -0,0 +1,11 @@
+from enum import StrEnum
+
+
+class StorageTier(StrEnum):
+    """
+    Enum for where a video's original upload is stored.
+    """
+
+    HOT = "hot"
+    COLD = "cold"
+    DELETED = "deleted"
@@ -38,7 +38,14 @@ class VideoInDB(VideoBase):
     updated_at: datetime | None = Field(
         None, description="Timestamp when the video record was last updated"
     )
+    processed_at: datetime | None = Field(
+        None, description="Timestamp when the video was last transcoded successfully"
+    )
     status: str = Field(..., description="Status of the video processing")
+    storage_tier: str = Field(..., description="Where the original upload is stored")
+    duration: float | None = Field(
+        None, description="Probed duration of the video in seconds"
+    )
     hls_url: str | None = Field(None, description="URL to the HLS master playlist")
     tags: list[TagInDB] = []
     categories: list[CategoryInDB] = []
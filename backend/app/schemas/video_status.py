@@ -1,7 +1,7 @@
-from enum import Enum
+from enum import StrEnum
 
 
-class VideoStatus(str, Enum):
+class VideoStatus(StrEnum):
     """
     Enum for video processing status.
     """
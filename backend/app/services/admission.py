@@ -0,0 +1,198 @@
+"""
+Node-level admission control for transcode jobs.
+
+Each `transcode_video` run spawns a multi-threaded ffmpeg and writes the source plus
+its renditions to the scratch directory. Before a job starts, the worker reserves
+CPU threads and scratch space for it; when the node cannot fit the job the task is
+requeued with a delay instead of oversubscribing the CPU or filling the disk.
+
+Reservations are stored as a small file inside each job's working directory, so
+they are visible to every worker process on the node. The job releases its
+reservation when it ends, however it ends, and renews it at each checkpoint. A
+reservation left by a job that could not release it is reaped by the next
+admission check: when the worker process that made it is gone, or when it was
+not renewed for `TRANSCODE_LEASE_SECONDS`, after which the job lost its lease on
+the video anyway.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import socket
+import time
+from dataclasses import dataclass
+
+from app.core.config import settings
+
+RESERVATION_FILE_NAME = ".reservation"
+LOCK_FILE_NAME = ".admission.lock"
+
+
+@dataclass
+class Admission:
+    """Resources granted to an admitted transcode job."""
+
+    threads: int
+    scratch_bytes: int
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                continue
+    return total
+
+
+def _is_stale(path: str, reservation: dict) -> bool:
+    """Tell whether a reservation was left by a job that is no longer running."""
+    if time.time() - os.path.getmtime(path) > settings.TRANSCODE_LEASE_SECONDS:
+        return True
+    pid = reservation.get("pid")
+    if pid is None or reservation.get("host") != socket.gethostname():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        # The process exists, under another user
+        return False
+    return False
+
+
+def _outstanding_reservations(scratch_dir: str, exclude: str) -> tuple[int, int]:
+    """
+    Sum the threads and not-yet-used scratch bytes reserved by other jobs.
+
+    Stale reservations are removed instead of counted.
+
+    Returns:
+        tuple[int, int]: Reserved threads and outstanding scratch bytes
+
+    """
+    threads = 0
+    outstanding_bytes = 0
+    for entry in os.scandir(scratch_dir):
+        if not entry.is_dir() or entry.path == exclude:
+            continue
+        path = os.path.join(entry.path, RESERVATION_FILE_NAME)
+        try:
+            with open(path) as f:
+                reservation = json.load(f)
+            if _is_stale(path, reservation):
+                os.remove(path)
+                continue
+        except (OSError, ValueError):
+            continue
+        threads += reservation["threads"]
+        used = _directory_size(entry.path)
+        outstanding_bytes += max(0, reservation["scratch_bytes"] - used)
+    return threads, outstanding_bytes
+
+
+def _available_memory() -> int:
+    """Return the memory available to new processes, including reclaimable cache."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+def admit_job(job_dir: str, file_size: float) -> Admission | None:
+    """
+    Reserve node resources for a transcode job, if they are available.
+
+    The job is admitted when the node has CPUs not reserved by other jobs, enough
+    free scratch space for the estimated need of the job, and the minimum free
+    memory. The job gets one ffmpeg thread per CPU that is neither reserved nor
+    busy according to the load average, at least one and up to
+    `TRANSCODE_MAX_FFMPEG_THREADS`. The load average only shrinks the thread
+    count: it lags by a minute, still counting jobs that just finished, so
+    rejecting on it would keep requeueing jobs on a node that is busy but free.
+
+    Args:
+        job_dir: The job's working directory inside the scratch directory
+        file_size: Size of the source video in bytes
+
+    Returns:
+        Admission | None: The granted resources, or None if the node is saturated
+
+    """
+    scratch_dir = settings.TRANSCODE_SCRATCH_DIR
+    os.makedirs(scratch_dir, exist_ok=True)
+    cpu_count = os.cpu_count() or 1
+    scratch_bytes = int(file_size * settings.TRANSCODE_SCRATCH_FACTOR)
+
+    with open(os.path.join(scratch_dir, LOCK_FILE_NAME), "w") as lock_file:
+        # Serialize check-and-reserve across the worker processes of this node
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        reserved_threads, reserved_bytes = _outstanding_reservations(
+            scratch_dir, exclude=job_dir
+        )
+        free_cpus = cpu_count - reserved_threads
+        idle_cpus = cpu_count - os.getloadavg()[0]
+        already_used = _directory_size(job_dir) if os.path.exists(job_dir) else 0
+        free_scratch = shutil.disk_usage(scratch_dir).free - reserved_bytes
+        if (
+            free_cpus <= 0
+            or free_scratch < scratch_bytes - already_used
+            or _available_memory() < settings.TRANSCODE_MIN_FREE_MEMORY_BYTES
+        ):
+            return None
+
+        admission = Admission(
+            threads=max(
+                1,
+                min(free_cpus, int(idle_cpus), settings.TRANSCODE_MAX_FFMPEG_THREADS),
+            ),
+            scratch_bytes=scratch_bytes,
+        )
+        os.makedirs(job_dir, exist_ok=True)
+        with open(os.path.join(job_dir, RESERVATION_FILE_NAME), "w") as f:
+            json.dump(
+                {
+                    "threads": admission.threads,
+                    "scratch_bytes": scratch_bytes,
+                    "host": socket.gethostname(),
+                    "pid": os.getpid(),
+                },
+                f,
+            )
+        return admission
+
+
+def renew_admission(job_dir: str) -> None:
+    """
+    Mark a job's reservation as still in use.
+
+    Args:
+        job_dir: The job's working directory
+
+    """
+    try:
+        os.utime(os.path.join(job_dir, RESERVATION_FILE_NAME))
+    except FileNotFoundError:
+        pass
+
+
+def release_admission(job_dir: str) -> None:
+    """
+    Release the resources reserved for a job, keeping its files.
+
+    Args:
+        job_dir: The job's working directory
+
+    """
+    try:
+        os.remove(os.path.join(job_dir, RESERVATION_FILE_NAME))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,185 @@
+"""
+Transcode backlog, reported to drive the autoscaling of transcode workers.
+
+The backlog is the videos waiting for (`UPLOADED`) or in (`PROCESSING`) a
+transcode, with the media seconds they hold: their probed duration, or an
+estimate from their file size before they are probed. Along with the recent
+throughput of the fleet, it gives the time the current workers need to drain
+it, which an autoscaler can hold at a target instead of the raw queue length.
+
+Measuring it queries Postgres, the broker and every worker, so the result is
+reused for `BACKLOG_CACHE_SECONDS` and concurrent callers wait for a single
+measurement.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.database import session_scope
+from app.models.video import Video
+from app.models.video_status_event import VideoStatusEvent
+from app.schemas.video_status import VideoStatus
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TranscodeBacklog:
+    """
+    Snapshot of the transcode backlog and of the capacity draining it.
+
+    Attributes:
+        uploaded: Videos waiting for a transcode
+        processing: Videos being transcoded
+        outstanding_media_seconds: Media seconds held by those videos
+        throughput: Media seconds transcoded per second by the whole fleet,
+            averaged over `BACKLOG_THROUGHPUT_WINDOW_SECONDS`
+        queue_lengths: Messages waiting in each Celery queue
+        workers: Workers consuming from each Celery queue
+        measured_at: When the snapshot was taken
+
+    """
+
+    uploaded: int
+    processing: int
+    outstanding_media_seconds: float
+    throughput: float
+    queue_lengths: dict[str, int] = field(default_factory=dict)
+    workers: dict[str, int] = field(default_factory=dict)
+    measured_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+
+    @property
+    def drain_seconds(self) -> float | None:
+        """Time the current fleet needs to clear the backlog, if it is working."""
+        if not self.outstanding_media_seconds:
+            return 0.0
+        if not self.throughput:
+            return None
+        return self.outstanding_media_seconds / self.throughput
+
+
+_lock = threading.Lock()
+_cached: tuple[float, TranscodeBacklog] | None = None
+
+
+def _media_seconds():
+    """SQL expression of a video's duration, estimated from its size if unknown."""
+    estimate = Video.file_size * 8 / settings.BACKLOG_ASSUMED_BITRATE
+    return func.coalesce(Video.duration, estimate)
+
+
+def get_queue_lengths() -> dict[str, int]:
+    """
+    Count the messages waiting in each Celery queue.
+
+    Returns:
+        dict[str, int]: Queue lengths by queue name, empty if the broker is
+        unreachable
+
+    """
+    lengths = {}
+    try:
+        with celery_app.connection_for_read() as connection:
+            channel = connection.default_channel
+            for queue in celery_app.conf.task_queues:
+                declared = channel.queue_declare(queue.name, passive=True)
+                lengths[queue.name] = declared.message_count
+    except Exception as e:
+        logger.warning("Could not read Celery queue depths: %s", e)
+        return {}
+    return lengths
+
+
+def get_worker_counts() -> dict[str, int]:
+    """
+    Count the workers consuming from each Celery queue.
+
+    Returns:
+        dict[str, int]: Worker counts by queue name, empty if no worker replied
+
+    """
+    try:
+        replies = celery_app.control.inspect(
+            timeout=settings.BACKLOG_INSPECT_TIMEOUT_SECONDS
+        ).active_queues()
+    except Exception as e:
+        logger.warning("Could not inspect Celery workers: %s", e)
+        return {}
+    return dict(
+        Counter(
+            queue["name"] for queues in (replies or {}).values() for queue in queues
+        )
+    )
+
+
+def measure_transcode_backlog(db: Session) -> TranscodeBacklog:
+    """
+    Measure the transcode backlog, bypassing the cache.
+
+    Args:
+        db: Database session
+
+    Returns:
+        TranscodeBacklog: The backlog
+
+    """
+    rows = db.execute(
+        select(Video.status, func.count(), func.sum(_media_seconds()))
+        .where(Video.status.in_([VideoStatus.UPLOADED, VideoStatus.PROCESSING]))
+        .group_by(Video.status)
+    ).all()
+    counts = {
+        status: (count, media_seconds or 0.0) for status, count, media_seconds in rows
+    }
+
+    window = settings.BACKLOG_THROUGHPUT_WINDOW_SECONDS
+    since = datetime.now(UTC) - timedelta(seconds=window)
+    transcoded = db.execute(
+        select(func.sum(_media_seconds()))
+        .join(VideoStatusEvent, VideoStatusEvent.video_id == Video.id)
+        .where(
+            VideoStatusEvent.status == VideoStatus.PROCESSED,
+            VideoStatusEvent.at >= since,
+        )
+    ).scalar()
+
+    uploaded, uploaded_seconds = counts.get(VideoStatus.UPLOADED, (0, 0.0))
+    processing, processing_seconds = counts.get(VideoStatus.PROCESSING, (0, 0.0))
+    return TranscodeBacklog(
+        uploaded=uploaded,
+        processing=processing,
+        outstanding_media_seconds=float(uploaded_seconds + processing_seconds),
+        throughput=float(transcoded or 0.0) / window,
+        queue_lengths=get_queue_lengths(),
+        workers=get_worker_counts(),
+    )
+
+
+def get_transcode_backlog() -> TranscodeBacklog:
+    """
+    Return the transcode backlog, measured at most `BACKLOG_CACHE_SECONDS` ago.
+
+    Returns:
+        TranscodeBacklog: The backlog
+
+    """
+    global _cached
+    with _lock:
+        if (
+            _cached is not None
+            and time.monotonic() - _cached[0] < settings.BACKLOG_CACHE_SECONDS
+        ):
+            return _cached[1]
+        with session_scope() as db:
+            backlog = measure_transcode_backlog(db)
+        _cached = (time.monotonic(), backlog)
+        return backlog
@@ -0,0 +1,286 @@
+"""
+On-disk LRU cache for HLS objects, for deployments without a CDN.
+
+Segments are fetched from object storage once and then served from the local cache
+directory, which lets the web server send them with `sendfile` instead of proxying
+every byte from storage. Concurrent requests for an object that is not cached yet
+are coalesced, so a thundering herd on a freshly published segment causes a single
+origin fetch. Entries are keyed by object name and version, so objects rewritten
+under the same name are fetched again rather than served stale.
+
+Files are sent after `get` returns, so callers pin the entries they are serving:
+an entry evicted while pinned leaves the index at once, but its file is only
+deleted once the last response sending it releases it.
+
+Each API process caches into its own directory, with an equal share of
+`EDGE_CACHE_MAX_BYTES`, and removes the directories of processes that are gone
+when it starts.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import lru_cache
+
+from app.core.config import settings
+from app.services.storage import get_storage
+
+
+@dataclass(frozen=True)
+class CachedObject:
+    """An object stored in the cache directory."""
+
+    path: str
+    size: int
+    etag: str
+
+
+@dataclass
+class EdgeCacheStats:
+    """Counters describing the cache's effectiveness."""
+
+    hits: int = 0
+    misses: int = 0
+    origin_fetches: int = 0
+    bytes_served: int = 0
+    cached_bytes: int = 0
+    cached_objects: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+# Downloads an object to the given path and returns its ETag
+FetchObject = Callable[[str, str], str]
+
+
+class EdgeCache:
+    """
+    Bounded LRU cache of storage objects on the local disk.
+
+    Args:
+        cache_dir: Directory holding the cached files
+        max_bytes: Total size of cached files above which the least recently
+            used ones are evicted
+        fetch_object: Function downloading an object from the origin
+
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, fetch_object: FetchObject):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fetch_object = fetch_object
+        self._entries: OrderedDict[str, CachedObject] = OrderedDict()
+        self._inflight: dict[str, Future] = {}
+        # Number of responses sending each file, and evicted files awaiting them
+        self._pins: Counter[str] = Counter()
+        self._evicted: set[str] = set()
+        self._lock = threading.Lock()
+        self._stats = EdgeCacheStats()
+        # The index lives in memory, so files left by a previous run are unknown
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(
+        self, object_name: str, pin: bool = False, version: int = 0
+    ) -> CachedObject:
+        """
+        Return the cached copy of an object, fetching it from the origin if needed.
+
+        Args:
+            object_name: Name of the object in the bucket
+            pin: Keep the file on disk, even if evicted, until `release` is
+                called with the returned entry
+            version: Version of the object, for objects rewritten under the same
+                name; older versions are left to be evicted
+
+        Returns:
+            CachedObject: The cached file
+
+        Raises:
+            ObjectNotFoundError: If the object does not exist in the origin
+
+        """
+        key = f"{object_name}@{version}"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                if pin:
+                    self._pins[entry.path] += 1
+                return entry
+            self._stats.misses += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            # Another request is already fetching this object
+            entry = future.result()
+            if not pin:
+                return entry
+            with self._lock:
+                if key in self._entries or entry.path in self._evicted:
+                    self._pins[entry.path] += 1
+                    return entry
+            # Evicted and deleted before this request could pin it
+            return self.get(object_name, pin, version)
+
+        try:
+            entry = self._fetch(key, object_name, pin)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(entry)
+            return entry
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def release(self, entry: CachedObject) -> None:
+        """
+        Unpin an entry returned by `get(..., pin=True)`.
+
+        Args:
+            entry: The pinned entry
+
+        """
+        with self._lock:
+            self._pins[entry.path] -= 1
+            if self._pins[entry.path] > 0:
+                return
+            del self._pins[entry.path]
+            if entry.path in self._evicted:
+                self._evicted.discard(entry.path)
+                self._remove(entry.path)
+
+    def _fetch(self, key: str, object_name: str, pin: bool) -> CachedObject:
+        path = self._cache_path(key)
+        partial_path = f"{path}.{threading.get_ident()}.part"
+        with self._lock:
+            self._stats.origin_fetches += 1
+        try:
+            etag = self.fetch_object(object_name, partial_path)
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+        entry = CachedObject(path=path, size=os.path.getsize(path), etag=f'"{etag}"')
+        with self._lock:
+            # The file replaced an evicted copy a response may still be sending
+            self._evicted.discard(path)
+            self._entries[key] = entry
+            self._stats.cached_bytes += entry.size
+            if pin:
+                self._pins[path] += 1
+            self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        # The newest entry is kept even if it alone exceeds the budget, since the
+        # request that fetched it is about to serve it
+        while self._stats.cached_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._stats.cached_bytes -= entry.size
+            if self._pins[entry.path]:
+                self._evicted.add(entry.path)
+            else:
+                self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def record_served(self, nbytes: int) -> None:
+        """Count bytes sent to clients from the cache."""
+        with self._lock:
+            self._stats.bytes_served += nbytes
+
+    def stats(self) -> EdgeCacheStats:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return EdgeCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                origin_fetches=self._stats.origin_fetches,
+                bytes_served=self._stats.bytes_served,
+                cached_bytes=self._stats.cached_bytes,
+                cached_objects=len(self._entries),
+            )
+
+
+def fetch_from_storage(object_name: str, path: str) -> str:
+    """
+    Download an object from the storage backend.
+
+    Args:
+        object_name: Name of the object in the bucket
+        path: Local path to write the object to
+
+    Returns:
+        str: The object's ETag
+
+    Raises:
+        ObjectNotFoundError: If the object does not exist
+
+    """
+    return get_storage().download(object_name, path).etag
+
+
+def remove_orphaned_caches(root: str) -> None:
+    """
+    Delete the cache directories of processes that are no longer running.
+
+    Args:
+        root: Directory holding one cache directory per process ID
+
+    """
+    if not os.path.isdir(root):
+        return
+    for entry in os.scandir(root):
+        if not entry.is_dir() or not entry.name.isdigit():
+            continue
+        pid = int(entry.name)
+        if pid == os.getpid():
+            continue
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            shutil.rmtree(entry.path, ignore_errors=True)
+        except PermissionError:
+            # The process exists, under another user
+            continue
+
+
+@lru_cache
+def get_edge_cache() -> EdgeCache:
+    """
+    Get the process-wide edge cache.
+
+    Each process caches into its own subdirectory of `EDGE_CACHE_DIR`, so several
+    web server workers on one host do not evict each other's files, and gets
+    `EDGE_CACHE_MAX_BYTES / EDGE_CACHE_PROCESSES` of the host's budget.
+    """
+    remove_orphaned_caches(settings.EDGE_CACHE_DIR)
+    return EdgeCache(
+        os.path.join(settings.EDGE_CACHE_DIR, str(os.getpid())),
+        settings.EDGE_CACHE_MAX_BYTES // max(1, settings.EDGE_CACHE_PROCESSES),
+        fetch_from_storage,
+    )
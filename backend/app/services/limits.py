@@ -0,0 +1,219 @@
+"""
+Rate limits and upload quotas.
+
+With `RATE_LIMIT_ENABLED`, the routes guarded by `app.api.deps.RateLimit` take
+a token from the caller's bucket for the route, and from the route's global
+bucket if it has one, and are rejected with a 429 when a bucket is empty.
+
+With `QUOTAS_ENABLED`, each upload request reserves its declared size against
+the user's storage quota and its estimated duration against their transcode
+quota for the month, before the video row is created. Usage is kept in Redis
+counters instead of being summed over the user's videos for every request; a
+counter is only computed from the database when it is missing, i.e. the
+first time it is used and once a day after it expires, which also corrects
+the drift of uploads accepted while Redis was down. Deleted videos free their
+storage, and uploads never confirmed free their transcode minutes as well.
+
+Storage is rebuilt from the videos that exist, but transcode minutes from the
+append-only `TranscodeUsage` ledger: a video deleted after it was transcoded
+keeps its minutes spent, while a refund row gives back those of an upload that
+was never completed.
+
+Redis is only imported once a limit is checked, so the settings cost nothing to
+processes that leave them off.
+"""
+
+import math
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import QUOTA_REJECTED_UPLOADS, RATE_LIMITED_REQUESTS
+from app.models.transcode_usage import TranscodeUsage
+from app.models.user import User
+from app.models.video import Video
+
+if TYPE_CHECKING:
+    from app.services.redis_limits import RedisLimiter
+
+STORAGE_QUOTA = "storage"
+TRANSCODE_QUOTA = "transcode"
+
+
+class QuotaExceededError(Exception):
+    """Raised when an upload would exceed one of its owner's quotas."""
+
+    def __init__(self, quota: str):
+        super().__init__(f"Upload would exceed the {quota} quota")
+        self.quota = quota
+
+
+def get_limiter() -> "RedisLimiter":
+    """Get the process-wide limiter."""
+    from app.services.redis_limits import get_limiter
+
+    return get_limiter()
+
+
+def check_rate_limit(
+    scope: str, user_id: int, per_minute: int, global_per_minute: int = 0
+) -> float:
+    """
+    Count a request against a user's rate limit and the global one, if any.
+
+    Args:
+        scope: Name of the limit
+        user_id: The ID of the calling user
+        per_minute: Requests the user may make per minute
+        global_per_minute: Requests all users together may make per minute
+            (0 for no limit)
+
+    Returns:
+        float: 0 if the request is allowed, otherwise the seconds to wait
+
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return 0.0
+    buckets = [(f"rate:{scope}:user:{user_id}", per_minute / 60, per_minute)]
+    if global_per_minute:
+        buckets.append(
+            (f"rate:{scope}:global", global_per_minute / 60, global_per_minute)
+        )
+    wait = get_limiter().acquire(buckets)
+    if wait:
+        RATE_LIMITED_REQUESTS.labels(scope).inc()
+    return wait
+
+
+def estimated_duration(file_size: float) -> int:
+    """Estimate the seconds of video an upload holds, before it is probed."""
+    return math.ceil(file_size * 8 / settings.BACKLOG_ASSUMED_BITRATE)
+
+
+def _counters(user_id: int, month: datetime) -> tuple[str, str]:
+    """Return the names of a user's storage and monthly transcode counters."""
+    return (
+        f"quota:{user_id}:{STORAGE_QUOTA}",
+        f"quota:{user_id}:{TRANSCODE_QUOTA}:{month:%Y-%m}",
+    )
+
+
+def _usage(db: Session, user_id: int, since: datetime) -> tuple[int, int]:
+    """Sum a user's stored bytes, and the seconds of video charged since."""
+    stored = db.scalar(
+        select(func.coalesce(func.sum(Video.file_size), 0)).where(
+            Video.owner_id == user_id
+        )
+    )
+    transcoded = db.scalar(
+        select(func.coalesce(func.sum(TranscodeUsage.seconds), 0)).where(
+            TranscodeUsage.user_id == user_id, TranscodeUsage.at >= since
+        )
+    )
+    return int(stored), max(0, int(transcoded))
+
+
+def reserve_upload(db: Session, user: User, file_size: float) -> None:
+    """
+    Reserve an upload's size and estimated duration against its owner's quotas.
+
+    Args:
+        db: Database session, to compute usage counters that are missing
+        user: The uploading user
+        file_size: Declared size of the upload in bytes
+
+    Raises:
+        QuotaExceededError: If the upload would exceed a quota
+
+    """
+    if not settings.QUOTAS_ENABLED or user.is_superuser:
+        return
+    now = datetime.now(UTC)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    storage, transcode = _counters(user.id, now)
+    exceeded = get_limiter().reserve(
+        [
+            (storage, int(file_size), settings.QUOTA_STORAGE_BYTES),
+            (
+                transcode,
+                estimated_duration(file_size),
+                settings.QUOTA_TRANSCODE_MINUTES_PER_MONTH * 60,
+            ),
+        ],
+        rebuild=lambda: _usage(db, user.id, month_start),
+        ttl_seconds=settings.QUOTA_COUNTER_TTL_SECONDS,
+    )
+    if exceeded:
+        quota = (STORAGE_QUOTA, TRANSCODE_QUOTA)[exceeded - 1]
+        QUOTA_REJECTED_UPLOADS.labels(quota).inc()
+        raise QuotaExceededError(quota)
+
+
+def record_upload_usage(db: Session, video: Video) -> None:
+    """
+    Charge a new upload's estimated duration in the usage ledger, without committing.
+
+    Uploads are charged whether or not quotas are enforced, so the ledger is
+    complete when they are turned on.
+
+    Args:
+        db: Database session
+        video: The new video, flushed so it has an ID
+
+    """
+    db.add(
+        TranscodeUsage(
+            user_id=video.owner_id,
+            video_id=video.id,
+            seconds=estimated_duration(video.file_size),
+        )
+    )
+
+
+def refund_upload_usage(
+    db: Session, video_id: int, owner_id: int, file_size: float, created_at: datetime
+) -> None:
+    """
+    Refund an upload that was never completed in the usage ledger, without committing.
+
+    Args:
+        db: Database session
+        video_id: The ID of the upload
+        owner_id: The ID of the upload's owner
+        file_size: Declared size of the upload in bytes
+        created_at: When the upload was requested, the month the refund counts in
+
+    """
+    db.add(
+        TranscodeUsage(
+            user_id=owner_id,
+            video_id=video_id,
+            seconds=-estimated_duration(file_size),
+            at=created_at,
+        )
+    )
+
+
+def release_upload(
+    owner_id: int, file_size: float, created_at: datetime | None = None
+) -> None:
+    """
+    Free the quota used by an upload that was deleted or never created.
+
+    Args:
+        owner_id: The ID of the upload's owner
+        file_size: Declared size of the upload in bytes
+        created_at: When the upload was requested, to also free its transcode
+            minutes in that month; only for uploads that were never transcoded
+
+    """
+    if not settings.QUOTAS_ENABLED:
+        return
+    storage, transcode = _counters(owner_id, created_at or datetime.now(UTC))
+    counters = [(storage, int(file_size))]
+    if created_at is not None:
+        counters.append((transcode, estimated_duration(file_size)))
+    get_limiter().release(counters)
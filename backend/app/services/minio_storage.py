@@ -0,0 +1,216 @@
+"""
+MinIO storage backend.
+
+Kept apart from the `StorageBackend` interface so that the MinIO client, and
+the cryptography libraries it loads, are only imported by processes that use
+it rather than by everything importing `app.services.storage`.
+"""
+
+import io
+import os
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+from typing import BinaryIO
+
+from minio import Minio
+from minio.commonconfig import CopySource
+from minio.datatypes import PostPolicy
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+
+from app.core.config import settings
+from app.core.metrics import record_storage_transfer
+from app.services.storage import (
+    ObjectInfo,
+    ObjectNotFoundError,
+    PresignedUpload,
+    StorageBackend,
+    StorageError,
+)
+
+
+class MinioStorage(StorageBackend):
+    """Storage backend for MinIO and other S3-compatible services."""
+
+    def __init__(self):
+        self.bucket = settings.MINIO_BUCKET_NAME
+        # A fixed region lets the client sign requests without looking it up
+        self.client = Minio(
+            settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            secure=False,  # Use True for HTTPS
+            region=settings.MINIO_REGION,
+        )
+        self._bucket_checked = False
+
+    @staticmethod
+    def _translate(e: S3Error, name: str) -> StorageError:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            return ObjectNotFoundError(name)
+        return StorageError(str(e))
+
+    def ensure_bucket(self) -> None:
+        if self._bucket_checked:
+            return
+        try:
+            if not self.client.bucket_exists(self.bucket):
+                self.client.make_bucket(self.bucket)
+        except S3Error as e:
+            raise StorageError(str(e)) from e
+        self._bucket_checked = True
+
+    def check(self) -> None:
+        try:
+            if not self.client.bucket_exists(self.bucket):
+                raise StorageError(f"Bucket {self.bucket} does not exist")
+        except S3Error as e:
+            raise StorageError(str(e)) from e
+
+    def presigned_get_url(
+        self,
+        name: str,
+        expires: timedelta,
+        request_date: datetime | None = None,
+    ) -> str:
+        return self.client.presigned_get_object(
+            self.bucket, name, expires=expires, request_date=request_date
+        )
+
+    def presigned_upload(
+        self, name: str, expires: timedelta, content_type: str, max_size: int
+    ) -> PresignedUpload:
+        policy = PostPolicy(self.bucket, datetime.now(UTC) + expires)
+        policy.add_equals_condition("key", name)
+        policy.add_equals_condition("Content-Type", content_type)
+        policy.add_content_length_range_condition(0, max_size)
+        try:
+            fields = self.client.presigned_post_policy(policy)
+        except S3Error as e:
+            raise StorageError(str(e)) from e
+        return PresignedUpload(
+            url=f"http://{settings.MINIO_ENDPOINT}/{self.bucket}",
+            fields={"key": name, "Content-Type": content_type, **fields},
+        )
+
+    def stat(self, name: str) -> ObjectInfo:
+        try:
+            stat = self.client.stat_object(self.bucket, name)
+        except S3Error as e:
+            raise self._translate(e, name) from e
+        return ObjectInfo(name=name, size=stat.size, etag=stat.etag)
+
+    @contextmanager
+    def open(self, name: str) -> Iterator[BinaryIO]:
+        try:
+            response = self.client.get_object(self.bucket, name)
+        except S3Error as e:
+            raise self._translate(e, name) from e
+        try:
+            yield response
+        finally:
+            response.close()
+            response.release_conn()
+
+    def download(self, name: str, path: str) -> ObjectInfo:
+        try:
+            stat = self.client.fget_object(self.bucket, name, path)
+        except S3Error as e:
+            raise self._translate(e, name) from e
+        record_storage_transfer("download", stat.size)
+        return ObjectInfo(name=name, size=stat.size, etag=stat.etag)
+
+    def put_bytes(
+        self, name: str, data: bytes, content_type: str = "application/octet-stream"
+    ) -> None:
+        try:
+            self.client.put_object(
+                self.bucket, name, io.BytesIO(data), len(data), content_type
+            )
+        except S3Error as e:
+            raise StorageError(str(e)) from e
+        record_storage_transfer("upload", len(data))
+
+    def put_file(
+        self, name: str, path: str, content_type: str = "application/octet-stream"
+    ) -> None:
+        try:
+            self.client.fput_object(
+                self.bucket,
+                name,
+                path,
+                content_type,
+                part_size=settings.STORAGE_MULTIPART_PART_SIZE,
+            )
+        except S3Error as e:
+            raise StorageError(str(e)) from e
+        record_storage_transfer("upload", os.path.getsize(path))
+
+    def copy(self, source: str, destination: str) -> None:
+        try:
+            self.client.copy_object(
+                self.bucket, destination, CopySource(self.bucket, source)
+            )
+        except S3Error as e:
+            raise self._translate(e, source) from e
+
+    def list_objects(self, prefix: str) -> Iterator[ObjectInfo]:
+        try:
+            for obj in self.client.list_objects(
+                self.bucket, prefix=prefix, recursive=True
+            ):
+                yield ObjectInfo(name=obj.object_name, size=obj.size, etag=obj.etag)
+        except S3Error as e:
+            raise StorageError(str(e)) from e
+
+    def delete_many(self, names: Iterable[str]) -> list[str]:
+        try:
+            errors = self.client.remove_objects(
+                self.bucket, (DeleteObject(name) for name in names)
+            )
+            # Deletion is lazy: the requests are only sent while iterating
+            return [error.name for error in errors]
+        except S3Error as e:
+            raise StorageError(str(e)) from e
+
+    def list_prefixes(
+        self, prefix: str, start_after: str | None = None
+    ) -> Iterator[str]:
+        try:
+            for obj in self.client.list_objects(
+                self.bucket, prefix=prefix, start_after=start_after
+            ):
+                # The objects below `start_after` itself roll up into it again
+                if obj.is_dir and (
+                    start_after is None or obj.object_name > start_after
+                ):
+                    yield obj.object_name
+        except S3Error as e:
+            raise StorageError(str(e)) from e
+
+    def abort_incomplete_uploads(self, older_than: datetime, limit: int) -> int:
+        # minio-py only exposes the multipart upload APIs as internal methods
+        aborted = 0
+        key_marker = upload_id_marker = None
+        try:
+            while aborted < limit:
+                result = self.client._list_multipart_uploads(
+                    self.bucket,
+                    key_marker=key_marker,
+                    upload_id_marker=upload_id_marker,
+                    max_uploads=min(1000, limit - aborted),
+                )
+                for upload in result.uploads:
+                    if upload.initiated_time and upload.initiated_time < older_than:
+                        self.client._abort_multipart_upload(
+                            self.bucket, upload.object_name, upload.upload_id
+                        )
+                        aborted += 1
+                if not result.is_truncated:
+                    break
+                key_marker = result.next_key_marker
+                upload_id_marker = result.next_upload_id_marker
+        except S3Error as e:
+            raise StorageError(str(e)) from e
+        return aborted
@@ -0,0 +1,169 @@
+"""
+Storage tiering of original uploads once their video is processed.
+
+`ORIGINAL_LIFECYCLE_POLICY` decides what happens to an original
+`ORIGINAL_LIFECYCLE_AFTER_DAYS` after its video was last processed:
+
+- "keep": it stays in the hot tier
+- "cold": it is moved under `STORAGE_COLD_PREFIX`
+- "delete": it is deleted, provided the transcode produced a mezzanine (a
+  high-quality intermediate) that a future re-transcode can start from; transcodes
+  only produce one when `ORIGINAL_MEZZANINE_ENABLED` is set
+
+`Video.storage_tier` records where the original is, and `resolve_transcode_source`
+brings it back to the hot tier before a re-transcode, requested by a superuser
+through the admin API, reads it.
+"""
+
+import logging
+import time
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.video import Video
+from app.schemas.storage_tier import StorageTier
+from app.schemas.video_status import VideoStatus
+from app.services.response_cache import invalidate, video_key
+from app.services.storage import ObjectNotFoundError, StorageBackend
+from app.services.transcode_lease import renew_lease
+
+MEZZANINE_PREFIX = "mezzanine/"
+
+logger = logging.getLogger(__name__)
+
+
+def cold_key(file_key: str) -> str:
+    """Return the object name of an original in the cold tier."""
+    return f"{settings.STORAGE_COLD_PREFIX}{file_key}"
+
+
+def mezzanine_key(video_id: int) -> str:
+    """Return the object name of a video's mezzanine."""
+    return f"{MEZZANINE_PREFIX}{video_id}.mp4"
+
+
+def mezzanine_enabled() -> bool:
+    """Whether transcodes must produce a mezzanine for the lifecycle policy."""
+    return (
+        settings.ORIGINAL_MEZZANINE_ENABLED
+        and settings.ORIGINAL_LIFECYCLE_POLICY == "delete"
+    )
+
+
+def resolve_transcode_source(
+    db: Session, storage: StorageBackend, video: Video, token: int
+) -> str | None:
+    """
+    Return the object a transcode of the video reads, rehydrating it if needed.
+
+    An original in the cold tier is copied back to its hot key first. When the
+    original was deleted, the mezzanine is used instead.
+
+    Args:
+        db: Database session
+        storage: The storage backend
+        video: The video being transcoded
+        token: The fencing token of the worker's lease on the video
+
+    Returns:
+        str | None: The object name of the source, or None if the lease was lost
+
+    Raises:
+        StorageError: If the source cannot be restored
+
+    """
+    if video.storage_tier == StorageTier.DELETED:
+        return mezzanine_key(video.id)
+    if video.storage_tier == StorageTier.COLD:
+        storage.copy(cold_key(video.file_key), video.file_key)
+        if not renew_lease(db, video.id, token, storage_tier=StorageTier.HOT):
+            return None
+        storage.delete_many([cold_key(video.file_key)])
+        logger.info("Rehydrated the original of video ID %s", video.id)
+    return video.file_key
+
+
+def _move_original(
+    db: Session, storage: StorageBackend, video_id: int, file_key: str
+) -> bool:
+    """Apply the lifecycle policy to one original; return True if it was moved."""
+    if settings.ORIGINAL_LIFECYCLE_POLICY == "cold":
+        storage.copy(file_key, cold_key(file_key))
+        tier = StorageTier.COLD
+    else:
+        try:
+            storage.stat(mezzanine_key(video_id))
+        except ObjectNotFoundError:
+            return False
+        tier = StorageTier.DELETED
+
+    # Only tier videos that are still processed; one being re-transcoded keeps
+    # its hot original. The row stays locked until the original is deleted, so a
+    # transcode claiming the video meanwhile waits and then sees the new tier.
+    result = db.execute(
+        update(Video)
+        .where(
+            Video.id == video_id,
+            Video.status == VideoStatus.PROCESSED,
+            Video.storage_tier == StorageTier.HOT,
+        )
+        .values(storage_tier=tier)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1 or storage.delete_many([file_key]):
+        db.rollback()
+        if tier == StorageTier.COLD:
+            storage.delete_many([cold_key(file_key)])
+        return False
+    db.commit()
+    invalidate(video_key(video_id))
+    return True
+
+
+def apply_original_lifecycle(db: Session, storage: StorageBackend) -> int:
+    """
+    Apply `ORIGINAL_LIFECYCLE_POLICY` to the originals that are due.
+
+    Videos are handled in batches of `GC_BATCH_SIZE`, up to `GC_MAX_BATCHES` per
+    run, with a pause between batches.
+
+    Args:
+        db: Database session
+        storage: The storage backend
+
+    Returns:
+        int: Number of originals moved out of the hot tier
+
+    """
+    if settings.ORIGINAL_LIFECYCLE_POLICY == "keep":
+        return 0
+
+    cutoff = datetime.now(UTC) - timedelta(days=settings.ORIGINAL_LIFECYCLE_AFTER_DAYS)
+    moved = 0
+    last_id = 0
+    for batch in range(settings.GC_MAX_BATCHES):
+        if batch:
+            time.sleep(settings.GC_BATCH_PAUSE_SECONDS)
+        rows = db.execute(
+            select(Video.id, Video.file_key)
+            .where(
+                Video.id > last_id,
+                Video.status == VideoStatus.PROCESSED,
+                Video.storage_tier == StorageTier.HOT,
+                Video.processed_at < cutoff,
+            )
+            .order_by(Video.id)
+            .limit(settings.GC_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for video_id, file_key in rows:
+            try:
+                moved += _move_original(db, storage, video_id, file_key)
+            except ObjectNotFoundError:
+                logger.warning("Original of video ID %s is missing", video_id)
+        last_id = rows[-1][0]
+    return moved
@@ -0,0 +1,195 @@
+"""
+Token-gated HLS playback with presigned segment URLs.
+
+The HLS objects live in a private bucket. An authorized user fetches a rewritten
+master playlist whose rendition URIs point back at the API with a playback token;
+the rendition playlists are in turn rewritten so that every segment URI is a
+presigned storage URL, letting players fetch segments directly from storage.
+
+Signatures are computed locally and pinned to the start of the current expiry
+window, so every viewer in the same window gets byte-identical playlists. The
+rewritten playlists are memoized per (video, window), which makes a popular video
+cost one rewrite per window rather than one per viewer.
+"""
+
+import io
+import time
+from collections.abc import Callable, Iterable, Iterator
+from datetime import UTC, datetime, timedelta
+from functools import lru_cache
+
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.services.storage import get_storage
+
+PLAYLIST_MEDIA_TYPE = "application/vnd.apple.mpegurl"
+PLAYBACK_TOKEN_SCOPE = "playback"
+
+
+def current_window() -> int:
+    """Return the index of the current playback URL expiry window."""
+    return int(time.time()) // settings.PLAYBACK_URL_TTL_SECONDS
+
+
+def _window_start(window: int) -> datetime:
+    return datetime.fromtimestamp(window * settings.PLAYBACK_URL_TTL_SECONDS, UTC)
+
+
+def _window_expiry(window: int) -> datetime:
+    # URLs stay valid for a full window after the last moment they are handed out
+    return _window_start(window) + timedelta(
+        seconds=2 * settings.PLAYBACK_URL_TTL_SECONDS
+    )
+
+
+def create_playback_token(video_id: int, window: int) -> str:
+    """
+    Create the token authorizing playback of a video's rendition playlists.
+
+    Args:
+        video_id: The ID of the video
+        window: The expiry window the token is issued in
+
+    Returns:
+        str: The encoded token
+
+    """
+    return jwt.encode(
+        {
+            "video_id": video_id,
+            "scope": PLAYBACK_TOKEN_SCOPE,
+            "exp": _window_expiry(window),
+        },
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+
+
+def verify_playback_token(token: str, video_id: int) -> bool:
+    """
+    Check that a playback token is valid for a video.
+
+    Args:
+        token: The token from the playlist URL
+        video_id: The ID of the requested video
+
+    Returns:
+        bool: True if the token is unexpired and was issued for the video
+
+    """
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+    except JWTError:
+        return False
+    return (
+        payload.get("scope") == PLAYBACK_TOKEN_SCOPE
+        and payload.get("video_id") == video_id
+    )
+
+
+def rewrite_playlist(lines: Iterable[str], rewrite_uri: Callable[[str], str]) -> str:
+    """
+    Rewrite every URI line of an HLS playlist.
+
+    The lines are streamed straight into the output buffer, so no intermediate list
+    of URIs is built even for playlists with thousands of segments.
+
+    Args:
+        lines: The lines of the playlist
+        rewrite_uri: Function mapping an original URI to its replacement
+
+    Returns:
+        str: The rewritten playlist
+
+    """
+    output = io.StringIO()
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line and not line.startswith("#"):
+            line = rewrite_uri(line)
+        output.write(line)
+        output.write("\n")
+    return output.getvalue()
+
+
+def _iter_object_lines(object_name: str) -> Iterator[str]:
+    with get_storage().open(object_name) as f:
+        yield from io.TextIOWrapper(f, encoding="utf-8")
+
+
+@lru_cache(maxsize=settings.PLAYBACK_CACHE_SIZE)
+def render_master_playlist(video_id: int, version: str, window: int) -> str:
+    """
+    Render a video's master playlist for the given expiry window.
+
+    Rendition URIs are rewritten to the API's token-gated rendition endpoint,
+    relative to the master playlist URL.
+
+    Args:
+        video_id: The ID of the video
+        version: Version of the video's HLS output (e.g. its last update time), so
+            a republished master playlist is not served from the cache
+        window: The expiry window
+
+    Returns:
+        str: The rewritten master playlist
+
+    Raises:
+        ObjectNotFoundError: If the playlist does not exist
+
+    """
+    token = create_playback_token(video_id, window)
+    return rewrite_playlist(
+        _iter_object_lines(f"hls/{video_id}/master.m3u8"),
+        lambda uri: f"{uri}?token={token}",
+    )
+
+
+@lru_cache(maxsize=settings.PLAYBACK_CACHE_SIZE)
+def render_rendition_playlist(
+    video_id: int, version: int, playlist_name: str, window: int
+) -> str:
+    """
+    Render a rendition playlist with signed segment URLs for the given window.
+
+    Segment URIs are presigned storage URLs, or token-gated edge cache URLs when
+    `EDGE_CACHE_ENABLED` is set. Edge cache URLs carry the version, since a
+    re-transcode rewrites segments under the same names.
+
+    Args:
+        video_id: The ID of the video
+        version: The video's `version`, so a playlist republished by a
+            re-transcode is not served from the cache
+        playlist_name: File name of the rendition playlist
+        window: The expiry window
+
+    Returns:
+        str: The rewritten rendition playlist
+
+    Raises:
+        ObjectNotFoundError: If the playlist does not exist
+
+    """
+    lines = _iter_object_lines(f"hls/{video_id}/{playlist_name}")
+    if settings.EDGE_CACHE_ENABLED:
+        # Segments are served by the API's edge cache instead of storage
+        token = create_playback_token(video_id, window)
+        return rewrite_playlist(
+            lines,
+            lambda uri: (
+                f"{settings.API_V1_STR}/hls/{video_id}/{uri}?token={token}&v={version}"
+            ),
+        )
+
+    storage = get_storage()
+    request_date = _window_start(window)
+    expires = timedelta(seconds=2 * settings.PLAYBACK_URL_TTL_SECONDS)
+    return rewrite_playlist(
+        lines,
+        lambda uri: storage.presigned_get_url(
+            f"hls/{video_id}/{uri}", expires=expires, request_date=request_date
+        ),
+    )
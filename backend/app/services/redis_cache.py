@@ -0,0 +1,315 @@
+"""
+Two-level cache of serialized responses: a per-process LRU in front of Redis.
+
+Lookups try the process's own entries first, then Redis. A miss is filled once:
+requests for the same key in one process wait for the request loading it, and
+across processes the first one takes a short-lived lock in Redis while the
+others poll for the entry it stores, so a popular entry expiring or being
+invalidated causes a single load rather than one per waiting request.
+
+Invalidation deletes the entry from Redis and publishes the key, and every API
+process listening on the channel drops its own copy. Each key has a generation
+in Redis, incremented on invalidation, and a fill only stores its result if the
+generation it read before loading is unchanged, so a load that raced with an
+update never puts the old version back. Processes apply the same rule to their
+own entries.
+
+Redis is an optimization, not a dependency: when it fails, requests load from
+the database directly and Redis is left alone for `RESPONSE_CACHE_RETRY_SECONDS`.
+"""
+
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from functools import lru_cache
+
+import orjson
+import redis
+
+from app.core.config import settings
+from app.core.metrics import RESPONSE_CACHE_INVALIDATIONS, RESPONSE_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "videoflow:response:"
+INVALIDATION_CHANNEL = "videoflow:response-invalidations"
+# Generations must outlive any fill that read them
+GENERATION_TTL_SECONDS = 24 * 3600
+# How often processes waiting on another's fill look for its result
+WAIT_INTERVAL_SECONDS = 0.02
+
+# Store an entry unless its key was invalidated since the fill read the
+# generation, and release the fill's lock
+STORE_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+end
+if redis.call('GET', KEYS[3]) == ARGV[4] then
+    redis.call('DEL', KEYS[3])
+end
+"""
+# Release a fill's lock, if still held by that fill
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+"""
+
+
+class ResponseCache:
+    """
+    Serialized responses cached per process and in Redis.
+
+    Args:
+        client: Redis client
+        ttl_seconds: How long entries stay in Redis
+        local_size: Entries kept per process, least recently used evicted first
+        local_ttl_seconds: How long entries stay in the process
+        lock_seconds: How long a fill may hold its lock, and others wait for it
+        retry_seconds: How long Redis is bypassed after it failed
+
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        ttl_seconds: float,
+        local_size: int,
+        local_ttl_seconds: float,
+        lock_seconds: float,
+        retry_seconds: float,
+    ):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.local_size = local_size
+        self.local_ttl_seconds = local_ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.retry_seconds = retry_seconds
+        self._store = client.register_script(STORE_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+        # Entries with the monotonic time they expire at
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._inflight: dict[str, Future] = {}
+        # Incremented on every invalidation this process learns of, so a fill
+        # started before one doesn't keep what it read
+        self._invalidations = 0
+        self._lock = threading.Lock()
+        self._redis_down_until = 0.0
+
+    def get(self, key: str, load: Callable[[], bytes]) -> bytes:
+        """
+        Return the cached value of a key, loading and caching it on a miss.
+
+        Args:
+            key: The cache key
+            load: Function returning the current value; exceptions it raises
+                propagate and nothing is cached
+
+        Returns:
+            bytes: The value
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = entry is not None and entry[0] > time.monotonic()
+            if hit:
+                self._entries.move_to_end(key)
+            else:
+                invalidations = self._invalidations
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[key] = Future()
+        RESPONSE_CACHE_LOOKUPS.labels("local", "hit" if hit else "miss").inc()
+        if hit:
+            return entry[1]
+        if not leader:
+            # Another request of this process is already loading the key
+            return future.result()
+
+        try:
+            value = self._get_shared(key, load)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+        with self._lock:
+            if self._invalidations == invalidations:
+                self._entries[key] = (time.monotonic() + self.local_ttl_seconds, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.local_size:
+                    self._entries.popitem(last=False)
+        return value
+
+    def _get_shared(self, key: str, load: Callable[[], bytes]) -> bytes:
+        """Return a key's value from Redis, filling it from `load` on a miss."""
+        if time.monotonic() < self._redis_down_until:
+            return load()
+        name, generation_name, lock_name = _names(key)
+        token = secrets.token_hex(8)
+        try:
+            value, generation = self.client.mget(name, generation_name)
+            if value is None:
+                lock_ms = int(self.lock_seconds * 1000)
+                if not self.client.set(lock_name, token, nx=True, px=lock_ms):
+                    value = self._wait(name, lock_name)
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return load()
+        RESPONSE_CACHE_LOOKUPS.labels("redis", "miss" if value is None else "hit").inc()
+        if value is not None:
+            return value
+
+        try:
+            value = load()
+        except BaseException:
+            self._call(self._release, keys=[lock_name], args=[token])
+            raise
+        self._call(
+            self._store,
+            keys=[name, generation_name, lock_name],
+            args=[
+                generation or b"0",
+                value,
+                int(self.ttl_seconds * 1000),
+                token,
+            ],
+        )
+        return value
+
+    def _wait(self, name: str, lock_name: str) -> bytes | None:
+        """Wait for another process to fill an entry; None if it gave up."""
+        deadline = time.monotonic() + self.lock_seconds
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL_SECONDS)
+            value, locked = self.client.mget(name, lock_name)
+            if value is not None or locked is None:
+                return value
+        return None
+
+    def _call(self, script: Callable, **kwargs) -> None:
+        try:
+            script(**kwargs)
+        except redis.RedisError as e:
+            self._redis_failed(e)
+
+    def _redis_failed(self, error: Exception) -> None:
+        if time.monotonic() >= self._redis_down_until:
+            logger.warning(
+                "Response cache bypassing Redis for %ss: %s", self.retry_seconds, error
+            )
+        self._redis_down_until = time.monotonic() + self.retry_seconds
+
+    def invalidate(self, *keys: str) -> None:
+        """
+        Drop keys from every level of the cache, in all processes.
+
+        Args:
+            *keys: The cache keys
+
+        """
+        if not keys:
+            return
+        self._drop_local(keys)
+        RESPONSE_CACHE_INVALIDATIONS.inc(len(keys))
+        try:
+            with self.client.pipeline() as pipe:
+                for key in keys:
+                    name, generation_name, _ = _names(key)
+                    pipe.incr(generation_name)
+                    pipe.expire(generation_name, GENERATION_TTL_SECONDS)
+                    pipe.delete(name)
+                pipe.publish(INVALIDATION_CHANNEL, orjson.dumps(keys))
+                pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Could not invalidate %s in Redis: %s", keys, e)
+
+    def _drop_local(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            self._invalidations += 1
+            for key in keys:
+                self._entries.pop(key, None)
+                # Later requests must not join a fill started before
+                self._inflight.pop(key, None)
+
+    def clear_local(self) -> None:
+        """Drop all of this process's entries."""
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+            self._inflight.clear()
+
+    def listen(self, stop: threading.Event) -> None:
+        """
+        Drop the entries other processes invalidate, until stopped.
+
+        Args:
+            stop: Event ending the subscription once set
+
+        """
+        while not stop.is_set():
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Invalidations published while unsubscribed were missed
+                self.clear_local()
+                while not stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._drop_local(orjson.loads(message["data"]))
+            except redis.RedisError as e:
+                logger.warning("Response cache invalidations unavailable: %s", e)
+                stop.wait(self.retry_seconds)
+            finally:
+                pubsub.close()
+
+    def start_listener(self) -> threading.Event:
+        """
+        Listen for invalidations in a background thread.
+
+        Returns:
+            threading.Event: Event stopping the listener once set
+
+        """
+        stop = threading.Event()
+        threading.Thread(
+            target=self.listen,
+            args=(stop,),
+            name="response-cache-invalidations",
+            daemon=True,
+        ).start()
+        return stop
+
+
+def _names(key: str) -> tuple[str, str, str]:
+    """Return the Redis keys of an entry, its generation and its fill lock."""
+    name = KEY_PREFIX + key
+    return name, f"{name}:generation", f"{name}:lock"
+
+
+@lru_cache
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache."""
+    client = redis.Redis.from_url(
+        settings.RESPONSE_CACHE_REDIS_URL,
+        socket_timeout=settings.RESPONSE_CACHE_REDIS_TIMEOUT_SECONDS,
+        socket_connect_timeout=settings.RESPONSE_CACHE_REDIS_TIMEOUT_SECONDS,
+    )
+    return ResponseCache(
+        client,
+        ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+        local_size=settings.RESPONSE_CACHE_LOCAL_SIZE,
+        local_ttl_seconds=settings.RESPONSE_CACHE_LOCAL_TTL_SECONDS,
+        lock_seconds=settings.RESPONSE_CACHE_LOCK_SECONDS,
+        retry_seconds=settings.RESPONSE_CACHE_RETRY_SECONDS,
+    )
@@ -0,0 +1,225 @@
+"""
+Rate limits and usage counters kept in Redis.
+
+Each check is one round trip running a Lua script, so it is atomic across the
+API processes and adds a fraction of a millisecond to a request:
+
+- Rate limits are token buckets stored as hashes holding the tokens left and
+  when they were counted, refilled from the Redis server's clock so the API
+  hosts' clocks don't matter. A request takes a token from every bucket it
+  draws on (e.g. the user's and the route's global one) or from none of them.
+- Quotas are counters reserved against their limits in one step, so
+  concurrent uploads cannot both squeeze under a limit.
+
+Like the response cache, the limits are a protection, not a dependency: when
+Redis fails, requests are let through and Redis is left alone for
+`LIMITS_RETRY_SECONDS`.
+"""
+
+import logging
+import time
+from collections.abc import Callable, Sequence
+from functools import lru_cache
+
+import redis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "videoflow:limits:"
+
+# KEYS: the buckets. ARGV: the tokens to take, then the refill rate (tokens
+# per second) and capacity of each bucket. Returns the seconds to wait until
+# every bucket has the tokens, or 0 once they were taken.
+ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'at')
+    local tokens = tonumber(bucket[1]) or capacity
+    local at = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - at) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - cost), 'at', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000))
+end
+return '0'
+"""
+
+# KEYS: the counters. ARGV: the amount to add to, then the limit of, each
+# counter (0 for no limit). Returns -1 if a counter is missing, the 1-based
+# index of the first counter that would exceed its limit, or 0 once all were
+# incremented.
+RESERVE_SCRIPT = """
+local used = {}
+for i, key in ipairs(KEYS) do
+    local value = redis.call('GET', key)
+    if not value then
+        return -1
+    end
+    used[i] = tonumber(value)
+end
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i])
+    if limit > 0 and used[i] + tonumber(ARGV[2 * i - 1]) > limit then
+        return i
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('INCRBY', key, ARGV[2 * i - 1])
+end
+return 0
+"""
+
+# KEYS: the counters. ARGV: the amount to take off each. Missing counters are
+# left to be rebuilt, and counters never go below zero.
+RELEASE_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        if redis.call('DECRBY', key, ARGV[i]) < 0 then
+            redis.call('SET', key, 0, 'KEEPTTL')
+        end
+    end
+end
+"""
+
+
+class RedisLimiter:
+    """
+    Token buckets and quota counters in Redis.
+
+    Args:
+        client: Redis client
+        retry_seconds: How long Redis is bypassed after it failed
+
+    """
+
+    def __init__(self, client: redis.Redis, retry_seconds: float):
+        self.client = client
+        self.retry_seconds = retry_seconds
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+        self._reserve = client.register_script(RESERVE_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+        self._redis_down_until = 0.0
+
+    def acquire(self, buckets: Sequence[tuple[str, float, float]]) -> float:
+        """
+        Take a token from each of several buckets, or from none.
+
+        Args:
+            buckets: Name, refill rate (tokens per second) and capacity of each
+                bucket
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds until
+            they will be available
+
+        """
+        args = [1]
+        for _, rate, capacity in buckets:
+            args += [rate, capacity]
+        wait = self._call(
+            self._acquire, [KEY_PREFIX + name for name, _, _ in buckets], args
+        )
+        return float(wait or 0)
+
+    def reserve(
+        self,
+        counters: Sequence[tuple[str, int, int]],
+        rebuild: Callable[[], Sequence[int]],
+        ttl_seconds: int,
+    ) -> int:
+        """
+        Add to several counters unless one of them would exceed its limit.
+
+        Args:
+            counters: Name, amount to add and limit (0 for none) of each
+                counter
+            rebuild: Function returning the current value of each counter,
+                called to initialize them when one is missing
+            ttl_seconds: How long rebuilt counters live before being rebuilt
+                again
+
+        Returns:
+            int: 0 if the counters were incremented, otherwise the position
+            (from 1) of the first counter that would exceed its limit
+
+        """
+        keys = [KEY_PREFIX + name for name, _, _ in counters]
+        args = []
+        for _, amount, limit in counters:
+            args += [amount, limit]
+        result = self._call(self._reserve, keys, args)
+        if result == -1:
+            try:
+                with self.client.pipeline() as pipe:
+                    for key, value in zip(keys, rebuild(), strict=True):
+                        # Counters initialized meanwhile by another request win
+                        pipe.set(key, value, nx=True, ex=ttl_seconds)
+                    pipe.execute()
+            except redis.RedisError as e:
+                self._redis_failed(e)
+                return 0
+            result = self._call(self._reserve, keys, args)
+        # Nothing is enforced while Redis is unavailable
+        return result if result and result > 0 else 0
+
+    def release(self, counters: Sequence[tuple[str, int]]) -> None:
+        """
+        Take amounts off counters, e.g. for uploads that were deleted.
+
+        Args:
+            counters: Name and amount to take off each counter
+
+        """
+        self._call(
+            self._release,
+            [KEY_PREFIX + name for name, _ in counters],
+            [amount for _, amount in counters],
+        )
+
+    def _call(self, script: Callable, keys: list, args: list):
+        """Run a script, returning None while Redis is unavailable."""
+        if time.monotonic() < self._redis_down_until:
+            return None
+        try:
+            return script(keys=keys, args=args)
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return None
+
+    def _redis_failed(self, error: Exception) -> None:
+        if time.monotonic() >= self._redis_down_until:
+            logger.warning(
+                "Limits not enforced for %ss, Redis failed: %s",
+                self.retry_seconds,
+                error,
+            )
+        self._redis_down_until = time.monotonic() + self.retry_seconds
+
+
+@lru_cache
+def get_limiter() -> RedisLimiter:
+    """Get the process-wide limiter."""
+    client = redis.Redis.from_url(
+        settings.LIMITS_REDIS_URL,
+        socket_timeout=settings.LIMITS_REDIS_TIMEOUT_SECONDS,
+        socket_connect_timeout=settings.LIMITS_REDIS_TIMEOUT_SECONDS,
+    )
+    return RedisLimiter(client, retry_seconds=settings.LIMITS_RETRY_SECONDS)
@@ -0,0 +1,87 @@
+"""
+Cached responses of the hot read endpoints.
+
+With `RESPONSE_CACHE_ENABLED`, video details and the tag and category lists are
+served from the two-level cache of `app.services.redis_cache`, which holds each
+response's body along with its caching headers. Whatever changes what one of
+these responses shows invalidates its key once committed: the mutation
+endpoints, and the transcode pipeline when it updates a video's status, tier,
+duration or playlist.
+
+Redis is only imported once the cache is used, so the setting costs nothing to
+processes that leave it off.
+"""
+
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+import orjson
+from fastapi.responses import Response
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.services.redis_cache import ResponseCache
+
+TAGS_KEY = "tags"
+CATEGORIES_KEY = "categories"
+# Headers stored with the body; the others are derived from it
+CACHED_HEADERS = ("etag", "last-modified", "cache-control")
+
+
+def video_key(video_id: int) -> str:
+    """Return the cache key of a video's details."""
+    return f"video:{video_id}"
+
+
+def get_response_cache() -> "ResponseCache":
+    """Get the process-wide response cache."""
+    from app.services.redis_cache import get_response_cache
+
+    return get_response_cache()
+
+
+def _pack(response: Response) -> bytes:
+    headers = {
+        name: value
+        for name, value in response.headers.items()
+        if name in CACHED_HEADERS
+    }
+    return orjson.dumps(headers) + b"\n" + response.body
+
+
+def _unpack(value: bytes) -> Response:
+    headers, _, body = value.partition(b"\n")
+    return Response(body, headers=orjson.loads(headers), media_type="application/json")
+
+
+def cached_response(key: str, load: Callable[[], Response]) -> Response:
+    """
+    Return a cached JSON response, loading and caching it on a miss.
+
+    Args:
+        key: The cache key
+        load: Function building the response; exceptions it raises (e.g. a
+            404) propagate and nothing is cached
+
+    Returns:
+        Response: The response, with the headers it was cached with
+
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return load()
+    return _unpack(get_response_cache().get(key, lambda: _pack(load())))
+
+
+def invalidate(*keys: str) -> None:
+    """
+    Drop cached responses, in every process.
+
+    Call it once the change is committed.
+
+    Args:
+        *keys: The cache keys
+
+    """
+    if settings.RESPONSE_CACHE_ENABLED:
+        get_response_cache().invalidate(*keys)
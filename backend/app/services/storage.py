@@ -0,0 +1,465 @@
+"""
+Object storage backends.
+
+The API, the transcode task and playback access the bucket through the
+`StorageBackend` interface rather than a MinIO client, so the whole upload and
+transcode pipeline can also run against the local filesystem (`STORAGE_BACKEND`
+set to "local"), e.g. in CI and performance runs on a single box.
+
+The local backend issues presigned URLs pointing at the API's `/storage`
+endpoint, signed with an HMAC of the application's secret key.
+"""
+
+import hashlib
+import hmac
+import os
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from functools import lru_cache
+from typing import BinaryIO
+from urllib.parse import quote, urlencode
+
+from app.core.config import settings
+from app.core.metrics import record_storage_transfer
+
+
+class StorageError(Exception):
+    """Raised when the storage backend fails to perform an operation."""
+
+
+class ObjectNotFoundError(StorageError):
+    """Raised when the requested object does not exist."""
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    """Metadata of a stored object."""
+
+    name: str
+    size: int
+    etag: str
+
+
+@dataclass(frozen=True)
+class PresignedUpload:
+    """A form a client can POST a file to, without going through the API."""
+
+    url: str
+    fields: dict[str, str]
+
+
+class StorageBackend(ABC):
+    """Interface of the object storage holding uploads and HLS output."""
+
+    @abstractmethod
+    def ensure_bucket(self) -> None:
+        """Create the bucket if it does not exist yet."""
+
+    @abstractmethod
+    def check(self) -> None:
+        """
+        Check that the bucket can be reached, for readiness probes.
+
+        Raises:
+            StorageError: If the storage is unreachable or the bucket is missing
+
+        """
+
+    @abstractmethod
+    def presigned_get_url(
+        self,
+        name: str,
+        expires: timedelta,
+        request_date: datetime | None = None,
+    ) -> str:
+        """
+        Create a URL granting temporary read access to an object.
+
+        Args:
+            name: Name of the object
+            expires: How long the URL stays valid
+            request_date: Time the signature is computed for (default: now), so
+                URLs signed for the same date are identical
+
+        Returns:
+            str: The presigned URL
+
+        """
+
+    @abstractmethod
+    def presigned_upload(
+        self, name: str, expires: timedelta, content_type: str, max_size: int
+    ) -> PresignedUpload:
+        """
+        Create a form for uploading an object directly to storage.
+
+        Args:
+            name: Name of the object to create
+            expires: How long the form stays valid
+            content_type: Content type the upload must have
+            max_size: Maximum size of the upload in bytes
+
+        Returns:
+            PresignedUpload: The form's URL and fields
+
+        """
+
+    @abstractmethod
+    def stat(self, name: str) -> ObjectInfo:
+        """
+        Get an object's metadata.
+
+        Raises:
+            ObjectNotFoundError: If the object does not exist
+
+        """
+
+    @abstractmethod
+    def open(self, name: str) -> Iterator[BinaryIO]:
+        """
+        Open an object for streaming reads, as a context manager.
+
+        Raises:
+            ObjectNotFoundError: If the object does not exist
+
+        """
+
+    @abstractmethod
+    def download(self, name: str, path: str) -> ObjectInfo:
+        """
+        Download an object to a local file.
+
+        Raises:
+            ObjectNotFoundError: If the object does not exist
+
+        """
+
+    @abstractmethod
+    def put_bytes(
+        self, name: str, data: bytes, content_type: str = "application/octet-stream"
+    ) -> None:
+        """Store a small object in a single request."""
+
+    @abstractmethod
+    def put_file(
+        self, name: str, path: str, content_type: str = "application/octet-stream"
+    ) -> None:
+        """
+        Store a local file, in parts if it exceeds `STORAGE_MULTIPART_PART_SIZE`.
+
+        The local file may be removed once this returns.
+        """
+
+    @abstractmethod
+    def copy(self, source: str, destination: str) -> None:
+        """
+        Copy an object within the bucket, without transferring it through the API.
+
+        Raises:
+            ObjectNotFoundError: If the source object does not exist
+
+        """
+
+    @abstractmethod
+    def list_objects(self, prefix: str) -> Iterator[ObjectInfo]:
+        """List the objects whose names start with `prefix`, recursively."""
+
+    @abstractmethod
+    def list_prefixes(
+        self, prefix: str, start_after: str | None = None
+    ) -> Iterator[str]:
+        """
+        List the "directories" directly below `prefix`, e.g. "hls/1/" for "hls/".
+
+        Args:
+            prefix: The parent "directory", ending with "/"
+            start_after: Only list the "directories" sorting after this one
+
+        """
+
+    @abstractmethod
+    def delete_many(self, names: Iterable[str]) -> list[str]:
+        """
+        Delete objects in bulk. Missing objects are ignored.
+
+        Returns:
+            list[str]: Names of the objects that could not be deleted
+
+        """
+
+    @abstractmethod
+    def abort_incomplete_uploads(self, older_than: datetime, limit: int) -> int:
+        """
+        Abort uploads that were started before `older_than` and never completed.
+
+        Args:
+            older_than: Uploads started before this time are considered abandoned
+            limit: Maximum number of uploads to abort
+
+        Returns:
+            int: Number of uploads aborted
+
+        """
+
+
+def _copy_file(source: str, destination: str) -> None:
+    """
+    Copy a file without moving its bytes through user space.
+
+    A hardlink is used when both paths are on the same filesystem (objects are
+    never modified in place, only replaced), otherwise the data is copied with
+    `os.sendfile`.
+    """
+    directory = os.path.dirname(destination)
+    os.makedirs(directory, exist_ok=True)
+    partial = os.path.join(directory, f".part-{uuid.uuid4().hex}")
+    try:
+        try:
+            os.link(source, partial)
+        except OSError:
+            with open(source, "rb") as src, open(partial, "wb") as dst:
+                size = os.fstat(src.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(
+                        dst.fileno(), src.fileno(), offset, size - offset
+                    )
+                    if sent == 0:
+                        break
+                    offset += sent
+        os.replace(partial, destination)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Storage backend keeping objects as files under a root directory.
+
+    Args:
+        root: Directory holding the objects
+        base_url: URL of the API's local storage endpoint
+
+    """
+
+    def __init__(self, root: str, base_url: str):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, name: str) -> str:
+        """
+        Return the local path of an object.
+
+        Raises:
+            StorageError: If the name would escape the storage root
+
+        """
+        path = os.path.abspath(os.path.join(self.root, name))
+        if os.path.commonpath([self.root, path]) != self.root or path == self.root:
+            raise StorageError(f"Invalid object name: {name}")
+        return path
+
+    def _info(self, name: str, path: str) -> ObjectInfo:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise ObjectNotFoundError(name) from None
+        return ObjectInfo(
+            name=name, size=stat.st_size, etag=f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        )
+
+    @staticmethod
+    def sign(*parts: str) -> str:
+        """Sign the parts of a presigned request with the application secret."""
+        message = "\n".join(parts).encode()
+        return hmac.new(
+            settings.SECRET_KEY.encode(), message, hashlib.sha256
+        ).hexdigest()
+
+    @classmethod
+    def verify(cls, signature: str, expires: int, *parts: str) -> bool:
+        """Check a presigned request's signature and expiry."""
+        if expires < datetime.now(UTC).timestamp():
+            return False
+        return hmac.compare_digest(signature, cls.sign(str(expires), *parts))
+
+    def ensure_bucket(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+
+    def check(self) -> None:
+        if not os.path.isdir(self.root):
+            raise StorageError(f"Storage root {self.root} does not exist")
+
+    def presigned_get_url(
+        self,
+        name: str,
+        expires: timedelta,
+        request_date: datetime | None = None,
+    ) -> str:
+        expires_at = int(((request_date or datetime.now(UTC)) + expires).timestamp())
+        query = urlencode(
+            {
+                "expires": expires_at,
+                "signature": self.sign(str(expires_at), "GET", name),
+            }
+        )
+        return f"{self.base_url}/{quote(name)}?{query}"
+
+    def presigned_upload(
+        self, name: str, expires: timedelta, content_type: str, max_size: int
+    ) -> PresignedUpload:
+        expires_at = str(int((datetime.now(UTC) + expires).timestamp()))
+        return PresignedUpload(
+            url=self.base_url,
+            fields={
+                "key": name,
+                "Content-Type": content_type,
+                "max_size": str(max_size),
+                "expires": expires_at,
+                "signature": self.sign(
+                    expires_at, "POST", name, content_type, str(max_size)
+                ),
+            },
+        )
+
+    def stat(self, name: str) -> ObjectInfo:
+        return self._info(name, self.path(name))
+
+    @contextmanager
+    def open(self, name: str) -> Iterator[BinaryIO]:
+        try:
+            f = open(self.path(name), "rb")
+        except FileNotFoundError:
+            raise ObjectNotFoundError(name) from None
+        with f:
+            yield f
+
+    def download(self, name: str, path: str) -> ObjectInfo:
+        source = self.path(name)
+        info = self._info(name, source)
+        _copy_file(source, path)
+        record_storage_transfer("download", info.size)
+        return info
+
+    def put_bytes(
+        self, name: str, data: bytes, content_type: str = "application/octet-stream"
+    ) -> None:
+        destination = self.path(name)
+        directory = os.path.dirname(destination)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=directory, prefix=".part-", delete=False
+        ) as f:
+            f.write(data)
+        os.replace(f.name, destination)
+        record_storage_transfer("upload", len(data))
+
+    def put_file(
+        self, name: str, path: str, content_type: str = "application/octet-stream"
+    ) -> None:
+        _copy_file(path, self.path(name))
+        record_storage_transfer("upload", os.path.getsize(path))
+
+    def copy(self, source: str, destination: str) -> None:
+        source_path = self.path(source)
+        if not os.path.exists(source_path):
+            raise ObjectNotFoundError(source)
+        _copy_file(source_path, self.path(destination))
+
+    def list_objects(self, prefix: str) -> Iterator[ObjectInfo]:
+        # Only walk the deepest directory that can contain matching objects
+        start = os.path.join(self.root, os.path.dirname(prefix))
+        for directory, subdirectories, files in os.walk(start):
+            # Walk in name order, like S3 listings
+            subdirectories.sort()
+            for file in sorted(files):
+                if file.startswith(".part-"):
+                    continue
+                path = os.path.join(directory, file)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if name.startswith(prefix):
+                    try:
+                        yield self._info(name, path)
+                    except ObjectNotFoundError:
+                        continue
+
+    def list_prefixes(
+        self, prefix: str, start_after: str | None = None
+    ) -> Iterator[str]:
+        directory = os.path.join(self.root, prefix)
+        if not prefix.endswith("/") or not os.path.isdir(directory):
+            return
+        # In the order of the full names, like S3 listings
+        for name in sorted(
+            f"{prefix}{entry.name}/"
+            for entry in os.scandir(directory)
+            if entry.is_dir()
+        ):
+            if start_after is None or name > start_after:
+                yield name
+
+    def _prune_empty_directories(self, directory: str) -> None:
+        # Like S3, a "directory" exists only while it holds objects
+        while directory != self.root:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
+
+    def delete_many(self, names: Iterable[str]) -> list[str]:
+        failed = []
+        directories = set()
+        for name in names:
+            try:
+                path = self.path(name)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except (OSError, StorageError):
+                failed.append(name)
+                continue
+            directories.add(os.path.dirname(path))
+        for directory in sorted(directories, reverse=True):
+            self._prune_empty_directories(directory)
+        return failed
+
+    def abort_incomplete_uploads(self, older_than: datetime, limit: int) -> int:
+        # Interrupted writes leave their partial files behind
+        aborted = 0
+        cutoff = older_than.timestamp()
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                path = os.path.join(directory, file)
+                if not file.startswith(".part-"):
+                    continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        aborted += 1
+                except FileNotFoundError:
+                    continue
+                if aborted >= limit:
+                    return aborted
+        return aborted
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    """
+    Get the storage backend selected by `STORAGE_BACKEND`.
+
+    The backend is created once per process, and the MinIO client is only
+    imported when it is selected.
+    """
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.STORAGE_LOCAL_ROOT, settings.STORAGE_LOCAL_URL)
+    from app.services.minio_storage import MinioStorage
+
+    return MinioStorage()
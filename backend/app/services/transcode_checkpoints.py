@@ -0,0 +1,98 @@
+"""
+Checkpoint bookkeeping for resumable transcode jobs.
+
+`transcode_video` runs with `acks_late=True`, so a worker crash or deploy causes the
+task to be redelivered. The helpers in this module persist which stages of a job have
+already completed so the redelivered task can resume instead of starting over.
+"""
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.transcode_checkpoint import TranscodeCheckpoint
+
+SOURCE_FETCHED = "source_fetched"
+MEZZANINE_STORED = "mezzanine_stored"
+
+
+def encoded_stage(rendition_name: str) -> str:
+    """
+    Return the checkpoint name for a rendition that has been encoded locally.
+
+    Args:
+        rendition_name: Name of the rendition (e.g. "720p")
+
+    Returns:
+        str: The checkpoint stage name
+
+    """
+    return f"encoded:{rendition_name}"
+
+
+def uploaded_stage(rendition_name: str) -> str:
+    """
+    Return the checkpoint name for a rendition that has been uploaded to storage.
+
+    Args:
+        rendition_name: Name of the rendition (e.g. "720p")
+
+    Returns:
+        str: The checkpoint stage name
+
+    """
+    return f"uploaded:{rendition_name}"
+
+
+def get_completed_stages(db: Session, video_id: int) -> set[str]:
+    """
+    Get the names of all stages already completed for a video's transcode job.
+
+    Args:
+        db: Database session
+        video_id: The ID of the video being transcoded
+
+    Returns:
+        set[str]: The completed stage names
+
+    """
+    rows = (
+        db.query(TranscodeCheckpoint.stage)
+        .filter(TranscodeCheckpoint.video_id == video_id)
+        .all()
+    )
+    return {stage for (stage,) in rows}
+
+
+def mark_stage_completed(db: Session, video_id: int, stage: str) -> None:
+    """
+    Persist a completed stage for a video's transcode job.
+
+    The checkpoint is committed immediately so it survives a worker crash. Marking
+    a stage that is already recorded is a no-op.
+
+    Args:
+        db: Database session
+        video_id: The ID of the video being transcoded
+        stage: Name of the completed stage
+
+    """
+    db.add(TranscodeCheckpoint(video_id=video_id, stage=stage))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+
+def clear_checkpoints(db: Session, video_id: int) -> None:
+    """
+    Remove all checkpoints for a video once its transcode job has finished.
+
+    Args:
+        db: Database session
+        video_id: The ID of the video that was transcoded
+
+    """
+    db.query(TranscodeCheckpoint).filter(
+        TranscodeCheckpoint.video_id == video_id
+    ).delete(synchronize_session=False)
+    db.commit()
@@ -0,0 +1,204 @@
+"""
+Per-video leases guarding against duplicate transcodes.
+
+With `acks_late=True` and broker visibility-timeout redelivery, the same video can be
+handed to two workers at once. Before doing any work, `transcode_video` claims the
+video row with a conditional UPDATE that bumps a fencing token. Only the worker
+holding the current token may renew the lease or write the video's status, so a
+stale worker whose lease was taken over cannot overwrite the new owner's results.
+Status changes are recorded in the video's status history in the same transaction,
+and the cached responses showing the video are invalidated once committed.
+
+While a job runs, `LeaseHeartbeat` renews its lease from a background thread, so
+a single long stage (e.g. one encode of a large upload) cannot outlast the lease
+and let a redelivered copy of the job start a second transcode. Renewals leave
+the video's `version` and `updated_at` alone, since nothing visible changed.
+"""
+
+import logging
+import threading
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.video import Video
+from app.schemas.video_status import VideoStatus
+from app.services.response_cache import invalidate, video_key
+from app.services.video_status_events import record_status_event
+
+logger = logging.getLogger(__name__)
+
+CLAIMABLE_STATUSES = (VideoStatus.UPLOADED, VideoStatus.PROCESSING)
+
+
+def _lease_expiry() -> datetime:
+    return datetime.now(UTC) + timedelta(seconds=settings.TRANSCODE_LEASE_SECONDS)
+
+
+def claim_video(db: Session, video_id: int) -> int | None:
+    """
+    Claim a video for transcoding.
+
+    The claim succeeds when the video is waiting to be (or was being) processed and
+    no other worker holds an unexpired lease on it. A successful claim moves the
+    video to `PROCESSING`.
+
+    Args:
+        db: Database session
+        video_id: The ID of the video to claim
+
+    Returns:
+        int | None: The fencing token of the new lease, or None if the video is
+        already claimed by another worker or does not need processing
+
+    """
+    now = datetime.now(UTC)
+    token = db.execute(
+        update(Video)
+        .where(
+            Video.id == video_id,
+            Video.status.in_(CLAIMABLE_STATUSES),
+            or_(Video.lease_expires_at.is_(None), Video.lease_expires_at < now),
+        )
+        .values(
+            lease_token=Video.lease_token + 1,
+            lease_expires_at=_lease_expiry(),
+            status=VideoStatus.PROCESSING,
+        )
+        .returning(Video.lease_token)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if token is not None:
+        record_status_event(db, video_id, VideoStatus.PROCESSING)
+    db.commit()
+    if token is not None:
+        invalidate(video_key(video_id))
+    return token
+
+
+def renew_lease(db: Session, video_id: int, token: int, **values) -> bool:
+    """
+    Extend a lease held by the current worker.
+
+    Args:
+        db: Database session
+        video_id: The ID of the claimed video
+        token: The fencing token returned by `claim_video`
+        **values: Column values to write along with the renewal (e.g. `hls_url`)
+
+    Returns:
+        bool: False if the lease has been taken over by another worker, or was
+        released
+
+    """
+    if not values:
+        # A bare renewal is not an update of the video: keep its ETag valid
+        values = {"version": Video.version, "updated_at": Video.updated_at}
+    result = db.execute(
+        update(Video)
+        .where(
+            Video.id == video_id,
+            Video.lease_token == token,
+            Video.lease_expires_at.is_not(None),
+        )
+        .values(lease_expires_at=_lease_expiry(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount == 1 and "version" not in values:
+        invalidate(video_key(video_id))
+    return result.rowcount == 1
+
+
+def finish_lease(db: Session, video_id: int, token: int, **values) -> bool:
+    """
+    Write the final state of a transcode and release the lease.
+
+    The write is fenced on the token, so it is discarded if another worker has
+    taken over the video in the meantime.
+
+    Args:
+        db: Database session
+        video_id: The ID of the claimed video
+        token: The fencing token returned by `claim_video`
+        **values: Column values to write (e.g. `status`, `hls_url`)
+
+    Returns:
+        bool: False if the lease has been taken over by another worker
+
+    """
+    result = db.execute(
+        update(Video)
+        .where(Video.id == video_id, Video.lease_token == token)
+        .values(lease_expires_at=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1 and "status" in values:
+        record_status_event(db, video_id, values["status"])
+    db.commit()
+    if result.rowcount == 1:
+        invalidate(video_key(video_id))
+    return result.rowcount == 1
+
+
+class LeaseHeartbeat:
+    """
+    Renew a lease every third of `TRANSCODE_LEASE_SECONDS` while a block runs.
+
+    The renewals stop once the lease is lost or released, which sets `lost`.
+
+    Args:
+        session_factory: Returns a context manager yielding a database session,
+            used by the heartbeat's thread
+        video_id: The ID of the claimed video
+        token: The fencing token returned by `claim_video`
+        on_renew: Called after each renewal, e.g. to renew other resources
+            held by the job
+
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AbstractContextManager[Session]],
+        video_id: int,
+        token: int,
+        on_renew: Callable[[], None] | None = None,
+    ):
+        self.session_factory = session_factory
+        self.video_id = video_id
+        self.token = token
+        self.on_renew = on_renew
+        self.lost = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"lease-heartbeat-{video_id}", daemon=True
+        )
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(settings.TRANSCODE_LEASE_SECONDS / 3):
+            try:
+                with self.session_factory() as db:
+                    renewed = renew_lease(db, self.video_id, self.token)
+            except Exception as e:
+                # Retried at the next beat, well before the lease expires
+                logger.warning(
+                    "Could not renew the lease on video %s: %s", self.video_id, e
+                )
+                continue
+            if not renewed:
+                self.lost.set()
+                return
+            if self.on_renew is not None:
+                self.on_renew()
@@ -0,0 +1,38 @@
+"""
+Selection of the Celery queue a transcode job is sent to.
+"""
+
+from app.core.celery_app import (
+    TRANSCODE_LONG_QUEUE,
+    TRANSCODE_PRIORITY_QUEUE,
+    TRANSCODE_SHORT_QUEUE,
+)
+from app.core.config import settings
+
+
+def select_transcode_queue(
+    duration: float | None, file_size: float, is_superuser: bool = False
+) -> str:
+    """
+    Select the queue a video's transcode job should be routed to.
+
+    Superusers' uploads go to the priority lane. Other uploads are classified as
+    short or long by their probed duration, or by their file size when the video
+    has not been probed yet.
+
+    Args:
+        duration: Probed duration of the video in seconds, if known
+        file_size: Size of the video file in bytes
+        is_superuser: Whether the video's owner is a superuser
+
+    Returns:
+        str: Name of the Celery queue
+
+    """
+    if is_superuser:
+        return TRANSCODE_PRIORITY_QUEUE
+    if duration is not None:
+        is_short = duration <= settings.TRANSCODE_SHORT_MAX_SECONDS
+    else:
+        is_short = file_size <= settings.TRANSCODE_SHORT_MAX_BYTES
+    return TRANSCODE_SHORT_QUEUE if is_short else TRANSCODE_LONG_QUEUE
@@ -0,0 +1,162 @@
+"""
+Status history of videos and the timings derived from it.
+
+Each status change appends a `VideoStatusEvent` in the transaction making the
+change. Pairing every event with the next one for the same video gives how long
+the video stayed in a status: `UPLOADED` followed by `PROCESSING` is the time
+spent waiting in the queue, and `PROCESSING` followed by `PROCESSED` or
+`FAILED` is the time a transcode took. The percentiles are computed in the
+database, with window functions both Postgres and SQLite support.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import and_, case, extract, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.video_status_event import VideoStatusEvent
+from app.schemas.video_status import VideoStatus
+
+QUEUE_WAIT = "queue_wait"
+PROCESSING = "processing"
+PERCENTILES = (50, 95, 99)
+
+
+def record_status_event(db: Session, video_id: int, status: VideoStatus) -> None:
+    """
+    Add a status change to the session, to be committed with the change itself.
+
+    Args:
+        db: Database session
+        video_id: The ID of the video whose status changed
+        status: The status the video moved to
+
+    """
+    db.add(VideoStatusEvent(video_id=video_id, status=status))
+
+
+def _seconds_between(db: Session, start, end) -> ColumnElement:
+    if db.get_bind().dialect.name == "sqlite":
+        return (func.julianday(end) - func.julianday(start)) * 86400
+    return extract("epoch", end - start)
+
+
+def get_status_timings(db: Session, since: datetime) -> dict:
+    """
+    Summarize queue wait, processing time and failure rate since a point in time.
+
+    Intervals are counted when they ended within the window, and the failure
+    rate is the share of transcodes finished within it that failed.
+
+    Args:
+        db: Database session
+        since: Start of the window
+
+    Returns:
+        dict: Count and p50/p95/p99 seconds of queue wait and processing time,
+        and the number of finished and failed transcodes with the failure rate
+
+    """
+    status = VideoStatusEvent.status
+    window = {
+        "partition_by": VideoStatusEvent.video_id,
+        "order_by": (VideoStatusEvent.at, VideoStatusEvent.id),
+    }
+    # Only the histories of videos whose status changed within the window
+    recent_videos = select(VideoStatusEvent.video_id).where(
+        VideoStatusEvent.at >= since
+    )
+    events = (
+        select(
+            status,
+            VideoStatusEvent.at,
+            func.lead(status, type_=status.type).over(**window).label("next_status"),
+            func.lead(VideoStatusEvent.at, type_=VideoStatusEvent.at.type)
+            .over(**window)
+            .label("next_at"),
+        )
+        .where(VideoStatusEvent.video_id.in_(recent_videos))
+        .subquery()
+    )
+
+    kind = case(
+        (
+            and_(
+                events.c.status == VideoStatus.UPLOADED,
+                events.c.next_status == VideoStatus.PROCESSING,
+            ),
+            QUEUE_WAIT,
+        ),
+        (
+            and_(
+                events.c.status == VideoStatus.PROCESSING,
+                events.c.next_status.in_([VideoStatus.PROCESSED, VideoStatus.FAILED]),
+            ),
+            PROCESSING,
+        ),
+    )
+    intervals = (
+        select(
+            kind.label("kind"),
+            _seconds_between(db, events.c.at, events.c.next_at).label("seconds"),
+        )
+        .where(events.c.next_at >= since)
+        .subquery()
+    )
+    ranked = (
+        select(
+            intervals.c.kind,
+            intervals.c.seconds,
+            func.row_number()
+            .over(partition_by=intervals.c.kind, order_by=intervals.c.seconds)
+            .label("rank"),
+            func.count().over(partition_by=intervals.c.kind).label("total"),
+        )
+        .where(intervals.c.kind.is_not(None))
+        .subquery()
+    )
+    # Nearest-rank percentiles: the smallest value ranked at or above p% of them
+    rows = db.execute(
+        select(
+            ranked.c.kind,
+            func.count().label("count"),
+            *(
+                func.min(
+                    case(
+                        (
+                            ranked.c.rank * 100 >= ranked.c.total * percent,
+                            ranked.c.seconds,
+                        )
+                    )
+                ).label(f"p{percent}")
+                for percent in PERCENTILES
+            ),
+        ).group_by(ranked.c.kind)
+    ).mappings()
+    timings = {
+        name: {"count": 0, **{f"p{percent}": None for percent in PERCENTILES}}
+        for name in (QUEUE_WAIT, PROCESSING)
+    }
+    for row in rows:
+        timings[row["kind"]] = {
+            "count": row["count"],
+            **{f"p{percent}": float(row[f"p{percent}"]) for percent in PERCENTILES},
+        }
+
+    finished, failed = db.execute(
+        select(
+            func.count(),
+            func.count(case((status == VideoStatus.FAILED, 1))),
+        ).where(
+            status.in_([VideoStatus.PROCESSED, VideoStatus.FAILED]),
+            VideoStatusEvent.at >= since,
+        )
+    ).one()
+    return {
+        QUEUE_WAIT: timings[QUEUE_WAIT],
+        PROCESSING: timings[PROCESSING],
+        "finished": finished,
+        "failed": failed,
+        "failure_rate": failed / finished if finished else None,
+    }
@@ -0,0 +1,294 @@
+"""
+Removal of deleted videos' objects and garbage collection of abandoned uploads.
+
+Object deletions are sent in bulk requests of `STORAGE_DELETE_BATCH_SIZE` keys,
+and the periodic `collect_garbage` job works in bounded batches with a pause in
+between, so cleanup never competes with uploads and playback for Postgres or
+MinIO.
+"""
+
+import itertools
+import logging
+import time
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.database import session_scope
+from app.models.gc_cursor import GcCursor
+from app.models.transcode_checkpoint import TranscodeCheckpoint
+from app.models.video import Video
+from app.models.video_category_association import video_category_association
+from app.models.video_tag_association import video_tag_association
+from app.schemas.video_status import VideoStatus
+from app.services.limits import refund_upload_usage, release_upload
+from app.services.original_lifecycle import (
+    apply_original_lifecycle,
+    cold_key,
+    mezzanine_key,
+)
+from app.services.response_cache import invalidate, video_key
+from app.services.storage import StorageBackend, get_storage
+
+HLS_PREFIX = "hls/"
+# Name of the cursor of the scan for orphaned HLS output
+HLS_GC_CURSOR = "hls"
+
+logger = logging.getLogger(__name__)
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _gc_cutoff() -> datetime:
+    return datetime.now(UTC) - timedelta(seconds=settings.GC_GRACE_SECONDS)
+
+
+def delete_objects(storage: StorageBackend, names: Iterable[str]) -> int:
+    """
+    Delete objects in bulk requests of `STORAGE_DELETE_BATCH_SIZE` keys.
+
+    Args:
+        storage: The storage backend
+        names: Names of the objects to delete; may be a lazy listing
+
+    Returns:
+        int: Number of objects deleted
+
+    """
+    deleted = 0
+    for batch in _batches(names, settings.STORAGE_DELETE_BATCH_SIZE):
+        failed = storage.delete_many(batch)
+        if failed:
+            logger.warning(
+                "Could not delete %d objects, e.g. %s", len(failed), failed[0]
+            )
+        deleted += len(batch) - len(failed)
+    return deleted
+
+
+def _prefix_objects(storage: StorageBackend, prefix: str) -> Iterator[str]:
+    return (obj.name for obj in storage.list_objects(prefix))
+
+
+def delete_hls_output(storage: StorageBackend, video_id: int) -> int:
+    """
+    Delete everything under a video's `hls/{id}/` prefix.
+
+    Args:
+        storage: The storage backend
+        video_id: The ID of the video
+
+    Returns:
+        int: Number of objects deleted
+
+    """
+    return delete_objects(storage, _prefix_objects(storage, f"{HLS_PREFIX}{video_id}/"))
+
+
+def delete_video_rows(db: Session, video_ids: list[int]) -> None:
+    """
+    Delete videos and the rows referencing them, without committing.
+
+    Args:
+        db: Database session
+        video_ids: The IDs of the videos to delete
+
+    """
+    for table in (video_tag_association, video_category_association):
+        db.execute(delete(table).where(table.c.video_id.in_(video_ids)))
+    db.execute(
+        delete(TranscodeCheckpoint).where(TranscodeCheckpoint.video_id.in_(video_ids))
+    )
+    db.execute(delete(Video).where(Video.id.in_(video_ids)))
+
+
+@celery_app.task(acks_late=True)
+def delete_video_objects(video_id: int, file_key: str) -> int:
+    """
+    Celery task deleting all objects of a deleted video.
+
+    This covers the original upload in either tier, the mezzanine and the HLS
+    output.
+
+    Args:
+        video_id: The ID of the deleted video
+        file_key: Object name of the original upload
+
+    Returns:
+        int: Number of objects deleted
+
+    """
+    storage = get_storage()
+    deleted = delete_objects(
+        storage,
+        itertools.chain(
+            [file_key, cold_key(file_key), mezzanine_key(video_id)],
+            _prefix_objects(storage, f"{HLS_PREFIX}{video_id}/"),
+        ),
+    )
+    logger.info("Deleted %d objects of video ID %s", deleted, video_id)
+    return deleted
+
+
+def reap_abandoned_uploads(db: Session, storage: StorageBackend) -> int:
+    """
+    Delete `PENDING` videos whose upload form expired without being confirmed.
+
+    Rows are locked and deleted before their objects, so a confirmation racing
+    with the reaper either wins or finds the video gone.
+
+    Args:
+        db: Database session
+        storage: The storage backend
+
+    Returns:
+        int: Number of videos reaped
+
+    """
+    cutoff = _gc_cutoff() - timedelta(seconds=settings.UPLOAD_URL_EXPIRE_SECONDS)
+    reaped = 0
+    for batch in range(settings.GC_MAX_BATCHES):
+        if batch:
+            time.sleep(settings.GC_BATCH_PAUSE_SECONDS)
+        rows = db.execute(
+            select(
+                Video.id,
+                Video.file_key,
+                Video.owner_id,
+                Video.file_size,
+                Video.created_at,
+            )
+            .where(Video.status == VideoStatus.PENDING, Video.created_at < cutoff)
+            .order_by(Video.id)
+            .limit(settings.GC_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            break
+        delete_video_rows(db, [row.id for row in rows])
+        # Never uploaded, so never transcoded either
+        for row in rows:
+            refund_upload_usage(db, row.id, row.owner_id, row.file_size, row.created_at)
+        db.commit()
+        invalidate(*(video_key(row.id) for row in rows))
+        for row in rows:
+            release_upload(row.owner_id, row.file_size, row.created_at)
+        delete_objects(storage, [row.file_key for row in rows])
+        reaped += len(rows)
+    return reaped
+
+
+def _orphaned_video_ids(db: Session, video_ids: list[int]) -> list[int]:
+    """Return the IDs whose HLS output is not referenced by a live video."""
+    rows = db.execute(
+        select(Video.id, Video.status, Video.updated_at, Video.lease_expires_at).where(
+            Video.id.in_(video_ids)
+        )
+    ).all()
+    cutoff = _gc_cutoff()
+    referenced = {
+        video_id
+        for video_id, status, updated_at, lease_expires_at in rows
+        # The output of a failed transcode is kept for a grace period
+        if status != VideoStatus.FAILED
+        or lease_expires_at is not None
+        or updated_at is None
+        or updated_at.replace(tzinfo=updated_at.tzinfo or UTC) >= cutoff
+    }
+    return [video_id for video_id in video_ids if video_id not in referenced]
+
+
+def remove_orphaned_hls_output(db: Session, storage: StorageBackend) -> int:
+    """
+    Delete `hls/{id}/` prefixes of deleted videos and of failed transcodes.
+
+    Each run scans at most `GC_MAX_BATCHES` batches of prefixes, resuming after
+    the last prefix scanned by the previous run, and starts over from the
+    beginning once the listing is exhausted.
+
+    Args:
+        db: Database session
+        storage: The storage backend
+
+    Returns:
+        int: Number of prefixes removed
+
+    """
+    cursor = db.get(GcCursor, HLS_GC_CURSOR)
+    if cursor is None:
+        cursor = GcCursor(name=HLS_GC_CURSOR)
+        db.add(cursor)
+    limit = settings.GC_BATCH_SIZE * settings.GC_MAX_BATCHES
+    prefixes = itertools.islice(
+        storage.list_prefixes(HLS_PREFIX, start_after=cursor.position), limit
+    )
+    removed = scanned = 0
+    last = None
+    for batch, names in enumerate(_batches(prefixes, settings.GC_BATCH_SIZE)):
+        if batch:
+            time.sleep(settings.GC_BATCH_PAUSE_SECONDS)
+        ids = [
+            int(name[len(HLS_PREFIX) :].rstrip("/"))
+            for name in names
+            if name[len(HLS_PREFIX) :].rstrip("/").isdigit()
+        ]
+        for video_id in _orphaned_video_ids(db, ids):
+            delete_hls_output(storage, video_id)
+            removed += 1
+        scanned += len(names)
+        last = names[-1]
+    cursor.position = last if scanned == limit else None
+    db.commit()
+    return removed
+
+
+@celery_app.task
+def collect_garbage() -> dict[str, int]:
+    """
+    Periodic Celery task reclaiming storage left behind by abandoned work.
+
+    It reaps `PENDING` videos whose upload was never confirmed, aborts multipart
+    uploads that were never completed, and deletes HLS output no live video
+    refers to.
+
+    Returns:
+        dict[str, int]: Number of items reclaimed by each step
+
+    """
+    storage = get_storage()
+    with session_scope() as db:
+        reaped = reap_abandoned_uploads(db, storage)
+        aborted = storage.abort_incomplete_uploads(
+            _gc_cutoff(), limit=settings.GC_BATCH_SIZE * settings.GC_MAX_BATCHES
+        )
+        removed = remove_orphaned_hls_output(db, storage)
+    result = {
+        "reaped_uploads": reaped,
+        "aborted_multipart_uploads": aborted,
+        "removed_hls_prefixes": removed,
+    }
+    logger.info("Garbage collection finished", extra=result)
+    return result
+
+
+@celery_app.task
+def enforce_original_lifecycle() -> int:
+    """
+    Periodic Celery task applying `ORIGINAL_LIFECYCLE_POLICY` to originals.
+
+    Returns:
+        int: Number of originals moved out of the hot tier
+
+    """
+    with session_scope() as db:
+        moved = apply_original_lifecycle(db, get_storage())
+    logger.info("Moved %d originals out of the hot tier", moved)
+    return moved
@@ -1,155 +1,711 @@
+import glob
+import logging
 import os
 import shutil
 import subprocess
-import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
 
-from minio import Minio
+from opentelemetry import trace
 
-from app.core.celery_app import celery_app
+from app.core.celery_app import (
+    TRANSCODE_LONG_QUEUE,
+    TRANSCODE_SHORT_QUEUE,
+    celery_app,
+)
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import session_scope
+from app.core.logging import RingBuffer, bind_log_context, log_context
+from app.core.metrics import FFMPEG_SPEED, TRANSCODE_STAGE_DURATION
+from app.core.profiling import child_cpu_time, profile_name, profile_task
+from app.core.tracing import tracer
 from app.models.video import Video
 from app.schemas.video_status import VideoStatus
+from app.services.admission import admit_job, release_admission, renew_admission
+from app.services.media_probe import (
+    get_duration,
+    get_stream,
+    probe_keyframe_interval,
+    probe_media,
+)
+from app.services.original_lifecycle import (
+    mezzanine_enabled,
+    mezzanine_key,
+    resolve_transcode_source,
+)
+from app.services.response_cache import invalidate, video_key
+from app.services.storage import StorageBackend, StorageError, get_storage
+from app.services.transcode_checkpoints import (
+    MEZZANINE_STORED,
+    SOURCE_FETCHED,
+    clear_checkpoints,
+    encoded_stage,
+    get_completed_stages,
+    mark_stage_completed,
+    uploaded_stage,
+)
+from app.services.transcode_lease import (
+    LeaseHeartbeat,
+    claim_video,
+    finish_lease,
+    renew_lease,
+)
+from app.services.transcode_routing import select_transcode_queue
 
+# HLS rendition ladder, from lowest to highest quality
+RENDITIONS = [
+    {"name": "360p", "height": 360, "bitrate": "800k", "audio_bitrate": "96k"},
+    {"name": "720p", "height": 720, "bitrate": "2500k", "audio_bitrate": "128k"},
+]
 
-@celery_app.task(acks_late=True)
-def transcode_video(video_id: int):
+MASTER_PLAYLIST_NAME = "master.m3u8"
+HLS_SEGMENT_SECONDS = 10
+
+# H.264 profiles every HLS client can decode, so such sources can be segmented as-is
+REMUX_H264_PROFILES = ("Constrained Baseline", "Baseline", "Main", "High")
+
+logger = logging.getLogger(__name__)
+
+
+def get_job_dir(video_id: int) -> str:
     """
-    Celery task to transcode a video into HLS format with multiple renditions.
+    Return the working directory for a video's transcode job.
+
+    The directory is deterministic so that a redelivered task on the same node can
+    reuse the source and renditions produced before a restart.
+
+    Args:
+        video_id: The ID of the video being transcoded
+
+    Returns:
+        str: Path of the job working directory
+
     """
-    original_file_path = None
-    output_dir = None
-    with get_db() as db:
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if not video:
-            print(f"Video with ID {video_id} not found.")
-            return
+    return os.path.join(settings.TRANSCODE_SCRATCH_DIR, str(video_id))
+
+
+def rendition_playlist_name(rendition: dict) -> str:
+    """Return the file name of a rendition's HLS playlist."""
+    return f"stream_{rendition['name']}.m3u8"
+
+
+def rendition_files(output_dir: str, rendition: dict) -> list[str]:
+    """
+    List the local files belonging to a rendition, segments first.
+
+    The playlist is returned last so that it is only uploaded once all the segments
+    it references are in place.
+    """
+    segments = sorted(glob.glob(os.path.join(output_dir, f"{rendition['name']}_*.ts")))
+    return [*segments, os.path.join(output_dir, rendition_playlist_name(rendition))]
+
+
+def build_ffmpeg_command(
+    source_path: str, output_dir: str, rendition: dict, threads: int
+) -> list:
+    """
+    Build the ffmpeg command encoding a source video into a single HLS rendition.
+
+    Args:
+        source_path: Path of the downloaded source video
+        output_dir: Directory the HLS playlist and segments are written to
+        rendition: The rendition to produce
+        threads: Number of encoder threads granted by admission control
+
+    Returns:
+        list: The ffmpeg command line
+
+    """
+    return [
+        "ffmpeg",
+        "-y",
+        "-i",
+        source_path,
+        "-threads",
+        str(threads),
+        "-vf",
+        f"scale=-2:{rendition['height']}",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "fast",
+        "-b:v",
+        rendition["bitrate"],
+        "-g",
+        "48",
+        "-keyint_min",
+        "48",
+        "-sc_threshold",
+        "0",
+        "-c:a",
+        "aac",
+        "-b:a",
+        rendition["audio_bitrate"],
+        "-ar",
+        "48000",
+        "-f",
+        "hls",
+        "-hls_time",
+        str(HLS_SEGMENT_SECONDS),
+        "-hls_playlist_type",
+        "vod",
+        "-hls_segment_filename",
+        os.path.join(output_dir, f"{rendition['name']}_%03d.ts"),
+        os.path.join(output_dir, rendition_playlist_name(rendition)),
+    ]
+
+
+def build_mezzanine_command(source_path: str, output_path: str, threads: int) -> list:
+    """
+    Build the ffmpeg command encoding the mezzanine of a source video.
+
+    The mezzanine keeps the source resolution at near-transparent quality, so
+    later re-transcodes can start from it once the original is deleted.
+
+    Args:
+        source_path: Path of the downloaded source video
+        output_path: Path the MP4 mezzanine is written to
+        threads: Number of encoder threads granted by admission control
+
+    Returns:
+        list: The ffmpeg command line
+
+    """
+    return [
+        "ffmpeg",
+        "-y",
+        "-i",
+        source_path,
+        "-threads",
+        str(threads),
+        "-map",
+        "0:v:0",
+        "-map",
+        "0:a:0?",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "slow",
+        "-crf",
+        "16",
+        "-pix_fmt",
+        "yuv420p",
+        "-c:a",
+        "aac",
+        "-b:a",
+        "192k",
+        "-movflags",
+        "+faststart",
+        output_path,
+    ]
+
+
+def can_remux(probe: dict, rendition: dict, keyframe_interval: float | None) -> bool:
+    """
+    Check whether a source already fits a rendition and can be segmented as-is.
+
+    The source qualifies when its video is H.264 in a widely supported profile, has
+    the rendition's height, does not exceed the rendition's bitrate, and has
+    keyframes frequent enough to cut segments of about `HLS_SEGMENT_SECONDS`.
+
+    Args:
+        probe: Output of `probe_media` for the source
+        rendition: The rendition the source would be used as
+        keyframe_interval: Longest keyframe interval of the source, in seconds
+
+    Returns:
+        bool: True if the rendition can be produced with `-c copy`
+
+    """
+    video_stream = get_stream(probe, "video")
+    if (
+        video_stream is None
+        or video_stream.get("codec_name") != "h264"
+        or video_stream.get("profile") not in REMUX_H264_PROFILES
+        or video_stream.get("pix_fmt") != "yuv420p"
+        or video_stream.get("height") != rendition["height"]
+    ):
+        return False
+    bit_rate = int(
+        video_stream.get("bit_rate") or probe.get("format", {}).get("bit_rate") or 0
+    )
+    if not bit_rate or bit_rate > _kbps(rendition["bitrate"]) * 1000:
+        return False
+    return keyframe_interval is not None and keyframe_interval <= HLS_SEGMENT_SECONDS
+
+
+def build_remux_command(
+    source_path: str,
+    output_dir: str,
+    rendition: dict,
+    keyframe_interval: float,
+    copy_audio: bool,
+) -> list:
+    """
+    Build the ffmpeg command segmenting a source into an HLS rendition without
+    re-encoding its video.
+
+    The segment duration is rounded to a whole number of keyframe intervals, since
+    segments can only be cut on keyframes when the video is copied.
+
+    Args:
+        source_path: Path of the downloaded source video
+        output_dir: Directory the HLS playlist and segments are written to
+        rendition: The rendition to produce
+        keyframe_interval: Longest keyframe interval of the source, in seconds
+        copy_audio: Whether the source audio is AAC and can be copied as well
+
+    Returns:
+        list: The ffmpeg command line
+
+    """
+    segment_seconds = keyframe_interval * max(
+        1, round(HLS_SEGMENT_SECONDS / keyframe_interval)
+    )
+    if copy_audio:
+        audio_options = ["-c:a", "copy"]
+    else:
+        audio_options = ["-c:a", "aac", "-b:a", rendition["audio_bitrate"]]
+        audio_options += ["-ar", "48000"]
+    return [
+        "ffmpeg",
+        "-y",
+        "-i",
+        source_path,
+        "-map",
+        "0:v:0",
+        "-map",
+        "0:a:0?",
+        "-c:v",
+        "copy",
+        *audio_options,
+        "-f",
+        "hls",
+        "-hls_time",
+        f"{segment_seconds:g}",
+        "-hls_playlist_type",
+        "vod",
+        "-hls_segment_filename",
+        os.path.join(output_dir, f"{rendition['name']}_%03d.ts"),
+        os.path.join(output_dir, rendition_playlist_name(rendition)),
+    ]
+
+
+def _kbps(bitrate: str) -> int:
+    return int(bitrate.rstrip("k"))
+
+
+def build_master_playlist(renditions: list[dict]) -> str:
+    """
+    Build the HLS master playlist referencing every rendition.
+
+    Args:
+        renditions: The renditions to reference
+
+    Returns:
+        str: The master playlist contents
+
+    """
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for rendition in renditions:
+        bandwidth = (
+            _kbps(rendition["bitrate"]) + _kbps(rendition["audio_bitrate"])
+        ) * 1000
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth}")
+        lines.append(rendition_playlist_name(rendition))
+    return "\n".join(lines) + "\n"
+
+
+def get_hls_url(video_id: int) -> str:
+    """
+    Return the URL of a video's HLS master playlist.
+
+    The playlist is served by the token-gated playback endpoint, so the bucket
+    holding the HLS objects can stay private.
+    """
+    return f"{settings.API_V1_STR}/playback/{video_id}/{MASTER_PLAYLIST_NAME}"
+
+
+class LeaseLostError(Exception):
+    """Raised when another worker has taken over the video being transcoded."""
+
+
+def _checkpoint(db, video_id: int, token: int, stage: str) -> None:
+    """Persist a completed stage and renew the worker's lease on the video."""
+    mark_stage_completed(db, video_id, stage)
+    if not renew_lease(db, video_id, token):
+        raise LeaseLostError(video_id)
+    renew_admission(get_job_dir(video_id))
+
+
+def _mark_failed(db, video_id: int, token: int) -> None:
+    finish_lease(db, video_id, token, status=VideoStatus.FAILED)
+    clear_checkpoints(db, video_id)
+
+
+@contextmanager
+def _stage(stage: str, rendition_name: str = "") -> Iterator[trace.Span]:
+    """Trace and time a stage of the transcode pipeline."""
+    with (
+        log_context(stage=stage, rendition=rendition_name),
+        tracer.start_as_current_span(
+            f"transcode.{stage}",
+            attributes={"transcode.rendition": rendition_name},
+        ) as span,
+        TRANSCODE_STAGE_DURATION.labels(stage, rendition_name).time(),
+    ):
+        yield span
+
+
+def _run_ffmpeg(
+    command: list, stage: str, rendition_name: str, duration: float | None
+) -> None:
+    """
+    Run an ffmpeg command, recording its duration and encoding speed.
+
+    Only the last `LOG_FFMPEG_STDERR_LINES` lines of ffmpeg's output are kept,
+    and they are only reported if the command fails.
 
-        video.status = VideoStatus.PROCESSING
-        db.add(video)
-        db.commit()
-        db.refresh(video)
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg fails, with the kept output as
+            `stderr`
 
-        minio_client = Minio(
-            settings.MINIO_ENDPOINT,
-            access_key=settings.MINIO_ACCESS_KEY,
-            secret_key=settings.MINIO_SECRET_KEY,
-            secure=False,  # Use True for HTTPS
+    """
+    with _stage(stage, rendition_name) as span:
+        start = time.perf_counter()
+        stderr = RingBuffer(settings.LOG_FFMPEG_STDERR_LINES)
+        # S603: The command is constructed from trusted inputs and job paths;
+        # passing a list avoids shell injection.
+        with (
+            child_cpu_time(f"{stage}:{rendition_name}"),
+            subprocess.Popen(  # noqa: S603
+                command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            ) as process,
+        ):
+            stderr.feed(process.stderr)
+            returncode = process.wait()
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, command, stderr=str(stderr))
+        elapsed = time.perf_counter() - start
+        if duration and elapsed > 0:
+            FFMPEG_SPEED.labels(rendition_name).observe(duration / elapsed)
+            span.set_attribute("ffmpeg.speed", duration / elapsed)
+
+
+def _upload_files(
+    storage: StorageBackend, local_paths: list[str], hls_prefix: str, existing: dict
+) -> None:
+    """Upload HLS files to storage, skipping objects that already exist."""
+    for local_path in local_paths:
+        object_name = hls_prefix + os.path.basename(local_path)
+        if existing.get(object_name) == os.path.getsize(local_path):
+            continue
+        storage.put_file(object_name, local_path)
+        logger.debug(
+            "Uploaded %s",
+            object_name,
+            extra={"sample_every": settings.LOG_SEGMENT_SAMPLE_EVERY},
         )
 
-        try:
-            # 1. Download the original video from MinIO
-            temp_dir_for_original = tempfile.mkdtemp()
-            original_file_name = video.file_key.split("/")[-1]
-            original_file_path = os.path.join(temp_dir_for_original, original_file_name)
 
+def _publish_master_playlist(
+    storage: StorageBackend, hls_prefix: str, renditions: list[dict]
+) -> None:
+    storage.put_bytes(
+        hls_prefix + MASTER_PLAYLIST_NAME,
+        build_master_playlist(renditions).encode(),
+        "application/vnd.apple.mpegurl",
+    )
+
+
+@celery_app.task(bind=True, acks_late=True)
+def transcode_video(self, video_id: int, profile: bool = False):
+    """
+    Celery task to transcode a video into HLS format with multiple renditions.
+
+    The task first claims a lease on the video, so duplicate deliveries of the same
+    job exit immediately. It then probes the source and, if the job was routed to
+    the wrong short/long queue by its file size, re-enqueues it on the right one
+    before downloading anything. Admission control then reserves CPU threads and
+    scratch space for the job, requeueing it with a delay if the node is saturated.
+
+    Each rendition is encoded and uploaded in turn. A source that already fits the
+    top rendition is remuxed into it rather than re-encoded, and published first so
+    the video becomes playable before the lower renditions are encoded.
+
+    Every stage (source fetched, each rendition encoded, each rendition uploaded) is
+    checkpointed, so a task redelivered after a worker restart skips the stages that
+    already completed and the segments already present in storage.
+
+    An original moved to the cold tier by the lifecycle policy is rehydrated
+    first, and one that was deleted is replaced by the mezzanine, which the task
+    produces itself when `ORIGINAL_MEZZANINE_ENABLED` is set and
+    `ORIGINAL_LIFECYCLE_POLICY` is "delete".
+
+    With `profile`, the run is profiled, along with the CPU time of each ffmpeg
+    process.
+    """
+    trace.get_current_span().set_attribute("video.id", video_id)
+    bind_log_context(video_id=video_id)
+    if not profile:
+        return _transcode_video(self, video_id, profile)
+    with profile_task(profile_name(f"transcode-{video_id}")):
+        return _transcode_video(self, video_id, profile)
+
+
+def _transcode_video(task, video_id: int, profile: bool) -> None:
+    job_dir = get_job_dir(video_id)
+    with session_scope() as db:
+        token = claim_video(db, video_id)
+        if token is None:
+            logger.info("Video is already claimed or needs no processing")
+            return
+
+        # Keeps the lease (and the node resources reserved for the job) from
+        # expiring while a long stage runs
+        with LeaseHeartbeat(
+            session_scope, video_id, token, on_renew=lambda: renew_admission(job_dir)
+        ):
+            video = db.query(Video).filter(Video.id == video_id).first()
+
+            storage = get_storage()
+            try:
+                source_key = resolve_transcode_source(db, storage, video, token)
+            except StorageError as e:
+                logger.error("Could not restore the original: %s", e)
+                _mark_failed(db, video_id, token)
+                return
+            if source_key is None:
+                logger.warning("Lost lease on the video; another worker took over")
+                return
+
+            probe = {}
             try:
-                minio_client.fget_object(
-                    settings.MINIO_BUCKET_NAME, video.file_key, original_file_path
+                source_url = storage.presigned_get_url(
+                    source_key, expires=timedelta(hours=1)
                 )
-                print(f"Downloaded {video.file_key} to {original_file_path}")
+                with _stage("probe"):
+                    probe = probe_media(source_url)
             except Exception as e:
-                print(f"Error downloading video {video.file_key}: {e}")
-                video.status = VideoStatus.FAILED
+                logger.warning("Could not probe %s: %s", source_key, e)
+            if video.duration is None and get_duration(probe) is not None:
+                video.duration = get_duration(probe)
                 db.add(video)
                 db.commit()
+                invalidate(video_key(video_id))
+
+            current_queue = (task.request.delivery_info or {}).get("routing_key")
+            target_queue = select_transcode_queue(
+                video.duration, video.file_size, video.owner.is_superuser
+            )
+            if (
+                current_queue in (TRANSCODE_SHORT_QUEUE, TRANSCODE_LONG_QUEUE)
+                and target_queue != current_queue
+            ):
+                finish_lease(db, video_id, token, status=VideoStatus.UPLOADED)
+                transcode_video.apply_async((video_id, profile), queue=target_queue)
+                logger.info("Rerouted from %s to %s", current_queue, target_queue)
                 return
 
-            # 2. Transcode to HLS with multiple renditions
-            output_dir = tempfile.mkdtemp(prefix=f"{video.id}_hls_")
-
-            # Define renditions (example: 360p, 720p)
-            renditions = [
-                {"height": 360, "bitrate": "800k", "audio_bitrate": "96k"},
-                {"height": 720, "bitrate": "2500k", "audio_bitrate": "128k"},
-            ]
-
-            ffmpeg_command = [
-                "ffmpeg",
-                "-i",
-                original_file_path,
-                "-preset",
-                "fast",
-                "-g",
-                "48",
-                "-keyint_min",
-                "48",
-                "-sc_threshold",
-                "0",
-                "-c:v",
-                "libx64",
-                "-c:a",
-                "aac",
-                "-b:a",
-                "96k",
-                "-ar",
-                "48000",
-                "-f",
-                "hls",
-                "-hls_time",
-                "10",
-                "-hls_playlist_type",
-                "vod",
-                "-hls_segment_filename",
-                f"{output_dir}/%v_%03d.ts",
-                "-master_pl_name",
-                "master.m3u8",
-            ]
-
-            for i, rendition in enumerate(renditions):
-                ffmpeg_command.extend(
-                    [
-                        "-vf",
-                        f"scale=-2:{rendition['height']}",
-                        "-b:v",
-                        rendition["bitrate"],
-                        f"{output_dir}/stream_{rendition['height']}p.m3u8",
-                    ]
+            admission = admit_job(job_dir, video.file_size)
+            if admission is None:
+                finish_lease(db, video_id, token, status=VideoStatus.UPLOADED)
+                logger.info("Node saturated; requeueing")
+                raise task.retry(
+                    countdown=settings.TRANSCODE_ADMISSION_RETRY_SECONDS,
+                    max_retries=None,
                 )
 
+            finished = False
             try:
-                # S603: The `ffmpeg_command` is constructed from a list of trusted inputs
-                # and securely generated temporary file paths, mitigating the risk of
-                # untrusted input execution. `shell=False` is implicitly used when passing
-                # a list, preventing shell injection.
-                subprocess.run(ffmpeg_command, check=True, capture_output=True)
-                print(f"Transcoding complete for video ID {video_id}")
-            except subprocess.CalledProcessError as e:
-                print(f"FFmpeg error: {e.stderr.decode()}")
-                video.status = VideoStatus.FAILED
-                db.add(video)
-                db.commit()
-                return
+                completed = get_completed_stages(db, video_id)
+                if completed:
+                    logger.info("Resuming from checkpoints: %s", sorted(completed))
 
-            # 3. Upload HLS files to MinIO
-            hls_prefix = f"hls/{video.id}/"
-            try:
-                for root, _, files in os.walk(output_dir):
-                    for file in files:
-                        local_path = os.path.join(root, file)
-                        minio_path = os.path.join(
-                            hls_prefix, os.path.relpath(local_path, output_dir)
+                source_dir = os.path.join(job_dir, "source")
+                output_dir = os.path.join(job_dir, "hls")
+                os.makedirs(source_dir, exist_ok=True)
+                os.makedirs(output_dir, exist_ok=True)
+                source_path = os.path.join(source_dir, source_key.split("/")[-1])
+                hls_prefix = f"hls/{video.id}/"
+
+                pending = [
+                    r for r in RENDITIONS if uploaded_stage(r["name"]) not in completed
+                ]
+                to_encode = [
+                    r
+                    for r in pending
+                    if encoded_stage(r["name"]) not in completed
+                    or not os.path.exists(
+                        os.path.join(output_dir, rendition_playlist_name(r))
+                    )
+                ]
+                # A re-transcode from the mezzanine has no need to produce it again
+                make_mezzanine = (
+                    mezzanine_enabled()
+                    and source_key != mezzanine_key(video_id)
+                    and MEZZANINE_STORED not in completed
+                )
+
+                # 1. Download the original video from storage
+                if (to_encode or make_mezzanine) and not (
+                    SOURCE_FETCHED in completed and os.path.exists(source_path)
+                ):
+                    try:
+                        with _stage("download"):
+                            storage.download(source_key, source_path)
+                        logger.info("Downloaded %s", source_key)
+                    except Exception as e:
+                        logger.error("Error downloading %s: %s", source_key, e)
+                        _mark_failed(db, video_id, token)
+                        finished = True
+                        return
+                    _checkpoint(db, video_id, token, SOURCE_FETCHED)
+
+                # 2. A source already streamable at the top rendition's size and bitrate
+                # is remuxed into that rendition, which is then produced first
+                remux_rendition = None
+                top_rendition = RENDITIONS[-1]
+                if settings.TRANSCODE_REMUX_ENABLED and top_rendition in to_encode:
+                    try:
+                        keyframe_interval = probe_keyframe_interval(source_path)
+                    except subprocess.CalledProcessError:
+                        keyframe_interval = None
+                    if can_remux(probe, top_rendition, keyframe_interval):
+                        remux_rendition = top_rendition
+                        pending.sort(key=lambda r: r is not remux_rendition)
+
+                try:
+                    existing = {
+                        obj.name: obj.size for obj in storage.list_objects(hls_prefix)
+                    }
+                except Exception as e:
+                    logger.error("Error listing HLS files in storage: %s", e)
+                    _mark_failed(db, video_id, token)
+                    finished = True
+                    return
+
+                # 3. Encode and upload each missing rendition
+                for rendition in pending:
+                    if rendition in to_encode:
+                        for stale_file in rendition_files(output_dir, rendition):
+                            if os.path.exists(stale_file):
+                                os.remove(stale_file)
+                        if rendition is remux_rendition:
+                            audio_stream = get_stream(probe, "audio")
+                            command = build_remux_command(
+                                source_path,
+                                output_dir,
+                                rendition,
+                                keyframe_interval,
+                                copy_audio=audio_stream is not None
+                                and audio_stream.get("codec_name") == "aac",
+                            )
+                        else:
+                            command = build_ffmpeg_command(
+                                source_path, output_dir, rendition, admission.threads
+                            )
+                        try:
+                            _run_ffmpeg(
+                                command,
+                                "remux" if rendition is remux_rendition else "encode",
+                                rendition["name"],
+                                video.duration,
+                            )
+                        except subprocess.CalledProcessError as e:
+                            logger.error(
+                                "ffmpeg failed with exit code %s",
+                                e.returncode,
+                                extra={"ffmpeg_stderr": e.stderr},
+                            )
+                            _mark_failed(db, video_id, token)
+                            finished = True
+                            return
+                        logger.info("Encoded %s", rendition["name"])
+                        _checkpoint(
+                            db, video_id, token, encoded_stage(rendition["name"])
                         )
-                        minio_client.fput_object(
-                            settings.MINIO_BUCKET_NAME, minio_path, local_path
+
+                    try:
+                        with _stage("upload", rendition["name"]):
+                            _upload_files(
+                                storage,
+                                rendition_files(output_dir, rendition),
+                                hls_prefix,
+                                existing,
+                            )
+                        if rendition is remux_rendition and len(pending) > 1:
+                            # Make the video playable while the rest is encoded
+                            _publish_master_playlist(storage, hls_prefix, [rendition])
+                    except Exception as e:
+                        logger.error("Error uploading HLS files to storage: %s", e)
+                        _mark_failed(db, video_id, token)
+                        finished = True
+                        return
+                    _checkpoint(db, video_id, token, uploaded_stage(rendition["name"]))
+                    if rendition is remux_rendition and len(pending) > 1:
+                        if not renew_lease(
+                            db, video_id, token, hls_url=get_hls_url(video_id)
+                        ):
+                            raise LeaseLostError(video_id)
+
+                # 4. Keep a mezzanine to re-transcode from once the original is deleted
+                if make_mezzanine:
+                    mezzanine_path = os.path.join(job_dir, "mezzanine.mp4")
+                    command = build_mezzanine_command(
+                        source_path, mezzanine_path, admission.threads
+                    )
+                    try:
+                        _run_ffmpeg(command, "encode", "mezzanine", video.duration)
+                        with _stage("upload", "mezzanine"):
+                            storage.put_file(
+                                mezzanine_key(video_id), mezzanine_path, "video/mp4"
+                            )
+                    except subprocess.CalledProcessError as e:
+                        logger.error(
+                            "ffmpeg failed with exit code %s",
+                            e.returncode,
+                            extra={"ffmpeg_stderr": e.stderr},
                         )
-                        print(f"Uploaded {local_path} to {minio_path}")
+                        _mark_failed(db, video_id, token)
+                        finished = True
+                        return
+                    except StorageError as e:
+                        logger.error("Error uploading the mezzanine to storage: %s", e)
+                        _mark_failed(db, video_id, token)
+                        finished = True
+                        return
+                    _checkpoint(db, video_id, token, MEZZANINE_STORED)
+
+                try:
+                    _publish_master_playlist(storage, hls_prefix, RENDITIONS)
+                except Exception as e:
+                    logger.error("Error uploading HLS files to storage: %s", e)
+                    _mark_failed(db, video_id, token)
+                    finished = True
+                    return
+
                 # Update video with HLS manifest URL
-                video.hls_url = f"http://{settings.MINIO_ENDPOINT}/{settings.MINIO_BUCKET_NAME}/{hls_prefix}master.m3u8"
-                video.status = VideoStatus.PROCESSED
-                db.add(video)
-                db.commit()
-                print(f"Video ID {video_id} processed and HLS URL updated.")
-            except Exception as e:
-                print(f"Error uploading HLS files to MinIO: {e}")
-                video.status = VideoStatus.FAILED
-                db.add(video)
-                db.commit()
-        finally:
-            # Clean up temporary files and directories
-            if original_file_path and os.path.exists(
-                os.path.dirname(original_file_path)
-            ):
-                shutil.rmtree(os.path.dirname(original_file_path))
-            if output_dir and os.path.exists(output_dir):
-                shutil.rmtree(output_dir)
+                if not finish_lease(
+                    db,
+                    video_id,
+                    token,
+                    hls_url=get_hls_url(video_id),
+                    status=VideoStatus.PROCESSED,
+                    processed_at=datetime.now(UTC),
+                ):
+                    raise LeaseLostError(video_id)
+                clear_checkpoints(db, video_id)
+                finished = True
+                logger.info("Video processed and HLS URL updated")
+            except LeaseLostError:
+                logger.warning("Lost lease on the video; another worker took over")
+            finally:
+                # Clean up the working directory once the job has finished; a job
+                # interrupted by an unexpected error keeps its files for the retry,
+                # but not the node resources reserved for it.
+                release_admission(job_dir)
+                if finished and os.path.exists(job_dir):
+                    shutil.rmtree(job_dir)
@@ -0,0 +1,150 @@
+"""
+Compare two benchmark results and report regressions.
+
+Works on the results of both `benchmarks.pipeline` and `benchmarks.load`.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.1
+
+Exits with status 1 if any metric got worse by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+# Metrics compared per source, all of which are better when lower
+SOURCE_METRICS = (
+    "time_to_playable_seconds",
+    "transcode_seconds",
+    "cpu_seconds_per_output_minute",
+)
+UPLOAD_REQUEST_METRICS = ("p50_ms", "p95_ms")
+# Metrics compared per route of a load test, all of which are better when lower
+ROUTE_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def _change(baseline: float, candidate: float) -> float:
+    return (candidate - baseline) / baseline if baseline else 0.0
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[str]:
+    """
+    List the metrics of `candidate` that regressed relative to `baseline`.
+
+    Sources are matched by name; sources present in only one result are skipped.
+
+    Args:
+        baseline: Results of the reference run
+        candidate: Results of the run being checked
+        threshold: Relative increase above which a metric counts as regressed
+
+    Returns:
+        list[str]: A description of each regression
+
+    """
+    pairs = [
+        (f"upload_request.{metric}", baseline["upload_request"][metric], value)
+        for metric, value in candidate["upload_request"].items()
+        if metric in UPLOAD_REQUEST_METRICS
+    ]
+    baseline_sources = {source["name"]: source for source in baseline["sources"]}
+    for source in candidate["sources"]:
+        reference = baseline_sources.get(source["name"])
+        if reference is None:
+            continue
+        pairs += [
+            (f"{source['name']}.{metric}", reference[metric], source[metric])
+            for metric in SOURCE_METRICS
+        ]
+        pairs += [
+            (f"{source['name']}.storage_bytes.{rendition}", reference_bytes, size)
+            for rendition, size in source["storage_bytes_per_rendition"].items()
+            if (
+                reference_bytes := reference["storage_bytes_per_rendition"].get(
+                    rendition
+                )
+            )
+        ]
+    return [
+        f"{name}: {old:.4g} -> {new:.4g} ({_change(old, new):+.1%})"
+        for name, old, new in pairs
+        if _change(old, new) > threshold
+    ]
+
+
+def compare_load(baseline: dict, candidate: dict, threshold: float) -> list[str]:
+    """
+    List the load test metrics of `candidate` that regressed relative to `baseline`.
+
+    Throughput regresses when it drops by more than the threshold; latency
+    percentiles and database queries per request when they rise by more than it.
+    Any error on a route counts as a regression. Routes present in only one
+    result are skipped.
+
+    Args:
+        baseline: Results of the reference run
+        candidate: Results of the run being checked
+        threshold: Relative change above which a metric counts as regressed
+
+    Returns:
+        list[str]: A description of each regression
+
+    """
+    pairs = []
+    for name, route in candidate["routes"].items():
+        reference = baseline["routes"].get(name)
+        if reference is None:
+            continue
+        pairs += [
+            (f"{name}.{metric}", reference[metric], route[metric])
+            for metric in ROUTE_METRICS
+        ]
+    pairs += [
+        (f"{route}.db_queries_per_request", reference, queries)
+        for route, queries in candidate["db_queries_per_request"].items()
+        if (reference := baseline["db_queries_per_request"].get(route)) is not None
+    ]
+    regressions = [
+        f"{name}: {old:.4g} -> {new:.4g} ({_change(old, new):+.1%})"
+        for name, old, new in pairs
+        if _change(old, new) > threshold
+    ]
+    old = baseline["total"]["throughput_rps"]
+    new = candidate["total"]["throughput_rps"]
+    if _change(old, new) < -threshold:
+        regressions.append(
+            f"total.throughput_rps: {old:.4g} -> {new:.4g} ({_change(old, new):+.1%})"
+        )
+    regressions += [
+        f"{name}: {route['errors']} of {route['requests']} requests failed"
+        for name, route in candidate["routes"].items()
+        if route["errors"]
+    ]
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Compare two result files and exit with status 1 on regressions."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    compare_results = compare_load if "routes" in candidate else compare
+    regressions = compare_results(baseline, candidate, args.threshold)
+    for regression in regressions:
+        sys.stdout.write(f"REGRESSION {regression}\n")
+    if regressions:
+        sys.exit(1)
+    sys.stdout.write("No regressions.\n")
+
+
+if __name__ == "__main__":
+    main()
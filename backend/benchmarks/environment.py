@@ -0,0 +1,39 @@
+"""
+Local stand-ins the benchmarks run the application against.
+"""
+
+import os
+
+
+def configure_environment(work_dir: str) -> None:
+    """
+    Point the application at local stand-ins under `work_dir`.
+
+    Must be called before the application is imported, since settings are read
+    at import time. Variables already set in the environment are kept.
+
+    Args:
+        work_dir: Directory holding the database, bucket and scratch space
+
+    """
+    defaults = {
+        "DATABASE_URL": f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}",
+        "POSTGRES_SERVER": "unused",
+        "POSTGRES_USER": "unused",
+        "POSTGRES_PASSWORD": "unused",
+        "POSTGRES_DB": "unused",
+        "SECRET_KEY": "benchmark",
+        "MINIO_ENDPOINT": "unused:9000",
+        "MINIO_ACCESS_KEY": "unused",
+        "MINIO_SECRET_KEY": "unused",
+        "MINIO_BUCKET_NAME": "unused",
+        "STORAGE_BACKEND": "local",
+        "STORAGE_LOCAL_ROOT": os.path.join(work_dir, "bucket"),
+        "STORAGE_LOCAL_URL": "http://testserver/api/v1/storage",
+        "TRANSCODE_SCRATCH_DIR": os.path.join(work_dir, "scratch"),
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "LOG_LEVEL": "WARNING",
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
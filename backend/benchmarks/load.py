@@ -0,0 +1,376 @@
+"""
+Offline load test of the API with a realistic traffic mix.
+
+Virtual users drive the application built by `create_application()` through
+httpx's ASGI transport, so no server, broker or object storage is needed: the
+database is SQLite unless `DATABASE_URL` (or `--database-url`) points at a
+local Postgres, storage is the local backend, and transcodes are recorded
+instead of enqueued. Each user logs in and then picks weighted scenarios:
+polling the status of its videos, reading its profile, reading and creating
+tags and categories, tagging videos and starting new uploads.
+
+Scenarios run one at a time, since the endpoints do blocking database work on
+the event loop, so the numbers are the cost of each request rather than the
+server's capacity under concurrency. Per route, the results report throughput,
+latency percentiles and database queries per request (from the
+`http_request_db_queries` metric). They are written as JSON, and compared with
+a stored baseline when `--baseline` is given, exiting with status 1 on
+regressions.
+
+Usage:
+    python -m benchmarks.load --users 20 --requests 2000 --output load.json
+    python -m benchmarks.load --baseline load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import UTC, datetime
+
+from benchmarks.compare import compare_load
+from benchmarks.environment import configure_environment
+from benchmarks.pipeline import _git_commit, _percentile
+
+# Relative frequency of each scenario in the traffic mix
+SCENARIO_WEIGHTS = {
+    "poll_video": 40,
+    "read_me": 15,
+    "list_tags": 10,
+    "list_categories": 8,
+    "upload": 8,
+    "tag_video": 5,
+    "log_in": 5,
+    "create_tag": 3,
+    "update_me": 3,
+    "create_category": 2,
+    "categorize_video": 2,
+}
+
+
+class VirtualUser:
+    """One account issuing requests, with the videos it has uploaded."""
+
+    def __init__(self, harness: "LoadTest", name: str):
+        self.harness = harness
+        self.name = name
+        self.password = f"{name}-password"
+        self.headers: dict[str, str] = {}
+        self.video_ids: list[int] = []
+
+    async def register(self) -> None:
+        """Create the account, log in and upload a first video."""
+        await self.harness.request(
+            "POST",
+            "/auth/register",
+            json={
+                "email": f"{self.name}@example.com",
+                "username": self.name,
+                "full_name": self.name,
+                "password": self.password,
+            },
+        )
+        await self.log_in()
+        await self.upload()
+
+    async def log_in(self) -> None:
+        response = await self.harness.request(
+            "POST",
+            "/auth/login",
+            data={"username": self.name, "password": self.password},
+        )
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def read_me(self) -> None:
+        await self.harness.request("GET", "/users/me", headers=self.headers)
+
+    async def update_me(self) -> None:
+        await self.harness.request(
+            "PATCH",
+            "/users/me",
+            json={"full_name": f"{self.name} {uuid.uuid4().hex[:6]}"},
+            headers=self.headers,
+        )
+
+    async def poll_video(self) -> None:
+        video_id = self.harness.random.choice(self.video_ids)
+        await self.harness.request(
+            "GET",
+            f"/videos/{video_id}",
+            route="/videos/{video_id}",
+            headers=self.headers,
+        )
+
+    async def list_tags(self) -> None:
+        await self.harness.request("GET", "/tags/", headers=self.headers)
+
+    async def list_categories(self) -> None:
+        await self.harness.request("GET", "/categories/", headers=self.headers)
+
+    async def create_tag(self) -> None:
+        response = await self.harness.request(
+            "POST", "/tags/", json={"name": f"tag-{uuid.uuid4().hex[:12]}"}
+        )
+        self.harness.tag_ids.append(response.json()["id"])
+
+    async def create_category(self) -> None:
+        response = await self.harness.request(
+            "POST", "/categories/", json={"name": f"category-{uuid.uuid4().hex[:12]}"}
+        )
+        self.harness.category_ids.append(response.json()["id"])
+
+    async def tag_video(self) -> None:
+        if not self.harness.tag_ids:
+            await self.create_tag()
+        video_id = self.harness.random.choice(self.video_ids)
+        tag_id = self.harness.random.choice(self.harness.tag_ids)
+        await self.harness.request(
+            "POST",
+            f"/videos/{video_id}/tags/{tag_id}",
+            route="/videos/{video_id}/tags/{tag_id}",
+            headers=self.headers,
+        )
+
+    async def categorize_video(self) -> None:
+        if not self.harness.category_ids:
+            await self.create_category()
+        video_id = self.harness.random.choice(self.video_ids)
+        category_id = self.harness.random.choice(self.harness.category_ids)
+        await self.harness.request(
+            "POST",
+            f"/videos/{video_id}/categories/{category_id}",
+            route="/videos/{video_id}/categories/{category_id}",
+            headers=self.headers,
+        )
+
+    async def upload(self) -> None:
+        title = f"{self.name}-{uuid.uuid4().hex[:8]}"
+        response = await self.harness.request(
+            "POST",
+            "/videos/upload-request",
+            json={
+                "title": title,
+                "file_name": f"{title}.mp4",
+                "file_size": self.harness.random.randint(1, 500) * 1024 * 1024,
+                "mime_type": "video/mp4",
+            },
+            headers=self.headers,
+        )
+        video_id = response.json()["video_id"]
+        await self.harness.request(
+            "POST",
+            "/videos/upload-complete",
+            json={"video_id": video_id},
+            headers=self.headers,
+        )
+        self.video_ids.append(video_id)
+
+
+class LoadTest:
+    """Issue the traffic mix against an in-process application."""
+
+    def __init__(self, seed: int):
+        import httpx
+
+        from app.core.config import settings
+        from app.core.database import init_db
+        from app.main import create_application
+        from app.tasks.video_processing import transcode_video
+
+        init_db()
+        app = create_application()
+        # Transcodes are out of scope: record them instead of enqueueing
+        self.enqueued: list[tuple] = []
+        transcode_video.apply_async = lambda args, **kwargs: self.enqueued.append(args)
+
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url=f"http://testserver{settings.API_V1_STR}",
+        )
+        # S311: Seeded so that runs repeat the same traffic; nothing secret here.
+        self.random = random.Random(seed)  # noqa: S311
+        self.tag_ids: list[int] = []
+        self.category_ids: list[int] = []
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def request(self, method: str, path: str, route: str | None = None, **kwargs):
+        """
+        Send a request and record its latency and outcome under its route template.
+
+        Args:
+            method: HTTP method
+            path: Path relative to the API prefix
+            route: Route template, if different from `path`
+            **kwargs: Passed on to `httpx.AsyncClient.request`
+
+        Returns:
+            httpx.Response: The response
+
+        """
+        name = f"{method} {route or path}"
+        start = time.perf_counter()
+        response = await self.client.request(method, path, **kwargs)
+        self.latencies[name].append((time.perf_counter() - start) * 1000)
+        if response.is_error:
+            self.errors[name] += 1
+        return response
+
+    async def _run_scenarios(self, users: list[VirtualUser], count: int) -> None:
+        # Scenarios are awaited one by one, so a blocking endpoint doesn't inflate
+        # the latency of the requests that would otherwise be interleaved with it
+        scenarios = list(SCENARIO_WEIGHTS)
+        weights = list(SCENARIO_WEIGHTS.values())
+        for _ in range(count):
+            user = self.random.choice(users)
+            scenario = self.random.choices(scenarios, weights)[0]
+            await getattr(user, scenario)()
+
+    async def run(self, users: int, requests: int, warmup: int) -> dict:
+        """
+        Register the users, warm up, then run the traffic mix.
+
+        Args:
+            users: Number of virtual users
+            requests: Number of scenarios to run, by randomly chosen users
+            warmup: Number of scenarios to run before measuring
+
+        Returns:
+            dict: Throughput, latency and database queries per route
+
+        """
+        run_id = uuid.uuid4().hex[:6]
+        virtual_users = [VirtualUser(self, f"load_{run_id}_{i}") for i in range(users)]
+        for user in virtual_users:
+            await user.register()
+        await self._run_scenarios(virtual_users, warmup)
+
+        self.latencies.clear()
+        self.errors.clear()
+        queries_before = _db_queries()
+        start = time.perf_counter()
+        await self._run_scenarios(virtual_users, requests)
+        elapsed = time.perf_counter() - start
+        queries_after = _db_queries()
+        await self.client.aclose()
+
+        routes = {
+            name: {
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "throughput_rps": len(samples) / elapsed,
+                "mean_ms": sum(samples) / len(samples),
+                **{
+                    f"p{percent}_ms": _percentile(samples, percent)
+                    if len(samples) > 1
+                    else samples[0]
+                    for percent in (50, 95, 99)
+                },
+            }
+            for name, samples in sorted(self.latencies.items())
+        }
+        total = sum(route["requests"] for route in routes.values())
+        return {
+            "total": {"requests": total, "throughput_rps": total / elapsed},
+            "routes": routes,
+            "db_queries_per_request": {
+                route: (queries - before[0]) / (count - before[1])
+                for route, (queries, count) in sorted(queries_after.items())
+                if count > (before := queries_before.get(route, (0.0, 0.0)))[1]
+            },
+        }
+
+
+def _db_queries() -> dict[str, tuple[float, float]]:
+    """
+    Read the sum and count of the `http_request_db_queries` histogram.
+
+    The metric is labelled by route template only, so the methods served by the
+    same route share one figure.
+
+    Returns:
+        dict[str, tuple[float, float]]: Queries and requests so far, per route
+
+    """
+    from prometheus_client import REGISTRY
+
+    totals: dict[str, list[float]] = defaultdict(lambda: [0.0, 0.0])
+    for metric in REGISTRY.collect():
+        if metric.name != "http_request_db_queries":
+            continue
+        for sample in metric.samples:
+            if sample.name.endswith("_sum"):
+                totals[sample.labels["route"]][0] = sample.value
+            elif sample.name.endswith("_count"):
+                totals[sample.labels["route"]][1] = sample.value
+    return {route: (queries, count) for route, (queries, count) in totals.items()}
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the load test, write its results and check them against a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--database-url", help="Database to run against (default: a fresh SQLite file)"
+    )
+    parser.add_argument(
+        "--output", help="File to write the results to (default: stdout)"
+    )
+    parser.add_argument("--baseline", help="Results to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    with tempfile.TemporaryDirectory(prefix="videoflow-load-") as work_dir:
+        configure_environment(work_dir)
+        from app.core.config import settings
+
+        load_test = LoadTest(args.seed)
+        measurements = asyncio.run(
+            load_test.run(args.users, args.requests, args.warmup)
+        )
+        results = {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(UTC).isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "database": settings.database_url.split(":", 1)[0],
+            },
+            "users": args.users,
+            "seed": args.seed,
+            **measurements,
+        }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_load(baseline, results, args.threshold)
+        for regression in regressions:
+            sys.stderr.write(f"REGRESSION {regression}\n")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
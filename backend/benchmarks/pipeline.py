@@ -0,0 +1,267 @@
+"""
+Offline benchmark of the upload and transcode pipeline.
+
+Everything runs in one process with local stand-ins: SQLite instead of
+Postgres, the filesystem storage backend instead of MinIO, and Celery in eager
+mode, so `transcode_video` runs inside the `/upload-complete` request. Only
+ffmpeg is required.
+
+For each synthetic source (every combination of `--durations` and
+`--resolutions`), the benchmark uploads it through the presigned form, confirms
+the upload and reports:
+
+- time to playable: from the start of the upload until the video is processed
+- CPU seconds per output minute: CPU time of the API process and its ffmpeg
+  children, per minute of video produced across all renditions
+- storage bytes per rendition
+
+plus the latency distribution of `/upload-request`. The results are written as
+JSON, to be compared between commits with `python -m benchmarks.compare`.
+
+Usage:
+    python -m benchmarks.pipeline --durations 10,60 --resolutions 1280x720 \
+        --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from urllib.parse import urlsplit
+
+from benchmarks.environment import configure_environment
+from benchmarks.sources import SourceSpec, generate_source, parse_resolution
+
+
+def _cpu_seconds() -> float:
+    usage = [
+        resource.getrusage(who)
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    ]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def _percentile(samples: list[float], percent: int) -> float:
+    return statistics.quantiles(samples, n=100, method="inclusive")[percent - 1]
+
+
+def _ffmpeg_version() -> str:
+    # S607: ffmpeg is looked up on PATH, like the transcode task does.
+    result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)  # noqa: S607
+    return result.stdout.splitlines()[0] if result.stdout else "unknown"
+
+
+def _git_commit() -> str | None:
+    command = ["git", "rev-parse", "HEAD"]
+    # S603: A fixed command; passing a list avoids shell injection.
+    result = subprocess.run(command, capture_output=True, text=True)  # noqa: S603
+    return result.stdout.strip() or None
+
+
+class PipelineBenchmark:
+    """Drive the API in-process against the local stand-ins."""
+
+    def __init__(self):
+        from fastapi.testclient import TestClient
+
+        from app.core.celery_app import celery_app
+        from app.core.database import init_db
+        from app.main import app
+        from app.services.storage import get_storage
+
+        init_db()
+        celery_app.conf.task_always_eager = True
+        celery_app.conf.task_eager_propagates = True
+        self.client = TestClient(app)
+        self.storage = get_storage()
+        self.headers = self._log_in()
+
+    def _log_in(self) -> dict[str, str]:
+        from app.core.config import settings
+
+        user = {
+            "email": "benchmark@example.com",
+            "username": "benchmark",
+            "full_name": "Benchmark",
+            "password": "benchmark-password",
+        }
+        self.client.post(f"{settings.API_V1_STR}/auth/register", json=user)
+        response = self.client.post(
+            f"{settings.API_V1_STR}/auth/login",
+            data={"username": user["username"], "password": user["password"]},
+        )
+        response.raise_for_status()
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def _upload_request(self, title: str, file_size: int) -> dict:
+        from app.core.config import settings
+
+        response = self.client.post(
+            f"{settings.API_V1_STR}/videos/upload-request",
+            json={
+                "title": title,
+                "file_name": f"{title}.mp4",
+                "file_size": file_size,
+                "mime_type": "video/mp4",
+            },
+            headers=self.headers,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def measure_upload_requests(self, count: int) -> dict:
+        """
+        Measure the latency of `/upload-request`.
+
+        Args:
+            count: Number of requests to send
+
+        Returns:
+            dict: Mean, median and 95th percentile latency in milliseconds
+
+        """
+        samples = []
+        for i in range(count):
+            start = time.perf_counter()
+            self._upload_request(f"latency_{i}", 1024 * 1024)
+            samples.append((time.perf_counter() - start) * 1000)
+        return {
+            "requests": count,
+            "mean_ms": statistics.fmean(samples),
+            "p50_ms": statistics.median(samples),
+            "p95_ms": _percentile(samples, 95) if count > 1 else samples[0],
+        }
+
+    def measure_source(self, spec: SourceSpec, source_path: str) -> dict:
+        """
+        Upload, confirm and transcode one source.
+
+        Args:
+            spec: Duration and resolution of the source
+            source_path: Path of the source file
+
+        Returns:
+            dict: The measurements for this source
+
+        """
+        from app.core.config import settings
+        from app.tasks.video_processing import RENDITIONS
+
+        file_size = os.path.getsize(source_path)
+        form = self._upload_request(spec.name, file_size)
+
+        start = time.perf_counter()
+        cpu_start = _cpu_seconds()
+        with open(source_path, "rb") as f:
+            response = self.client.post(
+                urlsplit(form["url"]).path,
+                data=form["fields"],
+                files={"file": (f"{spec.name}.mp4", f, "video/mp4")},
+            )
+        response.raise_for_status()
+        uploaded = time.perf_counter()
+
+        response = self.client.post(
+            f"{settings.API_V1_STR}/videos/upload-complete",
+            json={"video_id": form["video_id"]},
+            headers=self.headers,
+        )
+        response.raise_for_status()
+        playable = time.perf_counter()
+        cpu_seconds = _cpu_seconds() - cpu_start
+
+        video = self.client.get(
+            f"{settings.API_V1_STR}/videos/{form['video_id']}", headers=self.headers
+        ).json()
+        output_minutes = spec.duration / 60 * len(RENDITIONS)
+        return {
+            "name": spec.name,
+            "duration_seconds": spec.duration,
+            "width": spec.width,
+            "height": spec.height,
+            "source_bytes": file_size,
+            "status": video["status"],
+            "upload_seconds": uploaded - start,
+            "transcode_seconds": playable - uploaded,
+            "time_to_playable_seconds": playable - start,
+            "cpu_seconds": cpu_seconds,
+            "cpu_seconds_per_output_minute": cpu_seconds / output_minutes,
+            "storage_bytes_per_rendition": self._storage_bytes(
+                form["video_id"], RENDITIONS
+            ),
+        }
+
+    def _storage_bytes(self, video_id: int, renditions: list[dict]) -> dict:
+        sizes = dict.fromkeys((r["name"] for r in renditions), 0)
+        for obj in self.storage.list_objects(f"hls/{video_id}/"):
+            file_name = obj.name.rsplit("/", 1)[-1]
+            for name in sizes:
+                if file_name.startswith(f"{name}_") or file_name == (
+                    f"stream_{name}.m3u8"
+                ):
+                    sizes[name] += obj.size
+        return sizes
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the benchmark and write its results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--durations", default="10,60", help="Seconds, comma-separated")
+    parser.add_argument(
+        "--resolutions",
+        default="640x360,1280x720,1920x1080",
+        help="WIDTHxHEIGHT, comma-separated",
+    )
+    parser.add_argument("--upload-requests", type=int, default=50)
+    parser.add_argument(
+        "--sources-dir",
+        default=os.path.join(tempfile.gettempdir(), "videoflow-benchmark-sources"),
+        help="Directory caching the generated sources between runs",
+    )
+    parser.add_argument(
+        "--output", help="File to write the results to (default: stdout)"
+    )
+    args = parser.parse_args(argv)
+
+    specs = [
+        SourceSpec(int(duration), *parse_resolution(resolution))
+        for duration in args.durations.split(",")
+        for resolution in args.resolutions.split(",")
+    ]
+    sources = {spec: generate_source(spec, args.sources_dir) for spec in specs}
+
+    with tempfile.TemporaryDirectory(prefix="videoflow-benchmark-") as work_dir:
+        configure_environment(work_dir)
+        benchmark = PipelineBenchmark()
+        results = {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(UTC).isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "ffmpeg": _ffmpeg_version(),
+            },
+            "upload_request": benchmark.measure_upload_requests(args.upload_requests),
+            "sources": [
+                benchmark.measure_source(spec, path) for spec, path in sources.items()
+            ],
+        }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
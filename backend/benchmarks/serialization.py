@@ -0,0 +1,225 @@
+"""
+Microbenchmark of serializing videos into API responses.
+
+Builds 1,000 unsaved `Video` rows with tags and categories, like a large
+listing, and times turning them into a JSON body:
+
+- `fastapi`: FastAPI's default path, which validates the rows against
+  `list[VideoInDB]`, dumps the result to Python objects and renders them with
+  `JSONResponse`
+- `orjson`: the same validation and dump, rendered with `ORJSONResponse`
+- `model_response`: `app.core.responses.model_response` with `FAST_JSON_ENABLED`,
+  which reads the rows' loaded state and encodes it with orjson, without
+  validating it again
+
+It also reports the size of the body and the time to compress it with gzip and,
+if the `brotli` package is installed, Brotli at the configured levels. Nothing
+touches a database or the network.
+
+Usage:
+    python -m benchmarks.serialization --videos 1000 --output serialization.json
+"""
+
+import argparse
+import asyncio
+import gc
+import gzip
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+
+from benchmarks.environment import configure_environment
+from benchmarks.pipeline import _git_commit
+
+
+def build_videos(count: int, tags: int, categories: int) -> list:
+    """
+    Build unsaved videos, each with its own tags and categories.
+
+    Args:
+        count: Number of videos
+        tags: Tags per video
+        categories: Categories per video
+
+    Returns:
+        list: The `Video` rows
+
+    """
+    from app.models.category import Category
+    from app.models.tag import Tag
+    from app.models.video import Video
+    from app.schemas.storage_tier import StorageTier
+    from app.schemas.video_status import VideoStatus
+
+    tag_pool = [Tag(id=i, name=f"tag-{i}") for i in range(50)]
+    category_pool = [Category(id=i, name=f"category-{i}") for i in range(20)]
+    now = datetime.now(UTC)
+    return [
+        Video(
+            id=i,
+            title=f"Video {i}",
+            description="A synthetic video used to benchmark serialization.",
+            file_key=f"{i % 100}/{i:08x}.mp4",
+            file_size=50 * 1024 * 1024,
+            mime_type="video/mp4",
+            duration=120.5,
+            hls_url=f"hls/{i}/master.m3u8",
+            status=VideoStatus.PROCESSED,
+            storage_tier=StorageTier.HOT,
+            owner_id=i % 100,
+            created_at=now,
+            updated_at=now,
+            tags=[tag_pool[(i + j) % len(tag_pool)] for j in range(tags)],
+            categories=[
+                category_pool[(i + j) % len(category_pool)] for j in range(categories)
+            ],
+        )
+        for i in range(count)
+    ]
+
+
+def _time(function: Callable[[], object], repeat: int) -> dict:
+    samples = []
+    # Collections would land on whichever path happens to allocate at the time
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        gc.enable()
+    return {
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+    }
+
+
+def run(count: int, tags: int, categories: int, repeat: int) -> dict:
+    """
+    Time each serialization path and the compression of the result.
+
+    Args:
+        count: Number of videos
+        tags: Tags per video
+        categories: Categories per video
+        repeat: Timed runs per path, after one warmup run
+
+    Returns:
+        dict: Timings, body sizes and the speedup of each path over FastAPI's
+
+    """
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from fastapi.routing import APIRoute, serialize_response
+
+    from app.core import compression
+    from app.core.config import settings
+    from app.core.responses import model_response
+    from app.schemas.video import VideoInDB
+
+    videos = build_videos(count, tags, categories)
+    route = APIRoute("/videos", lambda: None, response_model=list[VideoInDB])
+    loop = asyncio.new_event_loop()
+
+    def fastapi_default(response_class: type) -> bytes:
+        content = loop.run_until_complete(
+            serialize_response(
+                field=route.secure_cloned_response_field,
+                response_content=videos,
+                is_coroutine=True,
+            )
+        )
+        return response_class(content).body
+
+    def fast_path() -> bytes:
+        settings.FAST_JSON_ENABLED = True
+        try:
+            return model_response(list[VideoInDB], videos).body
+        finally:
+            settings.FAST_JSON_ENABLED = False
+
+    paths = {
+        "fastapi": lambda: fastapi_default(JSONResponse),
+        "orjson": lambda: fastapi_default(ORJSONResponse),
+        "model_response": fast_path,
+    }
+    bodies = {name: path() for name, path in paths.items()}
+    # Every path must produce the same document
+    reference = json.loads(bodies["fastapi"])
+    for name, body in bodies.items():
+        if json.loads(body) != reference:
+            raise RuntimeError(f"{name} does not produce the same JSON as FastAPI")
+
+    results = {
+        name: {**_time(path, repeat), "bytes": len(bodies[name])}
+        for name, path in paths.items()
+    }
+    baseline = results["fastapi"]["median_ms"]
+    for result in results.values():
+        result["speedup"] = baseline / result["median_ms"]
+
+    body = bodies["model_response"]
+    compressors = {
+        f"gzip-{settings.RESPONSE_GZIP_LEVEL}": lambda: gzip.compress(
+            body, compresslevel=settings.RESPONSE_GZIP_LEVEL
+        )
+    }
+    if compression.brotli is not None:
+        quality = settings.RESPONSE_BROTLI_QUALITY
+        compressors[f"brotli-{quality}"] = lambda: compression.brotli.compress(
+            body, quality=quality
+        )
+    compressed = {
+        name: {**_time(compress, repeat), "bytes": len(compress())}
+        for name, compress in compressors.items()
+    }
+    loop.close()
+    return {"serialization": results, "compression": compressed}
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the microbenchmark and write its results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--tags", type=int, default=5)
+    parser.add_argument("--categories", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--output", help="File to write the results to (default: stdout)"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="videoflow-serialization-") as work_dir:
+        configure_environment(work_dir)
+        measurements = run(args.videos, args.tags, args.categories, args.repeat)
+
+    results = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(UTC).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "videos": args.videos,
+        "tags": args.tags,
+        "categories": args.categories,
+        **measurements,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Import time and time to first response of the API.
+
+Each run starts a fresh interpreter, so nothing is cached between runs besides
+the bytecode on disk. Import time is how long `import app.main` takes, which
+every API process, worker and test run pays. Time to first response is measured
+from spawning uvicorn serving `app.main:app` until `/health` answers, and
+includes the interpreter start and the application's startup. Both run against
+the local stand-ins of the other benchmarks, whose broker has no workers.
+
+The slowest imports of one run, from `python -X importtime`, show where the
+import time goes.
+
+Usage:
+    python -m benchmarks.startup --runs 5 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import UTC, datetime
+
+from benchmarks.environment import configure_environment
+from benchmarks.pipeline import _git_commit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def _summarize(samples: list[float]) -> dict:
+    return {
+        "runs": len(samples),
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "max_s": max(samples),
+    }
+
+
+def measure_import() -> float:
+    """
+    Time `import app.main` in a fresh interpreter.
+
+    Returns:
+        float: Seconds spent importing
+
+    """
+    completed = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(count: int) -> list[dict]:
+    """
+    List the modules whose import took longest, from `python -X importtime`.
+
+    Args:
+        count: How many modules to list
+
+    Returns:
+        list[dict]: Module names with their own and cumulative import time in
+        milliseconds, slowest cumulative first
+
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        modules.append(
+            {
+                "module": name.strip(),
+                "self_ms": int(own) / 1000,
+                "cumulative_ms": int(cumulative) / 1000,
+            }
+        )
+    modules.sort(key=lambda module: module["cumulative_ms"], reverse=True)
+    return modules[:count]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response(timeout: float) -> float:
+    """
+    Time from spawning uvicorn until `/health` answers.
+
+    Args:
+        timeout: Seconds to wait for the server before giving up
+
+    Returns:
+        float: Seconds until the first successful response
+
+    Raises:
+        RuntimeError: If the server exits or does not answer within `timeout`
+
+    """
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    server = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.005)
+        raise RuntimeError(f"No response from uvicorn within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Measure import time and time to first response, and write the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument(
+        "--output", help="File to write the results to (default: stdout)"
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="videoflow-startup-") as work_dir:
+        configure_environment(work_dir)
+        imports = [measure_import() for _ in range(args.runs)]
+        first_responses = [
+            measure_first_response(args.timeout) for _ in range(args.runs)
+        ]
+        results = {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(UTC).isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "import": _summarize(imports),
+            "first_response": _summarize(first_responses),
+            "slowest_imports": slowest_imports(args.top),
+        }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Add transcode checkpoints
+
+Revision ID: 2f9c4e1a7b3d
+Revises: 73803f37deb6
+Create Date: 2025-08-04 09:12:41.518203
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "2f9c4e1a7b3d"
+down_revision: str | Sequence[str] | None = "73803f37deb6"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "transcode_checkpoints",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("video_id", sa.Integer(), nullable=False),
+        sa.Column("stage", sa.String(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(["video_id"], ["videos.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "video_id", "stage", name="uq_transcode_checkpoints_stage"
+        ),
+    )
+    op.create_index(
+        op.f("ix_transcode_checkpoints_id"),
+        "transcode_checkpoints",
+        ["id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_transcode_checkpoints_video_id"),
+        "transcode_checkpoints",
+        ["video_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_transcode_checkpoints_video_id"), table_name="transcode_checkpoints"
+    )
+    op.drop_index(
+        op.f("ix_transcode_checkpoints_id"), table_name="transcode_checkpoints"
+    )
+    op.drop_table("transcode_checkpoints")
@@ -0,0 +1,61 @@
+"""
+Add transcode usage
+
+Revision ID: 4e7a2c9d8f15
+Revises: b6e2d9f41c38
+Create Date: 2025-08-19 15:12:36.804527
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4e7a2c9d8f15"
+down_revision: str | Sequence[str] | None = "b6e2d9f41c38"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "transcode_usage",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("video_id", sa.Integer(), nullable=False),
+        sa.Column("seconds", sa.Integer(), nullable=False),
+        sa.Column(
+            "at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_transcode_usage_user_id_at",
+        "transcode_usage",
+        ["user_id", "at"],
+        unique=False,
+    )
+    # Charge the videos that still exist, estimating the duration of those not
+    # probed at the default BACKLOG_ASSUMED_BITRATE; what deleted videos used is
+    # unknown
+    op.execute(
+        """
+        INSERT INTO transcode_usage (user_id, video_id, seconds, at)
+        SELECT owner_id, id, CEIL(COALESCE(duration, file_size * 8 / 5000000)),
+            created_at
+        FROM videos
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_transcode_usage_user_id_at", table_name="transcode_usage")
+    op.drop_table("transcode_usage")
@@ -0,0 +1,28 @@
+"""
+Add status index to video model
+
+Revision ID: 5c8e2b7d4a91
+Revises: a3d95c7e1f42
+Create Date: 2025-08-15 08:52:37.204516
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c8e2b7d4a91"
+down_revision: str | Sequence[str] | None = "a3d95c7e1f42"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f("ix_videos_status"), "videos", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_videos_status"), table_name="videos")
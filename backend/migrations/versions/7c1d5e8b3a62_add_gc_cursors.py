@@ -0,0 +1,40 @@
+"""
+Add garbage collection cursors
+
+Revision ID: 7c1d5e8b3a62
+Revises: 4e7a2c9d8f15
+Create Date: 2025-08-21 10:04:17.318204
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c1d5e8b3a62"
+down_revision: str | Sequence[str] | None = "4e7a2c9d8f15"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "gc_cursors",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("position", sa.String(length=1024), nullable=True),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("gc_cursors")
@@ -0,0 +1,32 @@
+"""
+Add version to video model
+
+Revision ID: 8d41f0c6b2e7
+Revises: 5c8e2b7d4a91
+Create Date: 2025-08-15 14:06:12.581930
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d41f0c6b2e7"
+down_revision: str | Sequence[str] | None = "5c8e2b7d4a91"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "videos",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("videos", "version")
@@ -0,0 +1,37 @@
+"""
+Add transcode lease to video model
+
+Revision ID: 9b41d2c6e8f0
+Revises: 2f9c4e1a7b3d
+Create Date: 2025-08-05 14:37:02.904117
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9b41d2c6e8f0"
+down_revision: str | Sequence[str] | None = "2f9c4e1a7b3d"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "videos",
+        sa.Column("lease_token", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "videos",
+        sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("videos", "lease_expires_at")
+    op.drop_column("videos", "lease_token")
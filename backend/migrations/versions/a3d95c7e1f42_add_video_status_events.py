@@ -0,0 +1,68 @@
+"""
+Add video status events
+
+Revision ID: a3d95c7e1f42
+Revises: e4a1f7c9b203
+Create Date: 2025-08-14 10:27:05.913648
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "a3d95c7e1f42"
+down_revision: str | Sequence[str] | None = "e4a1f7c9b203"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Shared with videos.status, so it is only created if missing and never dropped here
+video_status = postgresql.ENUM(
+    "PENDING",
+    "UPLOADED",
+    "PROCESSING",
+    "PROCESSED",
+    "FAILED",
+    name="videostatus",
+    create_type=False,
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    video_status.create(op.get_bind(), checkfirst=True)
+    op.create_table(
+        "video_status_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("video_id", sa.Integer(), nullable=False),
+        sa.Column("status", video_status, nullable=False),
+        sa.Column(
+            "at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["video_id"], ["videos.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_video_status_events_video_id_at",
+        "video_status_events",
+        ["video_id", "at"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_video_status_events_at", "video_status_events", ["at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_video_status_events_at", table_name="video_status_events")
+    op.drop_index(
+        "ix_video_status_events_video_id_at", table_name="video_status_events"
+    )
+    op.drop_table("video_status_events")
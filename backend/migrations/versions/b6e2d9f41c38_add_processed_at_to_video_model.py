@@ -0,0 +1,34 @@
+"""
+Add processed_at to video model
+
+Revision ID: b6e2d9f41c38
+Revises: 8d41f0c6b2e7
+Create Date: 2025-08-18 10:27:44.193062
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b6e2d9f41c38"
+down_revision: str | Sequence[str] | None = "8d41f0c6b2e7"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "videos",
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    # The last update of a processed video is the best estimate available
+    op.execute("UPDATE videos SET processed_at = updated_at WHERE status = 'PROCESSED'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("videos", "processed_at")
@@ -0,0 +1,29 @@
+"""
+Add duration to video model
+
+Revision ID: c7e35a90d14b
+Revises: 9b41d2c6e8f0
+Create Date: 2025-08-07 11:02:55.271846
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c7e35a90d14b"
+down_revision: str | Sequence[str] | None = "9b41d2c6e8f0"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("videos", sa.Column("duration", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("videos", "duration")
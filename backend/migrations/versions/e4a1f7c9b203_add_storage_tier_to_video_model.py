@@ -0,0 +1,36 @@
+"""
+Add storage tier to video model
+
+Revision ID: e4a1f7c9b203
+Revises: c7e35a90d14b
+Create Date: 2025-08-12 09:41:18.530174
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e4a1f7c9b203"
+down_revision: str | Sequence[str] | None = "c7e35a90d14b"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+storage_tier = sa.Enum("HOT", "COLD", "DELETED", name="storagetier")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    storage_tier.create(op.get_bind(), checkfirst=True)
+    op.add_column(
+        "videos",
+        sa.Column("storage_tier", storage_tier, server_default="HOT", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("videos", "storage_tier")
+    storage_tier.drop(op.get_bind(), checkfirst=True)
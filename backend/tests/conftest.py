@@ -5,7 +5,7 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
-from app.core.database import Base, get_db
+from app.core.database import Base, get_db, get_read_db
 from app.main import app
 from app.models.user import User
 
@@ -34,11 +34,38 @@ def client(db: Session) -> Generator[TestClient, None, None]:
         yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
 
 
+def register_user(
+    client: TestClient, db: Session, user_data: dict[str, str]
+) -> tuple[User, str]:
+    user = db.query(User).filter(User.email == user_data["email"]).first()
+    if user is None:
+        response = client.post("/api/v1/auth/register", json=user_data)
+        assert response.status_code == 201, (
+            f"Failed to create test user: {response.text}"
+        )
+        db.commit()  # Explicitly commit the user to the database
+        user = db.query(User).filter(User.email == user_data["email"]).first()
+        assert user is not None
+    return user, user_data["password"]
+
+
+def login(client: TestClient, user: User, password: str) -> dict[str, str]:
+    login_data = {
+        "username": user.username,
+        "password": password,
+    }
+    response = client.post("/api/v1/auth/login", data=login_data)
+    assert response.status_code == 200, f"Failed to log in test user: {response.text}"
+    token = response.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
 @pytest.fixture(scope="session")
 def test_user_data() -> dict[str, str]:
     return {
@@ -53,28 +80,35 @@ def test_user_data() -> dict[str, str]:
 def test_user(
     client: TestClient, db: Session, test_user_data: dict[str, str]
 ) -> tuple[User, str]:
-    user = db.query(User).filter(User.email == test_user_data["email"]).first()
-    if user is None:
-        response = client.post("/api/v1/auth/register", json=test_user_data)
-        assert response.status_code == 201, (
-            f"Failed to create test user: {response.text}"
-        )
-        db.commit()  # Explicitly commit the user to the database
-        user = db.query(User).filter(User.email == test_user_data["email"]).first()
-        assert user is not None
-    return user, test_user_data["password"]
+    return register_user(client, db, test_user_data)
 
 
 @pytest.fixture
 def user_token_headers(
     client: TestClient, test_user: tuple[User, str]
 ) -> dict[str, str]:
-    user, password = test_user
-    login_data = {
-        "username": user.username,
-        "password": password,
-    }
-    response = client.post("/api/v1/auth/login", data=login_data)
-    assert response.status_code == 200, f"Failed to log in test user: {response.text}"
-    token = response.json()["access_token"]
-    return {"Authorization": f"Bearer {token}"}
+    return login(client, *test_user)
+
+
+@pytest.fixture(scope="session")
+def test_superuser(client: TestClient, db: Session) -> tuple[User, str]:
+    user, password = register_user(
+        client,
+        db,
+        {
+            "email": "testsuperuser@example.com",
+            "username": "testsuperuser",
+            "full_name": "Test Superuser",
+            "password": "testpassword123",
+        },
+    )
+    user.is_superuser = True
+    db.commit()
+    return user, password
+
+
+@pytest.fixture
+def superuser_token_headers(
+    client: TestClient, test_superuser: tuple[User, str]
+) -> dict[str, str]:
+    return login(client, *test_superuser)
@@ -0,0 +1,138 @@
+import uuid
+from collections.abc import Generator
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models.video import Video
+from app.models.video_status_event import VideoStatusEvent
+from app.schemas.video_status import VideoStatus
+from app.services import backlog
+from app.services.backlog import TranscodeBacklog
+
+
+@pytest.fixture
+def videos(monkeypatch) -> Generator[Session, None, None]:
+    """An empty database holding only videos and their status events."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(
+        bind=engine, tables=[Video.__table__, VideoStatusEvent.__table__]
+    )
+
+    with Session(engine) as db:
+
+        @contextmanager
+        def override_session_scope():
+            yield db
+
+        monkeypatch.setattr(backlog, "session_scope", override_session_scope)
+        monkeypatch.setattr(backlog, "get_queue_lengths", lambda: {"celery": 0})
+        monkeypatch.setattr(backlog, "get_worker_counts", lambda: {"celery": 1})
+        monkeypatch.setattr(backlog, "_cached", None)
+        monkeypatch.setattr(settings, "BACKLOG_ASSUMED_BITRATE", 5_000_000)
+        monkeypatch.setattr(settings, "BACKLOG_THROUGHPUT_WINDOW_SECONDS", 900)
+        yield db
+
+
+def add_video(
+    db: Session, status: VideoStatus, duration: float | None, file_size: float = 1024
+) -> Video:
+    video = Video(
+        title="backlog",
+        file_key=f"{uuid.uuid4().hex}.mp4",
+        file_size=file_size,
+        mime_type="video/mp4",
+        duration=duration,
+        status=status,
+        owner_id=1,
+    )
+    db.add(video)
+    db.commit()
+    return video
+
+
+def test_backlog_counts_outstanding_media_seconds(videos: Session):
+    add_video(videos, VideoStatus.UPLOADED, 60)
+    # Not probed yet: 6.25MB at 5Mbit/s
+    add_video(videos, VideoStatus.UPLOADED, None, file_size=6_250_000)
+    add_video(videos, VideoStatus.PROCESSING, 30)
+    add_video(videos, VideoStatus.PENDING, 1000)
+    recent = add_video(videos, VideoStatus.PROCESSED, 900)
+    old = add_video(videos, VideoStatus.PROCESSED, 5000)
+    videos.add_all(
+        [
+            VideoStatusEvent(video_id=recent.id, status=VideoStatus.PROCESSED),
+            VideoStatusEvent(
+                video_id=old.id,
+                status=VideoStatus.PROCESSED,
+                at=datetime.now(UTC) - timedelta(hours=1),
+            ),
+        ]
+    )
+    videos.commit()
+
+    measured = backlog.measure_transcode_backlog(videos)
+
+    assert measured.uploaded == 2
+    assert measured.processing == 1
+    assert measured.outstanding_media_seconds == pytest.approx(100)
+    assert measured.throughput == pytest.approx(1)
+    assert measured.drain_seconds == pytest.approx(100)
+    assert measured.queue_lengths == {"celery": 0}
+    assert measured.workers == {"celery": 1}
+
+
+def test_backlog_is_cached(monkeypatch, videos: Session):
+    monkeypatch.setattr(settings, "BACKLOG_CACHE_SECONDS", 60)
+    first = backlog.get_transcode_backlog()
+    add_video(videos, VideoStatus.UPLOADED, 60)
+
+    assert backlog.get_transcode_backlog() is first
+
+    monkeypatch.setattr(settings, "BACKLOG_CACHE_SECONDS", 0)
+    assert backlog.get_transcode_backlog().uploaded == 1
+
+
+def test_worker_counts_per_queue(monkeypatch):
+    replies = {
+        "short@a": [{"name": "transcode.short"}, {"name": "celery"}],
+        "short@b": [{"name": "transcode.short"}],
+        "long@a": [{"name": "transcode.long"}],
+    }
+    inspector = SimpleNamespace(active_queues=lambda: replies)
+    monkeypatch.setattr(
+        backlog.celery_app.control, "inspect", lambda timeout: inspector
+    )
+
+    assert backlog.get_worker_counts() == {
+        "transcode.short": 2,
+        "celery": 1,
+        "transcode.long": 1,
+    }
+
+
+def test_metrics_report_the_backlog(monkeypatch, client: TestClient):
+    snapshot = TranscodeBacklog(
+        uploaded=3,
+        processing=1,
+        outstanding_media_seconds=600,
+        throughput=2,
+        queue_lengths={"transcode.short": 3},
+        workers={"transcode.short": 2},
+    )
+    monkeypatch.setattr(backlog, "get_transcode_backlog", lambda: snapshot)
+
+    metrics = client.get("/metrics").text
+
+    assert 'transcode_backlog_videos{status="uploaded"} 3.0' in metrics
+    assert "transcode_backlog_media_seconds 600.0" in metrics
+    assert "transcode_backlog_drain_seconds 300.0" in metrics
+    assert 'transcode_workers{queue="transcode.short"} 2.0' in metrics
+    assert 'transcode_queue_length{queue="transcode.short"} 3.0' in metrics
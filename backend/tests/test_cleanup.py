@@ -0,0 +1,227 @@
+import os
+import time
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.gc_cursor import GcCursor
+from app.models.user import User
+from app.models.video import Video
+from app.schemas.storage_tier import StorageTier
+from app.schemas.video_status import VideoStatus
+from app.services.original_lifecycle import cold_key, mezzanine_key
+from app.services.storage import LocalStorage
+from app.tasks import cleanup
+
+
+class CountingStorage(LocalStorage):
+    """Local storage backend counting bulk delete requests."""
+
+    def __init__(self, root: str):
+        super().__init__(root, "http://testserver/api/v1/storage")
+        self.delete_requests: list[int] = []
+
+    def delete_many(self, names):
+        names = list(names)
+        self.delete_requests.append(len(names))
+        return super().delete_many(names)
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path, db: Session) -> CountingStorage:
+    storage = CountingStorage(str(tmp_path))
+
+    @contextmanager
+    def override_session_scope():
+        yield db
+
+    monkeypatch.setattr(cleanup, "get_storage", lambda: storage)
+    monkeypatch.setattr(cleanup, "session_scope", override_session_scope)
+    monkeypatch.setattr(settings, "STORAGE_DELETE_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "GC_BATCH_PAUSE_SECONDS", 0)
+    return storage
+
+
+def create_video(
+    storage: LocalStorage,
+    db: Session,
+    user: User,
+    status: VideoStatus,
+    age: timedelta = timedelta(0),
+    segments: int = 0,
+) -> Video:
+    created_at = datetime.now(UTC) - age
+    video = Video(
+        title="Cleanup",
+        file_key=f"{user.id}/cleanup_{time.time_ns()}.mp4",
+        file_size=1024,
+        mime_type="video/mp4",
+        status=status,
+        owner_id=user.id,
+        created_at=created_at,
+        updated_at=created_at,
+        processed_at=created_at if status == VideoStatus.PROCESSED else None,
+    )
+    db.add(video)
+    db.commit()
+    db.refresh(video)
+    storage.put_bytes(video.file_key, b"source")
+    for i in range(segments):
+        storage.put_bytes(f"hls/{video.id}/360p_{i:03d}.ts", b"segment")
+    return video
+
+
+def test_delete_video_removes_row_and_objects_in_batches(
+    client: TestClient,
+    storage: CountingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+    monkeypatch,
+):
+    monkeypatch.setattr(
+        cleanup.delete_video_objects,
+        "delay",
+        lambda *args: cleanup.delete_video_objects(*args),
+    )
+    user, _ = test_user
+    video = create_video(storage, db, user, VideoStatus.PROCESSED, segments=4)
+    video_id = video.id
+
+    response = client.delete(
+        f"{settings.API_V1_STR}/videos/{video_id}", headers=user_token_headers
+    )
+
+    assert response.status_code == 204
+    assert db.query(Video).filter(Video.id == video_id).first() is None
+    assert list(storage.list_objects("")) == []
+    # The original in either tier, the mezzanine and four segments
+    assert storage.delete_requests == [2, 2, 2, 1]
+
+    response = client.delete(
+        f"{settings.API_V1_STR}/videos/{video_id}", headers=user_token_headers
+    )
+    assert response.status_code == 404
+
+
+def test_collect_garbage_reclaims_abandoned_objects(
+    storage: CountingStorage, db: Session, test_user: tuple[User, str]
+):
+    user, _ = test_user
+    expired = timedelta(
+        seconds=settings.UPLOAD_URL_EXPIRE_SECONDS + settings.GC_GRACE_SECONDS + 60
+    )
+    abandoned = create_video(storage, db, user, VideoStatus.PENDING, age=expired)
+    uploading = create_video(storage, db, user, VideoStatus.PENDING)
+    failed = create_video(
+        storage, db, user, VideoStatus.FAILED, age=expired, segments=1
+    )
+    processed = create_video(
+        storage, db, user, VideoStatus.PROCESSED, age=expired, segments=1
+    )
+    abandoned_id = abandoned.id
+    storage.put_bytes("hls/999999/360p_000.ts", b"segment")
+    stale_part = os.path.join(storage.root, "hls", ".part-stale")
+    with open(stale_part, "wb") as f:
+        f.write(b"partial")
+    os.utime(stale_part, (0, 0))
+
+    result = cleanup.collect_garbage()
+
+    assert result == {
+        "reaped_uploads": 1,
+        "aborted_multipart_uploads": 1,
+        "removed_hls_prefixes": 2,
+    }
+    db.expire_all()
+    assert db.query(Video).filter(Video.id == abandoned_id).first() is None
+    assert {obj.name for obj in storage.list_objects("")} == {
+        uploading.file_key,
+        failed.file_key,
+        processed.file_key,
+        f"hls/{processed.id}/360p_000.ts",
+    }
+
+
+def test_orphaned_hls_scan_resumes_where_the_last_run_stopped(
+    storage: CountingStorage, db: Session, monkeypatch
+):
+    monkeypatch.setattr(settings, "GC_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "GC_MAX_BATCHES", 1)
+    deleted_ids = range(999990, 999995)
+    for video_id in deleted_ids:
+        storage.put_bytes(f"hls/{video_id}/360p_000.ts", b"segment")
+    listed = []
+    list_prefixes = storage.list_prefixes
+
+    def record_prefixes(prefix, start_after=None):
+        for name in list_prefixes(prefix, start_after):
+            listed.append(name)
+            yield name
+
+    monkeypatch.setattr(storage, "list_prefixes", record_prefixes)
+
+    removed = [cleanup.remove_orphaned_hls_output(db, storage) for _ in range(3)]
+
+    assert removed == [2, 2, 1]
+    # Every prefix is listed once, however many there are
+    assert listed == [f"hls/{video_id}/" for video_id in deleted_ids]
+    assert list(storage.list_objects("hls/")) == []
+    # Starts over once the listing is exhausted
+    assert db.get(GcCursor, cleanup.HLS_GC_CURSOR).position is None
+
+
+def test_lifecycle_moves_old_originals_to_the_cold_tier(
+    storage: CountingStorage, db: Session, test_user: tuple[User, str], monkeypatch
+):
+    monkeypatch.setattr(settings, "ORIGINAL_LIFECYCLE_POLICY", "cold")
+    user, _ = test_user
+    due = timedelta(days=settings.ORIGINAL_LIFECYCLE_AFTER_DAYS + 1)
+    old = create_video(storage, db, user, VideoStatus.PROCESSED, age=due)
+    recent = create_video(storage, db, user, VideoStatus.PROCESSED)
+    failed = create_video(storage, db, user, VideoStatus.FAILED, age=due)
+    # Only the time the video was processed at counts, not other updates
+    edited = create_video(storage, db, user, VideoStatus.PROCESSED, age=due)
+    edited.title = "Edited"
+    reprocessed = create_video(storage, db, user, VideoStatus.PROCESSED, age=due)
+    reprocessed.processed_at = datetime.now(UTC)
+    db.commit()
+
+    assert cleanup.enforce_original_lifecycle() >= 2
+
+    db.expire_all()
+    assert old.storage_tier == edited.storage_tier == StorageTier.COLD
+    assert (
+        recent.storage_tier
+        == failed.storage_tier
+        == reprocessed.storage_tier
+        == StorageTier.HOT
+    )
+    names = {obj.name for obj in storage.list_objects("")}
+    assert old.file_key not in names
+    assert cold_key(old.file_key) in names
+    assert {recent.file_key, failed.file_key, reprocessed.file_key} <= names
+
+
+def test_lifecycle_deletes_only_originals_with_a_mezzanine(
+    storage: CountingStorage, db: Session, test_user: tuple[User, str], monkeypatch
+):
+    monkeypatch.setattr(settings, "ORIGINAL_LIFECYCLE_POLICY", "delete")
+    user, _ = test_user
+    due = timedelta(days=settings.ORIGINAL_LIFECYCLE_AFTER_DAYS + 1)
+    with_mezzanine = create_video(storage, db, user, VideoStatus.PROCESSED, age=due)
+    without_mezzanine = create_video(storage, db, user, VideoStatus.PROCESSED, age=due)
+    storage.put_bytes(mezzanine_key(with_mezzanine.id), b"mezzanine")
+
+    cleanup.enforce_original_lifecycle()
+
+    db.expire_all()
+    assert with_mezzanine.storage_tier == StorageTier.DELETED
+    assert without_mezzanine.storage_tier == StorageTier.HOT
+    names = {obj.name for obj in storage.list_objects("")}
+    assert with_mezzanine.file_key not in names
+    assert without_mezzanine.file_key in names
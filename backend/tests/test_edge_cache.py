@@ -0,0 +1,171 @@
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import delivery
+from app.services.edge_cache import EdgeCache, get_edge_cache, remove_orphaned_caches
+from app.services.playback import create_playback_token, current_window
+from app.services.storage import ObjectNotFoundError
+
+SEGMENT = bytes(range(256)) * 16
+
+
+class LocalOrigin:
+    """Local filesystem stand-in for the MinIO bucket."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.fetches: list[str] = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def put(self, object_name: str, data: bytes) -> None:
+        path = self.root / object_name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    def fetch(self, object_name: str, path: str) -> str:
+        self.fetches.append(object_name)
+        self.release.wait(timeout=5)
+        source = self.root / object_name
+        if not source.exists():
+            raise ObjectNotFoundError(object_name)
+        shutil.copyfile(source, path)
+        return hashlib.md5(source.read_bytes()).hexdigest()  # noqa: S324
+
+
+@pytest.fixture
+def origin(tmp_path: Path) -> LocalOrigin:
+    origin = LocalOrigin(tmp_path / "origin")
+    origin.put("hls/1/360p_000.ts", SEGMENT)
+    origin.put("hls/1/360p_001.ts", SEGMENT)
+    origin.put("hls/1/360p_002.ts", SEGMENT)
+    return origin
+
+
+@pytest.fixture
+def cache(tmp_path: Path, origin: LocalOrigin) -> EdgeCache:
+    return EdgeCache(str(tmp_path / "cache"), 2 * len(SEGMENT), origin.fetch)
+
+
+@pytest.fixture
+def delivery_client(cache: EdgeCache) -> TestClient:
+    app = FastAPI()
+    app.include_router(delivery.router)
+    app.dependency_overrides[get_edge_cache] = lambda: cache
+    return TestClient(app)
+
+
+def test_concurrent_misses_are_coalesced(cache: EdgeCache, origin: LocalOrigin):
+    origin.release.clear()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        futures = [pool.submit(cache.get, "hls/1/360p_000.ts") for _ in range(16)]
+        origin.release.set()
+        entries = {future.result() for future in futures}
+
+    assert len(entries) == 1
+    assert origin.fetches == ["hls/1/360p_000.ts"]
+    assert cache.stats().origin_fetches == 1
+
+
+def test_least_recently_used_objects_are_evicted(cache: EdgeCache, origin: LocalOrigin):
+    first = cache.get("hls/1/360p_000.ts")
+    cache.get("hls/1/360p_001.ts")
+    cache.get("hls/1/360p_000.ts")
+    cache.get("hls/1/360p_002.ts")
+
+    stats = cache.stats()
+    assert stats.cached_objects == 2
+    assert stats.cached_bytes == 2 * len(SEGMENT)
+    assert Path(first.path).exists()
+    cache.get("hls/1/360p_001.ts")
+    assert origin.fetches.count("hls/1/360p_001.ts") == 2
+
+
+def test_pinned_files_outlive_their_eviction(cache: EdgeCache, origin: LocalOrigin):
+    pinned = cache.get("hls/1/360p_000.ts", pin=True)
+    cache.get("hls/1/360p_001.ts")
+    cache.get("hls/1/360p_002.ts")
+
+    assert cache.stats().cached_objects == 2
+    # Still being sent to a client
+    assert Path(pinned.path).read_bytes() == SEGMENT
+    cache.release(pinned)
+    assert not Path(pinned.path).exists()
+
+
+def test_orphaned_process_caches_are_removed(tmp_path: Path):
+    exited_pid = os.fork()
+    if exited_pid == 0:
+        os._exit(0)
+    os.waitpid(exited_pid, 0)
+    orphaned = tmp_path / str(exited_pid)
+    own = tmp_path / str(os.getpid())
+    orphaned.mkdir()
+    own.mkdir()
+
+    remove_orphaned_caches(str(tmp_path))
+
+    assert not orphaned.exists()
+    assert own.exists()
+
+
+def test_segment_delivery(delivery_client: TestClient, cache: EdgeCache):
+    url = "/hls/1/360p_000.ts"
+    token = create_playback_token(1, current_window())
+
+    response = delivery_client.get(url, params={"token": token})
+    assert response.status_code == 200
+    assert response.content == SEGMENT
+    etag = response.headers["etag"]
+
+    response = delivery_client.get(
+        url, params={"token": token}, headers={"Range": "bytes=100-199"}
+    )
+    assert response.status_code == 206
+    assert response.content == SEGMENT[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(SEGMENT)}"
+
+    response = delivery_client.get(
+        url, params={"token": token}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    stats = cache.stats()
+    assert not cache._pins
+    assert stats.origin_fetches == 1
+    assert stats.hit_ratio == pytest.approx(2 / 3)
+    assert stats.bytes_served == len(SEGMENT) + 100
+
+
+def test_rewritten_segments_are_fetched_again(
+    delivery_client: TestClient, cache: EdgeCache, origin: LocalOrigin
+):
+    url = "/hls/1/360p_000.ts"
+    token = create_playback_token(1, current_window())
+    response = delivery_client.get(url, params={"token": token, "v": 1})
+    assert response.content == SEGMENT
+
+    # A re-transcode rewrites the segment under the same name, and bumps the version
+    origin.put("hls/1/360p_000.ts", SEGMENT[::-1])
+    response = delivery_client.get(url, params={"token": token, "v": 2})
+    assert response.content == SEGMENT[::-1]
+    assert origin.fetches == ["hls/1/360p_000.ts", "hls/1/360p_000.ts"]
+
+
+def test_segment_delivery_rejects_bad_requests(delivery_client: TestClient):
+    token = create_playback_token(1, current_window())
+
+    response = delivery_client.get("/hls/2/360p_000.ts", params={"token": token})
+    assert response.status_code == 403
+    response = delivery_client.get("/hls/1/master.m3u8", params={"token": token})
+    assert response.status_code == 404
+    response = delivery_client.get("/hls/1/360p_009.ts", params={"token": token})
+    assert response.status_code == 404
@@ -0,0 +1,265 @@
+import asyncio
+import time
+from datetime import UTC, datetime
+
+import pytest
+import redis
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.api.endpoints import videos
+from app.core.config import settings
+from app.models.user import User
+from app.models.video import Video
+from app.schemas.video_status import VideoStatus
+from app.services import limits
+from app.services.redis_limits import RedisLimiter
+from app.services.storage import LocalStorage
+from app.tasks import cleanup
+
+
+class InMemoryLimiter:
+    """Limiter keeping its buckets and counters in memory, for one process."""
+
+    def __init__(self):
+        self.buckets: dict[str, tuple[float, float]] = {}
+        self.counters: dict[str, int] = {}
+
+    def acquire(self, buckets) -> float:
+        now = time.monotonic()
+        levels = {}
+        for name, rate, capacity in buckets:
+            tokens, at = self.buckets.get(name, (capacity, now))
+            levels[name] = min(capacity, tokens + (now - at) * rate)
+        wait = max(
+            (
+                (1 - levels[name]) / rate
+                for name, rate, _ in buckets
+                if levels[name] < 1
+            ),
+            default=0,
+        )
+        if not wait:
+            for name, _, _ in buckets:
+                self.buckets[name] = (levels[name] - 1, now)
+        return wait
+
+    def reserve(self, counters, rebuild, ttl_seconds) -> int:
+        if any(name not in self.counters for name, _, _ in counters):
+            for (name, _, _), value in zip(counters, rebuild(), strict=True):
+                self.counters.setdefault(name, value)
+        for position, (name, amount, limit) in enumerate(counters, start=1):
+            if limit and self.counters[name] + amount > limit:
+                return position
+        for name, amount, _ in counters:
+            self.counters[name] += amount
+        return 0
+
+    def release(self, counters) -> None:
+        for name, amount in counters:
+            if name in self.counters:
+                self.counters[name] = max(0, self.counters[name] - amount)
+
+
+@pytest.fixture
+def limiter(monkeypatch, tmp_path) -> InMemoryLimiter:
+    limiter = InMemoryLimiter()
+    monkeypatch.setattr(limits, "get_limiter", lambda: limiter)
+    storage = LocalStorage(str(tmp_path), "http://testserver/api/v1/storage")
+    monkeypatch.setattr(videos, "get_storage", lambda: storage)
+    return limiter
+
+
+def month_start() -> datetime:
+    return datetime.now(UTC).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def upload_request(client: TestClient, headers: dict, size: int = 1024):
+    return client.post(
+        f"{settings.API_V1_STR}/videos/upload-request",
+        headers=headers,
+        json={
+            "title": "Limited",
+            "file_name": "limited.mp4",
+            "file_size": size,
+            "mime_type": "video/mp4",
+        },
+    )
+
+
+def test_upload_requests_are_rate_limited(
+    monkeypatch, limiter: InMemoryLimiter, client: TestClient, user_token_headers: dict
+):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(videos.upload_rate_limit, "per_minute", 2)
+
+    statuses = [
+        upload_request(client, user_token_headers).status_code for _ in range(2)
+    ]
+    limited = upload_request(client, user_token_headers)
+
+    assert statuses == [201, 201]
+    assert limited.status_code == 429
+    assert int(limited.headers["retry-after"]) == 30
+
+
+def test_rate_limits_are_checked_off_the_event_loop(
+    monkeypatch, limiter: InMemoryLimiter, client: TestClient, user_token_headers: dict
+):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    acquire = limiter.acquire
+    on_event_loop = []
+
+    def acquire_and_record(buckets) -> float:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            on_event_loop.append(False)
+        else:
+            on_event_loop.append(True)
+        return acquire(buckets)
+
+    monkeypatch.setattr(limiter, "acquire", acquire_and_record)
+
+    assert upload_request(client, user_token_headers).status_code == 201
+    assert on_event_loop == [False]
+
+
+def test_storage_quota_is_reserved_and_released(
+    monkeypatch,
+    limiter: InMemoryLimiter,
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    user, _ = test_user
+    stored, _ = limits._usage(db, user.id, month_start())
+    size = 1024 * 1024
+    monkeypatch.setattr(settings, "QUOTAS_ENABLED", True)
+    monkeypatch.setattr(settings, "QUOTA_STORAGE_BYTES", stored + size * 3 // 2)
+    monkeypatch.setattr(settings, "QUOTA_TRANSCODE_MINUTES_PER_MONTH", 0)
+    monkeypatch.setattr(cleanup.delete_video_objects, "delay", lambda *args: None)
+
+    first = upload_request(client, user_token_headers, size)
+    assert first.status_code == 201
+    rejected = upload_request(client, user_token_headers, size)
+    assert rejected.status_code == 403
+    assert "storage" in rejected.json()["detail"]
+
+    video_id = first.json()["video_id"]
+    deleted = client.delete(
+        f"{settings.API_V1_STR}/videos/{video_id}", headers=user_token_headers
+    )
+    assert deleted.status_code == 204
+    assert upload_request(client, user_token_headers, size).status_code == 201
+
+
+def test_deleting_a_transcoded_video_keeps_its_minutes_spent(
+    monkeypatch,
+    limiter: InMemoryLimiter,
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    user, _ = test_user
+    size = 10 * 1024 * 1024
+    monkeypatch.setattr(cleanup.delete_video_objects, "delay", lambda *args: None)
+    _, before = limits._usage(db, user.id, month_start())
+
+    transcoded_id = upload_request(client, user_token_headers, size).json()["video_id"]
+    db.get(Video, transcoded_id).status = VideoStatus.PROCESSED
+    db.commit()
+    abandoned_id = upload_request(client, user_token_headers, size).json()["video_id"]
+    for video_id in (transcoded_id, abandoned_id):
+        response = client.delete(
+            f"{settings.API_V1_STR}/videos/{video_id}", headers=user_token_headers
+        )
+        assert response.status_code == 204
+
+    # Only the upload that was never completed is refunded
+    _, after = limits._usage(db, user.id, month_start())
+    assert after == before + limits.estimated_duration(size)
+
+
+def test_quota_is_released_when_the_video_cannot_be_saved(
+    monkeypatch,
+    limiter: InMemoryLimiter,
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    monkeypatch.setattr(settings, "QUOTAS_ENABLED", True)
+    monkeypatch.setattr(settings, "QUOTA_STORAGE_BYTES", 0)
+    monkeypatch.setattr(settings, "QUOTA_TRANSCODE_MINUTES_PER_MONTH", 0)
+    assert upload_request(client, user_token_headers).status_code == 201
+    counters = dict(limiter.counters)
+
+    def failing_commit():
+        raise OperationalError("COMMIT", {}, Exception("connection lost"))
+
+    monkeypatch.setattr(db, "commit", failing_commit)
+    with pytest.raises(OperationalError):
+        upload_request(client, user_token_headers, 2048)
+
+    assert limiter.counters == counters
+
+
+def test_limits_are_not_enforced_while_redis_is_down():
+    limiter = RedisLimiter(redis.Redis.from_url("redis://localhost:1/0"), 60)
+
+    assert limiter.acquire([("rate:test:user:1", 1 / 60, 1)]) == 0
+    assert limiter.reserve([("quota:1:storage", 10, 1)], lambda: [0], 60) == 0
+    limiter.release([("quota:1:storage", 10)])
+
+
+@pytest.fixture
+def redis_limiter() -> RedisLimiter:
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return RedisLimiter(fakeredis.FakeRedis(), 60)
+
+
+def test_redis_buckets_take_a_token_from_every_bucket_or_none(
+    redis_limiter: RedisLimiter,
+):
+    user = ("rate:test:user:1", 1 / 60, 2)
+    route = ("rate:test:global", 1 / 60, 3)
+
+    assert redis_limiter.acquire([user, route]) == 0
+    assert redis_limiter.acquire([user, route]) == 0
+    # The user's bucket is empty: nothing is taken from the global one
+    assert redis_limiter.acquire([user, route]) == pytest.approx(60, abs=1)
+    assert redis_limiter.acquire([("rate:test:user:2", 1 / 60, 2), route]) == 0
+    assert redis_limiter.acquire([("rate:test:user:3", 1 / 60, 2), route]) > 0
+
+
+def test_redis_counters_are_reserved_against_their_limits(
+    redis_limiter: RedisLimiter,
+):
+    rebuilds = []
+
+    def rebuild():
+        rebuilds.append(1)
+        return [70, 0]
+
+    counters = [("quota:1:storage", 20, 100), ("quota:1:transcode", 5, 0)]
+    assert redis_limiter.reserve(counters, rebuild, 60) == 0
+    # The storage counter would go over its limit; neither is incremented
+    assert redis_limiter.reserve(counters, rebuild, 60) == 1
+    assert rebuilds == [1]
+    client = redis_limiter.client
+    assert int(client.get("videoflow:limits:quota:1:storage")) == 90
+    assert int(client.get("videoflow:limits:quota:1:transcode")) == 5
+    assert 0 < client.ttl("videoflow:limits:quota:1:storage") <= 60
+
+    redis_limiter.release(
+        [("quota:1:storage", 100), ("quota:1:transcode", 2), ("quota:2:storage", 1)]
+    )
+    assert int(client.get("videoflow:limits:quota:1:storage")) == 0
+    assert int(client.get("videoflow:limits:quota:1:transcode")) == 3
+    # Missing counters are left to be rebuilt
+    assert client.get("videoflow:limits:quota:2:storage") is None
@@ -0,0 +1,106 @@
+import json
+import logging
+import queue
+import subprocess
+import sys
+import textwrap
+
+from app.core.logging import (
+    ContextFilter,
+    DroppingQueueHandler,
+    JsonFormatter,
+    SamplingFilter,
+    log_context,
+)
+
+
+def drain(log_queue: queue.Queue) -> list[dict]:
+    records = []
+    while not log_queue.empty():
+        records.append(json.loads(log_queue.get_nowait().getMessage()))
+    return records
+
+
+def make_logger(log_queue: queue.Queue) -> tuple[logging.Logger, DroppingQueueHandler]:
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    handler.addFilter(ContextFilter())
+    handler.setFormatter(JsonFormatter())
+    logger = logging.getLogger(f"test_logging.{id(log_queue)}")
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger, handler
+
+
+def test_records_are_json_with_bound_context():
+    log_queue = queue.Queue()
+    logger, _ = make_logger(log_queue)
+
+    with log_context(video_id=7, stage="encode"):
+        logger.info("Encoded %s", "720p", extra={"attempt": 2})
+    logger.info("Done")
+
+    first, second = drain(log_queue)
+    assert first["message"] == "Encoded 720p"
+    assert first["level"] == "INFO"
+    assert (first["video_id"], first["stage"], first["attempt"]) == (7, "encode", 2)
+    assert "video_id" not in second
+
+
+def test_sampled_records_and_full_queue_are_dropped():
+    log_queue = queue.Queue(maxsize=3)
+    logger, handler = make_logger(log_queue)
+
+    for i in range(10):
+        logger.debug("Uploaded %s", f"360p_{i:03d}.ts", extra={"sample_every": 5})
+    for _ in range(5):
+        logger.info("Unsampled")
+
+    assert [r["message"] for r in drain(log_queue)] == [
+        "Uploaded 360p_000.ts",
+        "Uploaded 360p_005.ts",
+        "Unsampled",
+    ]
+    assert handler.dropped == 4
+
+
+def test_dropped_records_are_reported_once_the_queue_has_room():
+    log_queue = queue.Queue(maxsize=2)
+    logger, handler = make_logger(log_queue)
+
+    for _ in range(4):
+        logger.info("Flood")
+    drain(log_queue)
+    logger.info("After")
+
+    warning, after = drain(log_queue)
+    assert handler.dropped == 2
+    assert warning["level"] == "WARNING"
+    assert warning["message"] == "Dropped 2 log records, the log queue was full"
+    assert after["message"] == "After"
+
+
+def test_forked_processes_log_through_their_own_listener():
+    script = textwrap.dedent(
+        """
+        import logging, os
+        from app.core.logging import configure_logging
+
+        configure_logging()
+        pid = os.fork()
+        if pid == 0:
+            configure_logging()
+            logging.getLogger("child").warning("From the child")
+            raise SystemExit
+        os.waitpid(pid, 0)
+        logging.getLogger("parent").warning("From the parent")
+        """
+    )
+    # Forked in a fresh interpreter, so pytest's own logging setup is left alone
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=30
+    )
+
+    messages = [json.loads(line)["message"] for line in result.stdout.splitlines()]
+    assert messages == ["From the child", "From the parent"]
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from prometheus_client import CollectorRegistry, generate_latest
+
+from app.core import metrics
+from app.services import backlog
+
+
+def test_worker_exporter_merges_samples_of_forked_processes(tmp_path):
+    stale = tmp_path / "counter_999999.db"
+    stale.write_bytes(b"")
+    script = textwrap.dedent(
+        """
+        import os
+        from prometheus_client import generate_latest
+        from app.core.celery_app import clear_metrics_samples, mark_metrics_process_dead
+        from app.core.metrics import TRANSCODE_STAGE_DURATION, get_registry
+
+        clear_metrics_samples()
+        pid = os.fork()
+        if pid == 0:
+            TRANSCODE_STAGE_DURATION.labels("encode", "720p").observe(3)
+            mark_metrics_process_dead()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        print(generate_latest(get_registry()).decode())
+        """
+    )
+    # The directory must be set before prometheus_client is imported
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=30,
+        env={**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)},
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert not stale.exists()
+    assert (
+        'transcode_stage_duration_seconds_count{rendition="720p",stage="encode"} 1.0'
+        in result.stdout
+    )
+
+
+def test_worker_exporter_leaves_queue_lengths_to_the_api(monkeypatch):
+    registry = CollectorRegistry()
+    served = []
+    monkeypatch.setattr(metrics, "get_registry", lambda: registry)
+    monkeypatch.setattr(
+        metrics, "start_http_server", lambda port, registry: served.append(registry)
+    )
+    monkeypatch.setattr(backlog, "get_queue_lengths", lambda: {"transcode.short": 3})
+
+    metrics.start_worker_exporter()
+
+    exposition = generate_latest(served[0]).decode()
+    assert "transcode_scratch_disk_bytes" in exposition
+    assert "transcode.short" not in exposition
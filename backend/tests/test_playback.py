@@ -0,0 +1,172 @@
+import io
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import User
+from app.models.video import Video
+from app.schemas.video_status import VideoStatus
+from app.services import playback
+from app.services.storage import LocalStorage
+
+MASTER_PLAYLIST = "#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=896000\nstream_360p.m3u8\n"
+RENDITION_PLAYLIST = (
+    "#EXTM3U\n#EXT-X-TARGETDURATION:10\n"
+    "#EXTINF:10.0,\n360p_000.ts\n#EXTINF:4.0,\n360p_001.ts\n#EXT-X-ENDLIST\n"
+)
+
+
+class CountingStorage(LocalStorage):
+    """Local storage backend recording which objects are read."""
+
+    def __init__(self, root: str):
+        super().__init__(root, "http://testserver/api/v1/storage")
+        self.fetches: list[str] = []
+
+    def open(self, name):
+        self.fetches.append(name)
+        return super().open(name)
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path, db: Session, test_user: tuple[User, str]):
+    user, _ = test_user
+    video = Video(
+        title="Playback",
+        file_key=f"{user.id}/{uuid.uuid4()}.mp4",
+        file_size=1024,
+        mime_type="video/mp4",
+        status=VideoStatus.PROCESSED,
+        hls_url=f"{settings.API_V1_STR}/playback/0/master.m3u8",
+        owner_id=user.id,
+    )
+    db.add(video)
+    db.commit()
+    db.refresh(video)
+
+    storage = CountingStorage(str(tmp_path))
+    storage.put_bytes(f"hls/{video.id}/master.m3u8", MASTER_PLAYLIST.encode())
+    storage.put_bytes(f"hls/{video.id}/stream_360p.m3u8", RENDITION_PLAYLIST.encode())
+    storage.video = video
+    monkeypatch.setattr(playback, "get_storage", lambda: storage)
+    playback.render_master_playlist.cache_clear()
+    playback.render_rendition_playlist.cache_clear()
+    return storage
+
+
+def test_rewrite_playlist_only_rewrites_uri_lines():
+    rewritten = playback.rewrite_playlist(
+        io.StringIO(RENDITION_PLAYLIST), lambda uri: f"signed/{uri}"
+    )
+
+    assert rewritten.splitlines() == [
+        "#EXTM3U",
+        "#EXT-X-TARGETDURATION:10",
+        "#EXTINF:10.0,",
+        "signed/360p_000.ts",
+        "#EXTINF:4.0,",
+        "signed/360p_001.ts",
+        "#EXT-X-ENDLIST",
+    ]
+
+
+def test_playback_serves_signed_playlists_once_per_window(
+    client: TestClient, storage: CountingStorage, user_token_headers: dict
+):
+    video_id = storage.video.id
+    base_url = f"{settings.API_V1_STR}/playback/{video_id}"
+
+    for _ in range(2):
+        response = client.get(f"{base_url}/master.m3u8", headers=user_token_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == playback.PLAYLIST_MEDIA_TYPE
+    rendition_uri = response.text.splitlines()[-1]
+    assert rendition_uri.startswith("stream_360p.m3u8?token=")
+
+    for _ in range(2):
+        response = client.get(f"{base_url}/{rendition_uri}")
+        assert response.status_code == 200
+    assert f"{storage.base_url}/hls/{video_id}/360p_000.ts?expires=" in response.text
+    # Each playlist is fetched and rewritten once for the whole window.
+    assert storage.fetches == [
+        f"hls/{video_id}/master.m3u8",
+        f"hls/{video_id}/stream_360p.m3u8",
+    ]
+
+
+def test_rendition_playlist_requires_token_for_the_same_video(
+    client: TestClient, storage: CountingStorage
+):
+    video_id = storage.video.id
+    other_token = playback.create_playback_token(
+        video_id + 1, playback.current_window()
+    )
+
+    response = client.get(
+        f"{settings.API_V1_STR}/playback/{video_id}/stream_360p.m3u8",
+        params={"token": other_token},
+    )
+
+    assert response.status_code == 403
+
+
+def test_missing_playlists_are_not_found(
+    client: TestClient, storage: CountingStorage, user_token_headers: dict
+):
+    video = storage.video
+    base_url = f"{settings.API_V1_STR}/playback/{video.id}"
+    token = playback.create_playback_token(video.id, playback.current_window())
+
+    response = client.get(f"{base_url}/stream_1080p.m3u8", params={"token": token})
+    assert response.status_code == 404
+
+    storage.delete_many([f"hls/{video.id}/master.m3u8"])
+    response = client.get(f"{base_url}/master.m3u8", headers=user_token_headers)
+    assert response.status_code == 404
+
+
+def test_retranscoded_rendition_playlist_is_not_served_from_cache(
+    client: TestClient, db: Session, storage: CountingStorage
+):
+    video = storage.video
+    url = f"{settings.API_V1_STR}/playback/{video.id}/stream_360p.m3u8"
+    params = {
+        "token": playback.create_playback_token(video.id, playback.current_window())
+    }
+    assert "360p_000.ts" in client.get(url, params=params).text
+
+    storage.put_bytes(
+        f"hls/{video.id}/stream_360p.m3u8",
+        RENDITION_PLAYLIST.replace("360p_", "360p_v2_").encode(),
+    )
+    video.hls_url = f"{settings.API_V1_STR}/playback/{video.id}/master.m3u8"
+    db.commit()
+
+    assert "360p_v2_000.ts" in client.get(url, params=params).text
+
+
+def test_edge_cache_segment_urls_change_with_the_version(
+    monkeypatch, client: TestClient, db: Session, storage: CountingStorage
+):
+    monkeypatch.setattr(settings, "EDGE_CACHE_ENABLED", True)
+    video = storage.video
+    url = f"{settings.API_V1_STR}/playback/{video.id}/stream_360p.m3u8"
+    params = {
+        "token": playback.create_playback_token(video.id, playback.current_window())
+    }
+    segment_uri = client.get(url, params=params).text.splitlines()[3]
+    assert segment_uri.startswith(f"{settings.API_V1_STR}/hls/{video.id}/360p_000.ts")
+    assert segment_uri.endswith(f"&v={video.version}")
+
+    video.title = "Re-transcoded"
+    db.commit()
+
+    assert (
+        client.get(url, params=params)
+        .text.splitlines()[3]
+        .endswith(f"&v={video.version}")
+    )
+    assert not segment_uri.endswith(f"&v={video.version}")
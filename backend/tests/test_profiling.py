@@ -0,0 +1,90 @@
+import os
+import time
+
+import pytest
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.profiling import ProfiledRoute, ProfilingMiddleware
+from app.models.user import User
+
+
+@pytest.fixture
+def profile_dir(monkeypatch, tmp_path) -> str:
+    monkeypatch.setattr(settings, "PROFILE_OUTPUT", "local")
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        # Async endpoint
+        "/users/me",
+        # Sync endpoints returning a model_response, one with a dependency
+        "/tags/",
+        "/videos/batch?ids=1",
+    ],
+)
+def test_superuser_can_profile_a_request(
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+    profile_dir: str,
+    path: str,
+):
+    user, _ = test_user
+    user.is_superuser = True
+    db.commit()
+    try:
+        response = client.get(
+            f"{settings.API_V1_STR}{path}",
+            headers={**user_token_headers, "X-Profile": "1"},
+        )
+    finally:
+        user.is_superuser = False
+        db.commit()
+
+    assert response.status_code == 200
+    name = response.headers["X-Profile"]
+    assert os.listdir(profile_dir) == [f"{name}.html"]
+    assert os.path.getsize(os.path.join(profile_dir, f"{name}.html")) > 0
+
+
+def test_profiling_requires_a_superuser(
+    client: TestClient, user_token_headers: dict, profile_dir: str
+):
+    response = client.get(
+        f"{settings.API_V1_STR}/users/me?profile=1", headers=user_token_headers
+    )
+    assert response.status_code == 400
+    assert os.listdir(profile_dir) == []
+
+    response = client.get(f"{settings.API_V1_STR}/users/me", headers=user_token_headers)
+    assert response.status_code == 200
+    assert "X-Profile" not in response.headers
+
+
+def test_sync_endpoints_are_sampled_in_their_worker_thread(profile_dir: str):
+    async def authorize(request: Request) -> None:
+        pass
+
+    router = APIRouter(route_class=ProfiledRoute)
+
+    @router.get("/slow")
+    def slow_sync_endpoint() -> dict:
+        time.sleep(0.05)
+        return {}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(ProfilingMiddleware, authorize=authorize)
+
+    response = TestClient(app).get("/slow", headers={"X-Profile": "1"})
+
+    assert response.status_code == 200
+    with open(os.path.join(profile_dir, f"{response.headers['X-Profile']}.html")) as f:
+        assert "slow_sync_endpoint" in f.read()
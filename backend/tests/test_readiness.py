@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.readiness import Readiness
+from app.main import app
+
+
+def unavailable():
+    raise ConnectionError("Connection refused")
+
+
+def test_ready_once_every_check_passes(monkeypatch):
+    outage = {"broker": True}
+
+    def check_broker():
+        if outage["broker"]:
+            unavailable()
+
+    readiness = Readiness({"database": lambda: None, "broker": check_broker})
+    monkeypatch.setattr(app.state, "readiness", readiness)
+    # Without the lifespan, so that only the checks run below report
+    client = TestClient(app)
+
+    asyncio.run(readiness.check_all())
+    response = client.get("/ready")
+    assert response.status_code == 503
+    checks = response.json()["checks"]
+    assert checks["database"]["ok"]
+    assert checks["broker"]["error"] == "Connection refused"
+
+    outage["broker"] = False
+    asyncio.run(readiness.check_all())
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_startup_does_not_wait_for_dependencies(monkeypatch):
+    released = threading.Event()
+    readiness = Readiness({"database": released.wait})
+    monkeypatch.setattr(app.state, "readiness", readiness)
+
+    with TestClient(app) as client:
+        try:
+            assert client.get("/health").status_code == 200
+            response = client.get("/ready")
+            assert response.status_code == 503
+            assert response.json()["checks"] == {"database": None}
+        finally:
+            # Shutdown waits for the check's thread
+            released.set()
+
+
+def test_hanging_check_times_out_and_is_not_restarted(monkeypatch):
+    monkeypatch.setattr(settings, "READINESS_TIMEOUT_SECONDS", 0.05)
+    released = threading.Event()
+    calls = []
+
+    def hanging():
+        calls.append(1)
+        released.wait()
+
+    readiness = Readiness({"storage": hanging})
+
+    async def two_rounds():
+        await readiness.check_all()
+        first = readiness.results["storage"]
+        await readiness.check_all()
+        released.set()
+        return first
+
+    first = asyncio.run(two_rounds())
+
+    assert not first.ok
+    assert first.error == "Timed out after 0.05s"
+    assert not readiness.ready
+    assert len(calls) == 1
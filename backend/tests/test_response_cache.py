@@ -0,0 +1,186 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import redis
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_read_db
+from app.main import app
+from app.models.tag import Tag
+from app.models.user import User
+from app.models.video import Video
+from app.schemas.video_status import VideoStatus
+from app.services import redis_cache
+from app.services.redis_cache import ResponseCache
+
+# Nothing listens there, so every Redis call fails at once
+UNREACHABLE_REDIS_URL = "redis://localhost:1/0"
+
+
+def lookups(level: str, result: str) -> float:
+    return (
+        REGISTRY.get_sample_value(
+            "response_cache_lookups_total", {"level": level, "result": result}
+        )
+        or 0.0
+    )
+
+
+@pytest.fixture
+def cache() -> ResponseCache:
+    """A response cache whose Redis is down, leaving only the local level."""
+    return ResponseCache(
+        redis.Redis.from_url(UNREACHABLE_REDIS_URL),
+        ttl_seconds=60,
+        local_size=2,
+        local_ttl_seconds=60,
+        lock_seconds=1,
+        retry_seconds=60,
+    )
+
+
+def test_concurrent_misses_load_once(cache: ResponseCache):
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def load() -> bytes:
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return b"[]"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(cache.get, "tags", load)
+        started.wait(5)
+        followers = [pool.submit(cache.get, "tags", load) for _ in range(3)]
+        release.set()
+        values = [leader.result()] + [future.result() for future in followers]
+
+    assert values == [b"[]"] * 4
+    assert len(loads) == 1
+    hits = lookups("local", "hit")
+    assert cache.get("tags", load) == b"[]"
+    assert lookups("local", "hit") == hits + 1
+    assert len(loads) == 1
+
+
+def test_invalidation_drops_entries_and_racing_fills(cache: ResponseCache):
+    versions = iter([b"1", b"2", b"3"])
+
+    assert cache.get("video:1", lambda: next(versions)) == b"1"
+    cache.invalidate("video:1")
+    assert cache.get("video:1", lambda: next(versions)) == b"2"
+
+    def load_during_update() -> bytes:
+        # The video changes while its old version is being loaded
+        cache.invalidate("video:1")
+        return b"stale"
+
+    cache.invalidate("video:1")
+    assert cache.get("video:1", load_during_update) == b"stale"
+    assert cache.get("video:1", lambda: next(versions)) == b"3"
+
+
+def test_local_entries_are_bounded(cache: ResponseCache):
+    for key in ("a", "b", "c"):
+        cache.get(key, key.encode)
+
+    assert cache.get("a", lambda: b"reloaded") == b"reloaded"
+    assert cache.get("c", lambda: b"reloaded") == b"c"
+
+
+@pytest.fixture
+def cached_client(monkeypatch, client: TestClient) -> TestClient:
+    """The test client, with the response cache enabled and Redis down."""
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_REDIS_URL", UNREACHABLE_REDIS_URL)
+    redis_cache.get_response_cache.cache_clear()
+    yield client
+    redis_cache.get_response_cache.cache_clear()
+
+
+def test_cached_video_details_are_invalidated_by_updates(
+    cached_client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    user, _ = test_user
+    video = Video(
+        title="Cached",
+        file_key=f"{user.id}/{uuid.uuid4().hex}.mp4",
+        file_size=1024,
+        mime_type="video/mp4",
+        status=VideoStatus.PROCESSED,
+        owner_id=user.id,
+    )
+    tag = Tag(name=f"cached-{uuid.uuid4().hex[:8]}")
+    db.add_all([video, tag])
+    db.commit()
+    url = f"{settings.API_V1_STR}/videos/{video.id}"
+
+    first = cached_client.get(url, headers=user_token_headers)
+    assert first.status_code == 200
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        second = cached_client.get(url, headers=user_token_headers)
+        revalidated = cached_client.get(
+            url, headers={**user_token_headers, "If-None-Match": first.headers["etag"]}
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+    assert revalidated.status_code == 304
+    assert not [statement for statement in statements if "videos" in statement]
+
+    response = cached_client.post(f"{url}/tags/{tag.id}", headers=user_token_headers)
+    assert response.status_code == 200
+    updated = cached_client.get(url, headers=user_token_headers)
+    assert [t["name"] for t in updated.json()["tags"]] == [tag.name]
+    assert updated.headers["etag"] != first.headers["etag"]
+
+
+def test_cached_tag_list_is_invalidated_by_new_tags(cached_client: TestClient):
+    url = f"{settings.API_V1_STR}/tags/"
+    before = cached_client.get(url).json()
+    name = f"listed-{uuid.uuid4().hex[:8]}"
+
+    assert cached_client.post(url, json={"name": name}).status_code == 201
+    after = cached_client.get(url).json()
+
+    assert len(after) == len(before) + 1
+    assert name in [tag["name"] for tag in after]
+
+
+class LaggingReplica:
+    """Stands in for a replica session; any read from it fails the test."""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"Cache fill read the replica ({name})")
+
+
+def test_cache_misses_are_filled_from_the_primary(
+    monkeypatch, cached_client: TestClient
+):
+    monkeypatch.setitem(app.dependency_overrides, get_read_db, LaggingReplica)
+    name = f"primary-{uuid.uuid4().hex[:8]}"
+
+    url = f"{settings.API_V1_STR}/tags/"
+    assert cached_client.post(url, json={"name": name}).status_code == 201
+    response = cached_client.get(url)
+
+    assert response.status_code == 200
+    assert name in [tag["name"] for tag in response.json()]
@@ -0,0 +1,112 @@
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.models.category import Category
+from app.models.tag import Tag
+from app.models.user import User
+from app.models.video import Video
+from app.schemas.video_status import VideoStatus
+
+LISTING = [{"id": i, "name": f"tag-{i}"} for i in range(100)]
+
+
+def test_fast_json_matches_fastapi(
+    monkeypatch,
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    user, _ = test_user
+    suffix = uuid.uuid4().hex[:8]
+    video = Video(
+        title="Serialized",
+        file_key=f"{user.id}/{suffix}.mp4",
+        file_size=1024,
+        mime_type="video/mp4",
+        duration=12.5,
+        status=VideoStatus.PROCESSED,
+        owner_id=user.id,
+        tags=[Tag(name=f"fast-{suffix}"), Tag(name=f"json-{suffix}")],
+        categories=[Category(name=f"benchmarks-{suffix}")],
+    )
+    db.add(video)
+    db.commit()
+    urls = [
+        f"{settings.API_V1_STR}/videos/{video.id}",
+        f"{settings.API_V1_STR}/tags/",
+        f"{settings.API_V1_STR}/categories/",
+    ]
+
+    default = [client.get(url, headers=user_token_headers) for url in urls]
+    monkeypatch.setattr(settings, "FAST_JSON_ENABLED", True)
+    fast = [client.get(url, headers=user_token_headers) for url in urls]
+
+    for before, after in zip(default, fast, strict=True):
+        assert after.status_code == before.status_code == 200
+        assert after.headers["content-type"] == "application/json"
+        assert after.json() == before.json()
+    assert len(fast[0].json()["tags"]) == 2
+
+
+@pytest.fixture
+def compressed_client() -> TestClient:
+    """An application serving a JSON listing and a media segment, compressed."""
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/listing")
+    def listing() -> JSONResponse:
+        return JSONResponse(LISTING)
+
+    @app.get("/small")
+    def small() -> JSONResponse:
+        return JSONResponse({"status": "ok"})
+
+    @app.get("/segment")
+    def segment() -> Response:
+        return Response(b"\x47" * 4096, media_type="video/mp2t")
+
+    return TestClient(app)
+
+
+def test_large_json_is_gzipped(compressed_client: TestClient):
+    response = compressed_client.get("/listing", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == LISTING
+    # The client decompressed the body
+    assert int(response.headers["content-length"]) < len(response.content)
+
+
+def test_only_large_compressible_responses_are_compressed(
+    compressed_client: TestClient,
+):
+    headers = {"Accept-Encoding": "gzip, br"}
+
+    small = compressed_client.get("/small", headers=headers)
+    assert "content-encoding" not in small.headers
+    segment = compressed_client.get("/segment", headers=headers)
+    assert "content-encoding" not in segment.headers
+    assert segment.content == b"\x47" * 4096
+    refused = compressed_client.get("/listing", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in refused.headers
+
+
+def test_brotli_is_preferred_when_available(compressed_client: TestClient):
+    pytest.importorskip("brotli")
+
+    response = compressed_client.get(
+        "/listing", headers={"Accept-Encoding": "gzip, br"}
+    )
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == LISTING
@@ -0,0 +1,109 @@
+import os
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import storage as storage_endpoints
+from app.services.storage import LocalStorage, ObjectNotFoundError, StorageError
+
+
+@pytest.fixture
+def storage(tmp_path: Path) -> LocalStorage:
+    return LocalStorage(str(tmp_path / "bucket"), "http://testserver/storage")
+
+
+@pytest.fixture
+def storage_client(storage: LocalStorage) -> TestClient:
+    app = FastAPI()
+    app.include_router(storage_endpoints.router)
+    app.dependency_overrides[storage_endpoints.get_local_storage] = lambda: storage
+    return TestClient(app)
+
+
+def test_presigned_upload_and_download(
+    storage: LocalStorage, storage_client: TestClient
+):
+    form = storage.presigned_upload(
+        "1/clip.mp4", timedelta(hours=1), content_type="video/mp4", max_size=16
+    )
+
+    response = storage_client.post(
+        urlsplit(form.url).path,
+        data=form.fields,
+        files={"file": ("clip.mp4", b"0123456789", "video/mp4")},
+    )
+    assert response.status_code == 204
+    assert storage.stat("1/clip.mp4").size == 10
+
+    url = storage.presigned_get_url("1/clip.mp4", timedelta(minutes=5))
+    response = storage_client.get(url)
+    assert response.status_code == 200
+    assert response.content == b"0123456789"
+
+    response = storage_client.get(url.replace("signature=", "signature=0"))
+    assert response.status_code == 403
+
+
+def test_presigned_upload_enforces_signed_fields(
+    storage: LocalStorage, storage_client: TestClient
+):
+    form = storage.presigned_upload(
+        "1/clip.mp4", timedelta(hours=1), content_type="video/mp4", max_size=4
+    )
+
+    response = storage_client.post(
+        urlsplit(form.url).path,
+        data=form.fields,
+        files={"file": ("clip.mp4", b"0123456789", "video/mp4")},
+    )
+    assert response.status_code == 400
+
+    response = storage_client.post(
+        urlsplit(form.url).path,
+        data={**form.fields, "key": "2/other.mp4"},
+        files={"file": ("clip.mp4", b"01", "video/mp4")},
+    )
+    assert response.status_code == 403
+    assert list(storage.list_objects("")) == []
+
+
+def test_copy_shares_data_without_copying(storage: LocalStorage):
+    storage.put_bytes("hls/1/360p_000.ts", b"segment")
+
+    storage.copy("hls/1/360p_000.ts", "archive/1/360p_000.ts")
+
+    source = os.stat(storage.path("hls/1/360p_000.ts"))
+    copy = os.stat(storage.path("archive/1/360p_000.ts"))
+    assert (source.st_dev, source.st_ino) == (copy.st_dev, copy.st_ino)
+    with pytest.raises(ObjectNotFoundError):
+        storage.copy("hls/1/missing.ts", "archive/1/missing.ts")
+
+
+def test_list_and_bulk_delete(storage: LocalStorage, tmp_path: Path):
+    for name in ("hls/1/a.ts", "hls/1/b.ts", "hls/10/a.ts", "1/source.mp4"):
+        storage.put_bytes(name, b"data")
+    source = tmp_path / "rendition.ts"
+    source.write_bytes(b"rendition")
+    storage.put_file("hls/1/c.ts", str(source))
+
+    assert [obj.name for obj in storage.list_objects("hls/1/")] == [
+        "hls/1/a.ts",
+        "hls/1/b.ts",
+        "hls/1/c.ts",
+    ]
+
+    failed = storage.delete_many(["hls/1/a.ts", "hls/1/b.ts", "hls/1/missing.ts"])
+    assert failed == []
+    assert [obj.name for obj in storage.list_objects("hls/")] == [
+        "hls/1/c.ts",
+        "hls/10/a.ts",
+    ]
+
+
+def test_object_names_cannot_escape_the_root(storage: LocalStorage):
+    with pytest.raises(StorageError):
+        storage.put_bytes("../outside", b"data")
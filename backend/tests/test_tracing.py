@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+
+def test_queries_on_read_replicas_are_traced(tmp_path):
+    spans_path = tmp_path / "spans.jsonl"
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    script = textwrap.dedent(
+        """
+        from opentelemetry import trace
+        from sqlalchemy import text
+        from app.core.database import read_engines
+        from app.core.tracing import configure_tracing
+
+        configure_tracing("test")
+        with read_engines[0].connect() as connection:
+            connection.execute(text("SELECT 1"))
+        trace.get_tracer_provider().shutdown()
+        """
+    )
+    # Tracing installs global instrumentation, so it is configured in a subprocess
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        timeout=30,
+        env={
+            **os.environ,
+            "TRACING_ENABLED": "true",
+            "TRACING_EXPORTER": "file",
+            "TRACING_FILE_PATH": str(spans_path),
+            "DATABASE_READ_REPLICA_URLS": json.dumps([replica_url]),
+        },
+    )
+
+    assert result.returncode == 0, result.stderr
+    spans = [json.loads(line) for line in spans_path.read_text().splitlines()]
+    assert any(
+        span["attributes"].get("db.statement") == "SELECT 1" for span in spans
+    ), spans
@@ -0,0 +1,80 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import (
+    TRANSCODE_LONG_QUEUE,
+    TRANSCODE_PRIORITY_QUEUE,
+    TRANSCODE_SHORT_QUEUE,
+)
+from app.core.config import settings
+from app.models.user import User
+from app.models.video import Video
+from app.schemas.video_status import VideoStatus
+from app.services.transcode_routing import select_transcode_queue
+from app.tasks import video_processing
+
+MB = 1024 * 1024
+
+
+@pytest.mark.parametrize(
+    ("duration", "file_size", "is_superuser", "queue"),
+    [
+        (30.0, 1500 * MB, False, TRANSCODE_SHORT_QUEUE),
+        (7200.0, 10 * MB, False, TRANSCODE_LONG_QUEUE),
+        (None, 10 * MB, False, TRANSCODE_SHORT_QUEUE),
+        (None, 1500 * MB, False, TRANSCODE_LONG_QUEUE),
+        (7200.0, 1500 * MB, True, TRANSCODE_PRIORITY_QUEUE),
+    ],
+)
+def test_select_transcode_queue(duration, file_size, is_superuser, queue):
+    assert select_transcode_queue(duration, file_size, is_superuser) == queue
+
+
+@pytest.mark.parametrize(
+    ("duration", "file_size", "owner", "queue"),
+    [
+        (30.0, 10 * MB, "test_user", TRANSCODE_SHORT_QUEUE),
+        (7200.0, 10 * MB, "test_user", TRANSCODE_LONG_QUEUE),
+        (None, 1500 * MB, "test_user", TRANSCODE_LONG_QUEUE),
+        (7200.0, 1500 * MB, "test_superuser", TRANSCODE_PRIORITY_QUEUE),
+    ],
+)
+def test_confirmed_upload_is_enqueued_on_its_queue(
+    request: pytest.FixtureRequest,
+    client: TestClient,
+    db: Session,
+    user_token_headers: dict,
+    monkeypatch,
+    duration: float | None,
+    file_size: int,
+    owner: str,
+    queue: str,
+):
+    enqueued = []
+    monkeypatch.setattr(
+        video_processing.transcode_video,
+        "apply_async",
+        lambda args, queue: enqueued.append((args[0], queue)),
+    )
+    user: User = request.getfixturevalue(owner)[0]
+    video = Video(
+        title="Routed",
+        file_key=f"{user.id}/routed_{duration}_{file_size}.mp4",
+        file_size=file_size,
+        duration=duration,
+        mime_type="video/mp4",
+        status=VideoStatus.PENDING,
+        owner_id=user.id,
+    )
+    db.add(video)
+    db.commit()
+
+    response = client.post(
+        f"{settings.API_V1_STR}/videos/upload-complete",
+        headers=user_token_headers,
+        json={"video_id": video.id},
+    )
+
+    assert response.status_code == 200
+    assert enqueued == [(video.id, queue)]
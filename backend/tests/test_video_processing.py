@@ -0,0 +1,782 @@
+import io
+import json
+import os
+import re
+import socket
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from celery.exceptions import Retry
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from prometheus_client import CollectorRegistry
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api.endpoints import admin
+from app.core.celery_app import (
+    TRANSCODE_LONG_QUEUE,
+    TRANSCODE_PRIORITY_QUEUE,
+    TRANSCODE_SHORT_QUEUE,
+)
+from app.core.config import settings
+from app.core.metrics import ScratchDiskCollector, render_metrics
+from app.core.tracing import build_span_exporter, build_tracer_provider
+from app.models.transcode_checkpoint import TranscodeCheckpoint
+from app.models.user import User
+from app.models.video import Video
+from app.models.video_status_event import VideoStatusEvent
+from app.schemas.storage_tier import StorageTier
+from app.schemas.video_status import VideoStatus
+from app.services import admission
+from app.services.admission import RESERVATION_FILE_NAME
+from app.services.original_lifecycle import cold_key, mezzanine_key
+from app.services.storage import LocalStorage
+from app.services.transcode_checkpoints import (
+    SOURCE_FETCHED,
+    encoded_stage,
+    mark_stage_completed,
+    uploaded_stage,
+)
+from app.services.transcode_lease import LeaseHeartbeat, claim_video, finish_lease
+from app.tasks import video_processing
+
+
+class RecordingStorage(LocalStorage):
+    """Local storage backend recording the objects written by the transcode task."""
+
+    def __init__(self, root: str):
+        super().__init__(root, "http://testserver/api/v1/storage")
+        self.uploads: list[str] = []
+
+    def put_bytes(self, name, data, content_type="application/octet-stream"):
+        super().put_bytes(name, data, content_type)
+        self.uploads.append(name)
+
+    def put_file(self, name, path, content_type="application/octet-stream"):
+        super().put_file(name, path, content_type)
+        self.uploads.append(name)
+
+
+# ffprobe output of a 30 second source that must be re-encoded
+SOURCE_PROBE = {"format": {"duration": "30.0"}, "streams": []}
+
+# ffprobe output of a source that already fits the top rendition
+STREAMABLE_PROBE = {
+    "format": {"duration": "30.0", "bit_rate": "2200000"},
+    "streams": [
+        {
+            "codec_type": "video",
+            "codec_name": "h264",
+            "profile": "High",
+            "pix_fmt": "yuv420p",
+            "height": 720,
+            "bit_rate": "2000000",
+        },
+        {"codec_type": "audio", "codec_name": "aac"},
+    ],
+}
+
+
+def fake_ffmpeg(command, probe=SOURCE_PROBE, segment=b"segment", **kwargs):
+    """Write a two-segment HLS rendition, or a single output file, where the real
+    ffmpeg would."""
+    if command[0] == "ffprobe":
+        if "-skip_frame" in command:
+            keyframes = {"frames": [{"pts_time": str(t)} for t in (0, 2, 4, 6)]}
+            return SimpleNamespace(
+                returncode=0, stdout=json.dumps(keyframes), stderr=b""
+            )
+        return SimpleNamespace(returncode=0, stdout=json.dumps(probe), stderr=b"")
+    if "-hls_segment_filename" not in command:
+        with open(command[-1], "wb") as f:
+            f.write(b"encoded")
+        return SimpleNamespace(returncode=0, stdout=b"", stderr=b"")
+    segment_pattern = command[command.index("-hls_segment_filename") + 1]
+    playlist_path = command[-1]
+    for i in range(2):
+        with open(re.sub(r"%03d", f"{i:03d}", segment_pattern), "wb") as f:
+            f.write(segment)
+    with open(playlist_path, "w") as f:
+        f.write("#EXTM3U\n")
+    return SimpleNamespace(returncode=0, stdout=b"", stderr=b"")
+
+
+class FakePopen:
+    """An ffmpeg process producing its output with `fake_ffmpeg`."""
+
+    # Contents of the segments written
+    segment = b"segment"
+
+    def __init__(self, command, **kwargs):
+        result = fake_ffmpeg(command, segment=self.segment)
+        self.returncode = result.returncode
+        self.stderr = io.BytesIO(result.stderr)
+
+    def wait(self) -> int:
+        return self.returncode
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stderr.close()
+
+
+@pytest.fixture
+def source_probe() -> dict:
+    return SOURCE_PROBE
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path) -> RecordingStorage:
+    storage = RecordingStorage(str(tmp_path / "storage"))
+    monkeypatch.setattr(video_processing, "get_storage", lambda: storage)
+    return storage
+
+
+@pytest.fixture
+def pipeline(
+    monkeypatch, tmp_path, db: Session, source_probe: dict, storage: RecordingStorage
+) -> list[list]:
+    ffmpeg_calls: list[list] = []
+
+    @contextmanager
+    def override_session_scope():
+        yield db
+
+    def run(command, **kwargs):
+        return fake_ffmpeg(command, probe=source_probe, **kwargs)
+
+    def popen(command, **kwargs):
+        ffmpeg_calls.append(command)
+        return FakePopen(command, **kwargs)
+
+    monkeypatch.setattr(video_processing, "session_scope", override_session_scope)
+    monkeypatch.setattr(video_processing.subprocess, "run", run)
+    monkeypatch.setattr(video_processing.subprocess, "Popen", popen)
+    monkeypatch.setattr(settings, "TRANSCODE_SCRATCH_DIR", str(tmp_path))
+    # Admission must not depend on the load of the host running the tests
+    monkeypatch.setattr(admission.os, "getloadavg", lambda: (0.0, 0.0, 0.0))
+    return ffmpeg_calls
+
+
+def create_uploaded_video(
+    storage: RecordingStorage, db: Session, user: User, name: str
+) -> Video:
+    video = Video(
+        title=name,
+        file_key=f"{user.id}/{name}.mp4",
+        file_size=1024,
+        mime_type="video/mp4",
+        status=VideoStatus.UPLOADED,
+        owner_id=user.id,
+    )
+    db.add(video)
+    db.commit()
+    db.refresh(video)
+    storage.put_bytes(video.file_key, b"source")
+    storage.uploads.clear()
+    return video
+
+
+def test_transcode_video_produces_all_renditions(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "full_run")
+
+    video_processing.transcode_video(video.id)
+
+    db.refresh(video)
+    assert video.status == VideoStatus.PROCESSED
+    assert video.hls_url.endswith(f"/playback/{video.id}/master.m3u8")
+    assert len(pipeline) == len(video_processing.RENDITIONS)
+    assert storage.stat(f"hls/{video.id}/master.m3u8").size > 0
+    assert (
+        db.query(TranscodeCheckpoint)
+        .filter(TranscodeCheckpoint.video_id == video.id)
+        .count()
+        == 0
+    )
+    assert not os.path.exists(video_processing.get_job_dir(video.id))
+    history = (
+        db.query(VideoStatusEvent.status)
+        .filter(VideoStatusEvent.video_id == video.id)
+        .order_by(VideoStatusEvent.id)
+        .all()
+    )
+    assert history == [(VideoStatus.PROCESSING,), (VideoStatus.PROCESSED,)]
+
+
+def test_redelivered_transcode_skips_completed_stages(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "redelivered")
+    done, remaining = video_processing.RENDITIONS
+
+    # Simulate a worker that died after uploading the first rendition and part of
+    # the second one.
+    mark_stage_completed(db, video.id, SOURCE_FETCHED)
+    mark_stage_completed(db, video.id, encoded_stage(done["name"]))
+    mark_stage_completed(db, video.id, uploaded_stage(done["name"]))
+    storage.put_bytes(f"hls/{video.id}/{remaining['name']}_000.ts", b"segment")
+    storage.uploads.clear()
+
+    video_processing.transcode_video(video.id)
+
+    db.refresh(video)
+    assert video.status == VideoStatus.PROCESSED
+    assert len(pipeline) == 1
+    assert f"scale=-2:{remaining['height']}" in pipeline[0]
+    assert storage.uploads == [
+        f"hls/{video.id}/{remaining['name']}_001.ts",
+        f"hls/{video.id}/stream_{remaining['name']}.m3u8",
+        f"hls/{video.id}/master.m3u8",
+    ]
+
+
+def test_duplicate_delivery_exits_while_lease_is_held(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "duplicate")
+    token = claim_video(db, video.id)
+    assert token is not None
+
+    video_processing.transcode_video(video.id)
+
+    assert pipeline == []
+    assert storage.uploads == []
+    # The first worker still owns the video and can finish it.
+    assert finish_lease(db, video.id, token, status=VideoStatus.PROCESSED)
+    assert claim_video(db, video.id) is None
+
+
+def test_heartbeat_keeps_the_lease_through_a_long_stage(
+    monkeypatch,
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+):
+    monkeypatch.setattr(settings, "TRANSCODE_LEASE_SECONDS", 0.3)
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "heartbeat")
+    token = claim_video(db, video.id)
+    db.refresh(video)
+    version = video.version
+    renewals = []
+
+    with LeaseHeartbeat(
+        sessionmaker(bind=db.get_bind()),
+        video.id,
+        token,
+        on_renew=lambda: renewals.append(1),
+    ) as heartbeat:
+        time.sleep(0.5)
+        # The stage outlasted the lease, which was renewed in the meantime
+        assert claim_video(db, video.id) is None
+
+    assert renewals
+    assert not heartbeat.lost.is_set()
+    db.refresh(video)
+    assert video.version == version
+
+    assert finish_lease(db, video.id, token, status=VideoStatus.PROCESSED)
+    with LeaseHeartbeat(sessionmaker(bind=db.get_bind()), video.id, token) as released:
+        assert released.lost.wait(1)
+
+
+@pytest.mark.parametrize(
+    ("duration", "owner", "delivered_on", "queue"),
+    [
+        (7200.0, "test_user", TRANSCODE_SHORT_QUEUE, TRANSCODE_LONG_QUEUE),
+        (30.0, "test_user", TRANSCODE_LONG_QUEUE, TRANSCODE_SHORT_QUEUE),
+        (30.0, "test_superuser", TRANSCODE_SHORT_QUEUE, TRANSCODE_PRIORITY_QUEUE),
+        (30.0, "test_user", TRANSCODE_SHORT_QUEUE, None),
+    ],
+)
+def test_misrouted_job_is_rerouted_before_downloading(
+    request: pytest.FixtureRequest,
+    monkeypatch,
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    duration: float,
+    owner: str,
+    delivered_on: str,
+    queue: str | None,
+):
+    user: User = request.getfixturevalue(owner)[0]
+    video = create_uploaded_video(
+        storage, db, user, f"routed-{duration}-{owner}-{delivered_on}"
+    )
+    video.duration = duration
+    db.commit()
+    enqueued = []
+    monkeypatch.setattr(
+        video_processing.transcode_video,
+        "apply_async",
+        lambda args, queue: enqueued.append((args, queue)),
+    )
+
+    video_processing.transcode_video.apply(
+        (video.id, False), routing_key=delivered_on
+    ).get()
+
+    db.refresh(video)
+    if queue is None:
+        assert enqueued == []
+        assert video.status == VideoStatus.PROCESSED
+    else:
+        assert enqueued == [((video.id, False), queue)]
+        assert pipeline == []
+        assert video.status == VideoStatus.UPLOADED
+        assert video.lease_expires_at is None
+
+
+def test_saturated_node_requeues_job(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+    tmp_path,
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "saturated")
+    # Another job on this node already holds every CPU.
+    busy_job_dir = tmp_path / "busy"
+    busy_job_dir.mkdir()
+    (busy_job_dir / RESERVATION_FILE_NAME).write_text(
+        json.dumps({"threads": os.cpu_count(), "scratch_bytes": 0})
+    )
+
+    with pytest.raises(Retry):
+        video_processing.transcode_video(video.id)
+
+    db.refresh(video)
+    assert pipeline == []
+    assert video.status == VideoStatus.UPLOADED
+    assert video.lease_expires_at is None
+
+
+def test_busy_node_admits_jobs_with_fewer_threads(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "TRANSCODE_SCRATCH_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "TRANSCODE_MAX_FFMPEG_THREADS", 64)
+    monkeypatch.setattr(admission.os, "cpu_count", lambda: 4)
+
+    monkeypatch.setattr(admission.os, "getloadavg", lambda: (1.5, 1.0, 1.0))
+    assert admission.admit_job(str(tmp_path / "first"), 1024).threads == 2
+    # The load average lags behind the reservations; only they reject a job
+    monkeypatch.setattr(admission.os, "getloadavg", lambda: (6.0, 6.0, 6.0))
+    assert admission.admit_job(str(tmp_path / "second"), 1024).threads == 1
+    assert admission.admit_job(str(tmp_path / "third"), 1024).threads == 1
+    assert admission.admit_job(str(tmp_path / "fourth"), 1024) is None
+
+
+def test_stale_reservations_are_reaped(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+    tmp_path,
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "reaped")
+    exited_pid = os.fork()
+    if exited_pid == 0:
+        os._exit(0)
+    os.waitpid(exited_pid, 0)
+    # One job's worker process died, the other stopped renewing its reservation.
+    crashed, abandoned = tmp_path / "crashed", tmp_path / "abandoned"
+    for job_dir, owner in ((crashed, {"pid": exited_pid}), (abandoned, {})):
+        job_dir.mkdir()
+        (job_dir / RESERVATION_FILE_NAME).write_text(
+            json.dumps(
+                {
+                    "threads": os.cpu_count(),
+                    "scratch_bytes": 0,
+                    "host": socket.gethostname(),
+                    **owner,
+                }
+            )
+        )
+    expired = time.time() - settings.TRANSCODE_LEASE_SECONDS - 1
+    os.utime(abandoned / RESERVATION_FILE_NAME, (expired, expired))
+
+    video_processing.transcode_video(video.id)
+
+    db.refresh(video)
+    assert video.status == VideoStatus.PROCESSED
+    assert not (crashed / RESERVATION_FILE_NAME).exists()
+    assert not (abandoned / RESERVATION_FILE_NAME).exists()
+
+
+def test_interrupted_job_releases_its_reservation(
+    monkeypatch,
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "interrupted")
+    # Another worker takes the video over after the source is fetched
+    monkeypatch.setattr(video_processing, "renew_lease", lambda *args, **kwargs: False)
+
+    video_processing.transcode_video(video.id)
+
+    job_dir = video_processing.get_job_dir(video.id)
+    assert os.path.exists(os.path.join(job_dir, "source"))
+    assert not os.path.exists(os.path.join(job_dir, RESERVATION_FILE_NAME))
+
+
+@pytest.mark.parametrize("source_probe", [STREAMABLE_PROBE])
+def test_streamable_source_is_remuxed_and_published_first(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "streamable")
+    lower = video_processing.RENDITIONS[0]
+
+    video_processing.transcode_video(video.id)
+
+    db.refresh(video)
+    assert video.status == VideoStatus.PROCESSED
+    remux_command, encode_command = pipeline
+    assert remux_command[remux_command.index("-c:v") + 1] == "copy"
+    assert remux_command[remux_command.index("-hls_time") + 1] == "10"
+    assert f"scale=-2:{lower['height']}" in encode_command
+    # The remuxed rendition is playable before the lower one is uploaded.
+    master = f"hls/{video.id}/master.m3u8"
+    assert storage.uploads.index(master) < storage.uploads.index(
+        f"hls/{video.id}/stream_{lower['name']}.m3u8"
+    )
+    assert storage.uploads[-1] == master
+
+
+def test_transcode_rehydrates_a_cold_original(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "rehydrated")
+    storage.copy(video.file_key, cold_key(video.file_key))
+    storage.delete_many([video.file_key])
+    video.storage_tier = StorageTier.COLD
+    db.commit()
+
+    video_processing.transcode_video(video.id)
+
+    db.refresh(video)
+    assert video.status == VideoStatus.PROCESSED
+    assert video.storage_tier == StorageTier.HOT
+    assert storage.stat(video.file_key).size > 0
+    assert list(storage.list_objects(cold_key(video.file_key))) == []
+
+
+def test_delete_policy_stores_a_mezzanine_to_retranscode_from(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+    monkeypatch,
+):
+    monkeypatch.setattr(settings, "ORIGINAL_LIFECYCLE_POLICY", "delete")
+    monkeypatch.setattr(settings, "ORIGINAL_MEZZANINE_ENABLED", True)
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "mezzanine")
+
+    video_processing.transcode_video(video.id)
+
+    assert storage.stat(mezzanine_key(video.id)).size > 0
+    assert len(pipeline) == len(video_processing.RENDITIONS) + 1
+
+    # Once the original is deleted, a re-transcode reads the mezzanine instead
+    storage.delete_many([video.file_key])
+    video.storage_tier = StorageTier.DELETED
+    video.status = VideoStatus.UPLOADED
+    db.commit()
+    pipeline.clear()
+
+    video_processing.transcode_video(video.id)
+
+    db.refresh(video)
+    assert video.status == VideoStatus.PROCESSED
+    assert len(pipeline) == len(video_processing.RENDITIONS)
+    assert all(mezzanine_key(video.id).split("/")[-1] in c[3] for c in pipeline)
+
+
+def test_mezzanine_is_opt_in(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+    monkeypatch,
+):
+    monkeypatch.setattr(settings, "ORIGINAL_LIFECYCLE_POLICY", "delete")
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "no-mezzanine")
+
+    video_processing.transcode_video(video.id)
+
+    assert len(pipeline) == len(video_processing.RENDITIONS)
+    assert mezzanine_key(video.id) not in storage.uploads
+
+
+def test_superuser_can_retranscode_a_cold_video(
+    monkeypatch,
+    pipeline: list[list],
+    storage: RecordingStorage,
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "retranscoded")
+    video_processing.transcode_video(video.id)
+    storage.copy(video.file_key, cold_key(video.file_key))
+    storage.delete_many([video.file_key])
+    video.storage_tier = StorageTier.COLD
+    db.commit()
+    enqueued = []
+    monkeypatch.setattr(
+        video_processing.transcode_video,
+        "apply_async",
+        lambda args, queue: enqueued.append((args, queue)),
+    )
+    monkeypatch.setattr(admin, "get_storage", lambda: storage)
+    url = f"{settings.API_V1_STR}/admin/videos/{video.id}/retranscode"
+
+    assert client.post(url, headers=user_token_headers).status_code == 400
+    user.is_superuser = True
+    db.commit()
+    try:
+        response = client.post(url, headers=user_token_headers)
+        conflict = client.post(url, headers=user_token_headers)
+    finally:
+        user.is_superuser = False
+        db.commit()
+
+    assert response.status_code == 202
+    assert response.json()["status"] == VideoStatus.UPLOADED
+    assert conflict.status_code == 409
+    assert enqueued == [((video.id, False), TRANSCODE_PRIORITY_QUEUE)]
+
+    pipeline.clear()
+    video_processing.transcode_video(*enqueued[0][0])
+
+    db.refresh(video)
+    assert video.status == VideoStatus.PROCESSED
+    assert video.storage_tier == StorageTier.HOT
+    assert len(pipeline) == len(video_processing.RENDITIONS)
+
+
+def test_retranscode_rewrites_segments_of_the_same_size(
+    monkeypatch,
+    pipeline: list[list],
+    storage: RecordingStorage,
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "reencoded")
+    video_processing.transcode_video(video.id)
+    segments = [
+        obj.name
+        for obj in storage.list_objects(f"hls/{video.id}/")
+        if obj.name.endswith(".ts")
+    ]
+    stale = f"hls/{video.id}/stale.ts"
+    storage.put_bytes(stale, b"old")
+    enqueued = []
+    monkeypatch.setattr(
+        video_processing.transcode_video,
+        "apply_async",
+        lambda args, queue: enqueued.append(args),
+    )
+    monkeypatch.setattr(admin, "get_storage", lambda: storage)
+    # The new encode differs from the old one, but not in size
+    monkeypatch.setattr(FakePopen, "segment", b"SEGMENT")
+
+    user.is_superuser = True
+    db.commit()
+    try:
+        response = client.post(
+            f"{settings.API_V1_STR}/admin/videos/{video.id}/retranscode",
+            headers=user_token_headers,
+        )
+    finally:
+        user.is_superuser = False
+        db.commit()
+    assert response.status_code == 202
+    assert response.json()["hls_url"] is None
+    video_processing.transcode_video(*enqueued[0])
+
+    db.refresh(video)
+    assert video.status == VideoStatus.PROCESSED
+    assert segments
+    for name in segments:
+        with storage.open(name) as f:
+            assert f.read() == b"SEGMENT"
+    assert not os.path.exists(storage.path(stale))
+
+
+def test_pipeline_run_records_metrics(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "metrics")
+    video.duration = 30.0
+    db.commit()
+    client.get(f"{settings.API_V1_STR}/videos/{video.id}", headers=user_token_headers)
+
+    video_processing.transcode_video(video.id)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    metrics = response.text
+    route = f'route="{settings.API_V1_STR}/videos/{{video_id}}"'
+    assert f'http_request_duration_seconds_count{{method="GET",{route}' in metrics
+    assert f"http_request_db_queries_count{{{route}}}" in metrics
+    assert f"http_request_db_duration_seconds_sum{{{route}}}" in metrics
+    for stage, rendition in [("probe", ""), ("download", "")] + [
+        (stage, r["name"])
+        for r in video_processing.RENDITIONS
+        for stage in ("encode", "upload")
+    ]:
+        assert (
+            "transcode_stage_duration_seconds_count"
+            f'{{rendition="{rendition}",stage="{stage}"}}'
+        ) in metrics
+    assert 'ffmpeg_speed_ratio_count{rendition="360p"}' in metrics
+    assert 'storage_transferred_bytes_total{direction="upload"}' in metrics
+    assert 'storage_transferred_bytes_total{direction="download"}' in metrics
+
+    registry = CollectorRegistry()
+    registry.register(ScratchDiskCollector())
+    content, _ = render_metrics(registry)
+    assert b'transcode_scratch_disk_bytes{kind="free"}' in content
+
+
+def test_pipeline_run_is_traced(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+    monkeypatch,
+):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(video_processing, "tracer", provider.get_tracer("test"))
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "traced")
+
+    with provider.get_tracer("test").start_as_current_span("upload-complete"):
+        video_processing.transcode_video(video.id)
+
+    spans = exporter.get_finished_spans()
+    names = [span.name for span in spans]
+    assert names.count("transcode.encode") == len(video_processing.RENDITIONS)
+    assert names.count("transcode.upload") == len(video_processing.RENDITIONS)
+    assert {"transcode.probe", "transcode.download"} <= set(names)
+    root = next(span for span in spans if span.name == "upload-complete")
+    assert all(span.context.trace_id == root.context.trace_id for span in spans)
+    assert root.attributes["video.id"] == video.id
+
+
+def test_file_exporter_writes_json_lines(monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_EXPORTER", "file")
+    out = io.StringIO()
+    provider = build_tracer_provider("test", build_span_exporter(out))
+
+    with provider.get_tracer("test").start_as_current_span("transcode.download"):
+        pass
+    provider.force_flush()
+
+    (line,) = out.getvalue().splitlines()
+    assert json.loads(line)["name"] == "transcode.download"
+
+
+def test_ffmpeg_failure_logs_the_tail_of_its_output(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+    monkeypatch,
+    caplog,
+):
+    class FailingPopen(FakePopen):
+        def __init__(self, command, **kwargs):
+            self.returncode = 1
+            self.stderr = io.BytesIO(
+                b"".join(b"frame=%d\r" % i for i in range(1000))
+                + b"Conversion failed!\n"
+            )
+
+    monkeypatch.setattr(settings, "LOG_FFMPEG_STDERR_LINES", 3)
+    monkeypatch.setattr(video_processing.subprocess, "Popen", FailingPopen)
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "ffmpeg_failure")
+
+    video_processing.transcode_video(video.id)
+
+    db.refresh(video)
+    assert video.status == VideoStatus.FAILED
+    (record,) = [r for r in caplog.records if hasattr(r, "ffmpeg_stderr")]
+    assert record.ffmpeg_stderr == "frame=998\nframe=999\nConversion failed!"
+
+
+def test_profiled_transcode_records_ffmpeg_cpu_time(
+    pipeline: list[list],
+    storage: RecordingStorage,
+    db: Session,
+    test_user: tuple[User, str],
+    monkeypatch,
+    tmp_path,
+):
+    profile_dir = tmp_path / "profiles"
+    monkeypatch.setattr(settings, "PROFILE_OUTPUT", "local")
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(profile_dir))
+    user, _ = test_user
+    video = create_uploaded_video(storage, db, user, "profiled")
+
+    video_processing.transcode_video(video.id, profile=True)
+
+    children, html = sorted(os.listdir(profile_dir))
+    assert html == children.replace(".children.json", ".html")
+    assert f"-transcode-{video.id}-" in html
+    with open(profile_dir / children) as f:
+        recorded = json.load(f)
+    assert [child["label"] for child in recorded["children"]] == [
+        f"encode:{r['name']}" for r in video_processing.RENDITIONS
+    ]
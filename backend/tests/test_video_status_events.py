@@ -0,0 +1,118 @@
+from collections.abc import Generator
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models.user import User
+from app.models.video_status_event import VideoStatusEvent
+from app.schemas.video_status import VideoStatus
+from app.services.video_status_events import get_status_timings
+
+NOW = datetime(2025, 8, 14, 12, 0, tzinfo=UTC)
+
+
+@pytest.fixture
+def history() -> Generator[Session, None, None]:
+    """An empty database holding only status events."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[VideoStatusEvent.__table__])
+    with Session(engine) as db:
+        yield db
+
+
+def add_history(db: Session, video_id: int, *changes: tuple[VideoStatus, int]):
+    """Add status changes, each given as a status and minutes before `NOW`."""
+    for status, minutes_ago in changes:
+        db.add(
+            VideoStatusEvent(
+                video_id=video_id,
+                status=status,
+                at=NOW - timedelta(minutes=minutes_ago),
+            )
+        )
+    db.commit()
+
+
+def test_status_timings(history: Session):
+    # Queue waits of 1 to 10 minutes, each followed by a 20-minute transcode
+    for video_id in range(1, 11):
+        add_history(
+            history,
+            video_id,
+            (VideoStatus.UPLOADED, 40 + video_id),
+            (VideoStatus.PROCESSING, 40),
+            (VideoStatus.FAILED if video_id > 8 else VideoStatus.PROCESSED, 20),
+        )
+    # Requeued once, then processed
+    add_history(
+        history,
+        11,
+        (VideoStatus.UPLOADED, 50),
+        (VideoStatus.PROCESSING, 49),
+        (VideoStatus.UPLOADED, 48),
+        (VideoStatus.PROCESSING, 30),
+        (VideoStatus.PROCESSED, 10),
+    )
+    # Finished before the window
+    add_history(
+        history,
+        12,
+        (VideoStatus.UPLOADED, 300),
+        (VideoStatus.PROCESSING, 290),
+        (VideoStatus.PROCESSED, 200),
+    )
+
+    timings = get_status_timings(history, NOW - timedelta(hours=2))
+
+    queue_wait = timings["queue_wait"]
+    assert queue_wait["count"] == 12
+    assert queue_wait["p50"] == pytest.approx(5 * 60, abs=1)
+    assert queue_wait["p95"] == pytest.approx(18 * 60, abs=1)
+    assert queue_wait["p99"] == pytest.approx(18 * 60, abs=1)
+    processing = timings["processing"]
+    assert processing["count"] == 11
+    assert processing["p50"] == pytest.approx(20 * 60, abs=1)
+    assert timings["finished"] == 11
+    assert timings["failed"] == 2
+    assert timings["failure_rate"] == pytest.approx(2 / 11)
+
+
+def test_status_timings_of_an_empty_window(history: Session):
+    timings = get_status_timings(history, NOW)
+
+    assert timings["queue_wait"] == {"count": 0, "p50": None, "p95": None, "p99": None}
+    assert timings["failure_rate"] is None
+
+
+def test_video_stats_require_a_superuser(
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    url = f"{settings.API_V1_STR}/admin/video-stats?hours=1"
+    assert client.get(url, headers=user_token_headers).status_code == 400
+
+    user, _ = test_user
+    user.is_superuser = True
+    db.commit()
+    try:
+        response = client.get(url, headers=user_token_headers)
+    finally:
+        user.is_superuser = False
+        db.commit()
+
+    assert response.status_code == 200
+    assert set(response.json()) == {
+        "since",
+        "queue_wait",
+        "processing",
+        "finished",
+        "failed",
+        "failure_rate",
+    }
@@ -1,10 +1,19 @@
+import uuid
+from datetime import datetime
+
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
+from app.core.celery_app import TRANSCODE_PRIORITY_QUEUE, TRANSCODE_SHORT_QUEUE
 from app.core.config import settings
+from app.models.tag import Tag
 from app.models.user import User
 from app.models.video import Video
+from app.models.video_status_event import VideoStatusEvent
+from app.schemas.video import VideoInDB
 from app.schemas.video_status import VideoStatus
+from app.tasks import video_processing
 
 
 def create_test_video(db: Session, user: User) -> Video:
@@ -12,7 +21,7 @@ def create_test_video(db: Session, user: User) -> Video:
     video = Video(
         title="Test Video",
         description="A video for testing purposes.",
-        file_key=f"{user.id}/test_video.mp4",
+        file_key=f"{user.id}/test_video_{datetime.now().timestamp()}.mp4",
         file_size=1024 * 1024,  # 1MB
         mime_type="video/mp4",
         status=VideoStatus.PENDING,
@@ -54,3 +63,285 @@ def test_confirm_upload_complete(
     # 4. Verify the status in the database is updated
     db.refresh(video)
     assert video.status == VideoStatus.UPLOADED
+
+
+def test_confirm_upload_complete_routes_by_the_owner(
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    test_superuser: tuple[User, str],
+    user_token_headers: dict,
+    superuser_token_headers: dict,
+    monkeypatch,
+):
+    """
+    Test that the transcode is routed by the video owner's role, not the caller's.
+    """
+    enqueued = []
+    monkeypatch.setattr(
+        video_processing.transcode_video,
+        "apply_async",
+        lambda args, queue: enqueued.append(queue),
+    )
+    superusers_video = create_test_video(db, test_superuser[0])
+    users_video = create_test_video(db, test_user[0])
+
+    # A regular user confirms a superuser's video, then a superuser a regular
+    # user's video
+    for video, headers in (
+        (superusers_video, user_token_headers),
+        (users_video, superuser_token_headers),
+    ):
+        response = client.post(
+            f"{settings.API_V1_STR}/videos/upload-complete",
+            headers=headers,
+            json={"video_id": video.id},
+        )
+        assert response.status_code == 200
+
+    assert enqueued == [TRANSCODE_PRIORITY_QUEUE, TRANSCODE_SHORT_QUEUE]
+
+
+def test_confirm_upload_complete_is_idempotent(
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+    monkeypatch,
+):
+    """
+    Test that confirming an upload twice only enqueues one transcode.
+    """
+    enqueued = []
+    monkeypatch.setattr(
+        video_processing.transcode_video,
+        "apply_async",
+        lambda args, queue: enqueued.append(args[0]),
+    )
+    user, _ = test_user
+    video = create_test_video(db, user)
+
+    for _ in range(2):
+        response = client.post(
+            f"{settings.API_V1_STR}/videos/upload-complete",
+            headers=user_token_headers,
+            json={"video_id": video.id},
+        )
+        assert response.status_code == 200
+        assert response.json()["status"] == "uploaded"
+
+    assert enqueued == [video.id]
+    history = (
+        db.query(VideoStatusEvent.status)
+        .filter(VideoStatusEvent.video_id == video.id)
+        .all()
+    )
+    assert history == [(VideoStatus.UPLOADED,)]
+
+
+def test_batch_details_return_only_owned_videos(
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    """
+    Test that a batch read returns the user's videos in request order.
+    """
+    user, _ = test_user
+    name = f"other-{uuid.uuid4().hex[:8]}"
+    other = User(
+        email=f"{name}@example.com",
+        username=name,
+        hashed_password="!",  # noqa: S106
+    )
+    db.add(other)
+    db.commit()
+    first, second = create_test_video(db, user), create_test_video(db, user)
+    second.tags.append(Tag(name=f"batch-{uuid.uuid4().hex[:8]}"))
+    db.commit()
+    foreign = create_test_video(db, other)
+
+    response = client.get(
+        f"{settings.API_V1_STR}/videos/batch",
+        headers=user_token_headers,
+        params={"ids": [second.id, foreign.id, 10**9, first.id, second.id]},
+    )
+
+    assert response.status_code == 200
+    videos = response.json()
+    assert [video["id"] for video in videos] == [second.id, first.id]
+    assert [tag["name"] for tag in videos[0]["tags"]] == [second.tags[0].name]
+    assert set(videos[0]) == set(VideoInDB.model_fields)
+
+
+def test_batch_details_select_fields(
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    """
+    Test that a batch read returns only the selected fields.
+    """
+    user, _ = test_user
+    video = create_test_video(db, user)
+    url = f"{settings.API_V1_STR}/videos/batch"
+
+    response = client.get(
+        url,
+        headers=user_token_headers,
+        params={"ids": [video.id], "fields": "id,status,hls_url"},
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"id": video.id, "status": "pending", "hls_url": None}]
+
+    response = client.get(
+        url,
+        headers=user_token_headers,
+        params={"ids": [video.id], "fields": "tags,categories"},
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"id": video.id, "tags": [], "categories": []}]
+
+    # The ID is returned even when it is not selected
+    response = client.get(
+        url,
+        headers=user_token_headers,
+        params={"ids": [video.id], "fields": "status"},
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"id": video.id, "status": "pending"}]
+
+    response = client.get(
+        url, headers=user_token_headers, params={"ids": [video.id], "fields": "owner"}
+    )
+    assert response.status_code == 400
+    too_many = list(range(1, settings.VIDEO_BATCH_MAX_IDS + 2))
+    response = client.get(url, headers=user_token_headers, params={"ids": too_many})
+    assert response.status_code == 422
+
+
+def test_batch_details_query_count_does_not_grow_with_videos(
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    """
+    Test that a batch read issues the same queries for two videos as for six.
+    """
+    user, _ = test_user
+    ids = [create_test_video(db, user).id for _ in range(6)]
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        counts = []
+        for batch in (ids[:2], ids):
+            statements.clear()
+            response = client.get(
+                f"{settings.API_V1_STR}/videos/batch",
+                headers=user_token_headers,
+                params={"ids": batch},
+            )
+            assert response.status_code == 200
+            assert len(response.json()) == len(batch)
+            counts.append(len(statements))
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    assert counts[0] == counts[1]
+
+
+def test_video_details_revalidate_with_etag(
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    """
+    Test that a current ETag gets a 304 until the video's tags change.
+    """
+    user, _ = test_user
+    video = create_test_video(db, user)
+    tag = Tag(name=f"etag-{uuid.uuid4().hex[:8]}")
+    db.add(tag)
+    db.commit()
+    url = f"{settings.API_V1_STR}/videos/{video.id}"
+
+    response = client.get(url, headers=user_token_headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith("W/")
+    assert "last-modified" in response.headers
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        response = client.get(
+            url, headers={**user_token_headers, "If-None-Match": etag}
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    # Only the validators were read, not the video's relationships
+    video_statements = [s for s in statements if "videos" in s]
+    assert len(video_statements) == 1
+    assert "association" not in video_statements[0]
+
+    response = client.post(f"{url}/tags/{tag.id}", headers=user_token_headers)
+    assert response.status_code == 200
+    response = client.get(url, headers={**user_token_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [t["name"] for t in response.json()["tags"]] == [tag.name]
+
+
+def test_video_details_revalidate_with_last_modified(
+    client: TestClient,
+    db: Session,
+    test_user: tuple[User, str],
+    user_token_headers: dict,
+):
+    """
+    Test that If-Modified-Since gets a 304 unless the video changed since.
+    """
+    user, _ = test_user
+    video = create_test_video(db, user)
+    url = f"{settings.API_V1_STR}/videos/{video.id}"
+    last_modified = client.get(url, headers=user_token_headers).headers["last-modified"]
+
+    response = client.get(
+        url, headers={**user_token_headers, "If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+    response = client.get(
+        url,
+        headers={
+            **user_token_headers,
+            "If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT",
+        },
+    )
+    assert response.status_code == 200
+    # If-None-Match takes precedence
+    response = client.get(
+        url,
+        headers={
+            **user_token_headers,
+            "If-Modified-Since": last_modified,
+            "If-None-Match": 'W/"stale"',
+        },
+    )
+    assert response.status_code == 200